@@ -21,3 +21,11 @@ class AccountsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     # Especificamos el nombre de la app (usada por Django para reconocerla)
     name = 'accounts'
+
+    def ready(self):
+        # Aviso de despliegue si el límite de intentos no tiene una cache atómica
+        from django.core import checks
+
+        from .throttle import check_cache
+
+        checks.register(check_cache, checks.Tags.caches, deploy=True)
@@ -1,3 +1,163 @@
-from django.test import TestCase
+"""
+Presupuesto de consultas SQL del login y de la portada (ver roles/tests.py),
+login por email (roles.backends.ProfileModelBackend) y límite de intentos
+(accounts/throttle.py).
+"""
 
-# Create your tests here.
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import authenticate, get_user_model
+from django.core import mail
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+
+from accounts import throttle
+from roles.models import Profile
+from roles.tests import QueryBudgetTestCase, query_shape
+
+User = get_user_model()
+
+
+class LoginQueryBudgetTests(QueryBudgetTestCase):
+
+    def post(self, url, data, max_queries):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(url, data)
+        shapes = [query_shape(q["sql"]) for q in ctx.captured_queries]
+        self.assertLessEqual(len(shapes), max_queries, "\n".join(shapes))
+        return response, shapes
+
+    def test_login_correcto(self):
+        response, shapes = self.post(
+            "/accounts/login/", {"email": "ADMIN@liberalia.test", "password": "clave-segura-123"}, 11
+        )
+        self.assertRedirects(response, "/", fetch_redirect_response=False)
+        self.assertEqual(shapes.count("auth_user"), 1)  # email → usuario + perfil en una consulta
+
+    def test_login_fallido(self):
+        response, shapes = self.post(
+            "/accounts/login/", {"email": "admin@liberalia.test", "password": "incorrecta"}, 1
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_email_inexistente_igual_calcula_hash(self):
+        with mock.patch("django.contrib.auth.base_user.make_password") as make_password:
+            response, shapes = self.post(
+                "/accounts/login/", {"email": "nadie@liberalia.test", "password": "clave-segura-123"}, 1
+            )
+        self.assertEqual(response.status_code, 200)
+        make_password.assert_called_once_with("clave-segura-123")
+
+
+class EmailBackendTests(QueryBudgetTestCase):
+
+    def test_email_repetido_gana_el_menor_id(self):
+        admin = self.usuarios[Profile.ROLE_ADMIN]
+        otro = User.objects.create_user("otro", " Admin@Liberalia.test ", "otra-clave-456")
+        self.assertEqual(otro.profile.email_normalizado, "admin@liberalia.test")
+        self.assertEqual(authenticate(email="admin@liberalia.test", password="clave-segura-123"), admin)
+        self.assertIsNone(authenticate(email="admin@liberalia.test", password="otra-clave-456"))
+        # inactivo el primero, el siguiente toma su lugar
+        User.objects.filter(pk=admin.pk).update(is_active=False)
+        self.assertEqual(authenticate(email="ADMIN@liberalia.test", password="otra-clave-456"), otro)
+
+    def test_cambio_de_email_y_backfill(self):
+        editor = self.usuarios[Profile.ROLE_EDITOR]
+        editor.email = "Nuevo@Liberalia.test"
+        editor.save()
+        self.assertEqual(authenticate(email="nuevo@liberalia.test", password="clave-segura-123"), editor)
+        # un UPDATE directo no dispara la señal: lo corrige backfill_emails
+        User.objects.filter(pk=editor.pk).update(email="directo@liberalia.test")
+        self.assertIsNone(authenticate(email="directo@liberalia.test", password="clave-segura-123"))
+        call_command("backfill_emails", stdout=StringIO())
+        self.assertEqual(authenticate(email="directo@liberalia.test", password="clave-segura-123"), editor)
+
+    def test_login_por_username_sigue_funcionando(self):
+        self.assertEqual(
+            authenticate(username="admin", password="clave-segura-123"), self.usuarios[Profile.ROLE_ADMIN]
+        )
+
+    def test_portada_redirige_por_rol(self):
+        self.login(Profile.ROLE_EDITOR)
+        response = self.get("/", ["django_session", "auth_user"], status=302)
+        self.assertEqual(response.url, "/panel/editor/")
+
+
+@override_settings(THROTTLE={
+    "login_ip": (4, 300), "login_email": (2, 300), "reset_ip": (10, 3600), "reset_email": (2, 3600),
+})
+class ThrottleTests(QueryBudgetTestCase):
+    LOGIN = "/accounts/login/"
+
+    def intento(self, email, password="incorrecta", ip="10.0.0.1"):
+        return self.client.post(self.LOGIN, {"email": email, "password": password}, REMOTE_ADDR=ip)
+
+    def test_bloqueo_por_email_antes_de_calcular_hash(self):
+        for _ in range(2):
+            self.assertEqual(self.intento("admin@liberalia.test").status_code, 200)
+        with CaptureQueriesContext(connection) as ctx, \
+                mock.patch("django.contrib.auth.base_user.check_password") as check_password:
+            response = self.intento("ADMIN@liberalia.test", "clave-segura-123", ip="10.0.0.2")
+        self.assertEqual(response.status_code, 429)
+        self.assertIn("Demasiados intentos", response.content.decode())
+        self.assertEqual((len(ctx), check_password.call_count), (0, 0))
+        self.assertTrue(1 <= int(response["Retry-After"]) <= 301)
+        # otra cuenta desde la misma IP sigue entrando
+        self.assertEqual(self.intento("editor@liberalia.test", "clave-segura-123").status_code, 302)
+
+    def test_bloqueo_por_ip_y_login_correcto_limpia_el_email(self):
+        self.intento("admin@liberalia.test")
+        self.assertEqual(self.intento("admin@liberalia.test", "clave-segura-123").status_code, 302)
+        self.assertEqual(self.intento("admin@liberalia.test").status_code, 200)  # balde del email vacío
+        self.assertEqual(self.intento("nadie@liberalia.test").status_code, 200)
+        self.assertEqual(self.intento("otro@liberalia.test").status_code, 429)  # 4 intentos de la IP
+        self.assertEqual(self.intento("otro@liberalia.test", ip="10.0.0.9").status_code, 200)
+
+    def test_recuperacion_limitada_por_email(self):
+        for _ in range(2):
+            self.client.post("/accounts/password_reset/", {"email": "admin@liberalia.test"})
+        response = self.client.post("/accounts/password_reset/", {"email": "admin@liberalia.test"})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_contadores_y_desbloqueo_en_el_admin(self):
+        for _ in range(3):
+            self.intento("admin@liberalia.test")
+        admin = self.usuarios[Profile.ROLE_ADMIN]
+        self.assertEqual(self.client.get("/accounts/limites/").status_code, 302)  # sin login → admin login
+        User.objects.filter(pk=admin.pk).update(is_staff=True)
+        self.login(Profile.ROLE_ADMIN)
+        response = self.client.get("/accounts/limites/")
+        reglas = {regla["nombre"]: regla for regla in response.context["reglas"]}
+        self.assertEqual((reglas["login_email"]["intentos"], reglas["login_email"]["bloqueos"]), (2, 1))
+        self.assertEqual(response.context["recientes"][0]["ident"], "admin@liberalia.test")
+
+        self.client.post("/accounts/limites/", {"ident": "Admin@Liberalia.test"})
+        self.client.logout()
+        self.assertEqual(self.intento("admin@liberalia.test", "clave-segura-123").status_code, 302)
+
+    def test_ventana_deslizante_en_el_cambio_de_ventana(self):
+        email, inicio = "x@liberalia.test", 3000.0  # inicio de una ventana de 300 s
+        for _ in range(2):
+            throttle.registrar("login_email", email, inicio - 1)
+        # recién abierta la ventana nueva, la anterior pesa casi entera: un intento más y bloquea
+        self.assertEqual(throttle.espera([("login_email", email)], inicio + 1), 0)
+        throttle.registrar("login_email", email, inicio + 1)
+        segundos = throttle.espera([("login_email", email)], inicio + 1)
+        self.assertTrue(150 <= segundos <= 152)  # 2·(1 - t/300) + 1 < 2 ⇒ t > 150
+        self.assertEqual(throttle.espera([("login_email", email)], inicio + 1 + segundos), 0)
+        throttle.limpiar("login_email", email, inicio + 1)
+        self.assertEqual(throttle.espera([("login_email", email)], inicio + 1), 0)
+
+    def test_check_de_cache_no_atomica(self):
+        filebased = {"default": {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache"}}
+        memcached = {"default": {"BACKEND": "django.core.cache.backends.memcached.PyMemcacheCache"}}
+        with override_settings(CACHES=filebased):
+            self.assertEqual([aviso.id for aviso in throttle.check_cache()], ["accounts.W001"])
+            with override_settings(THROTTLE={}):
+                self.assertEqual(throttle.check_cache(), [])
+        with override_settings(CACHES=memcached):
+            self.assertEqual(throttle.check_cache(), [])
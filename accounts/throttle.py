@@ -0,0 +1,192 @@
+"""
+Límite de intentos de login y de recuperación de contraseña.
+
+Cada intento de login calcula un hash PBKDF2 y cada recuperación puede
+mandar un correo: una ráfaga de intentos ocupa a los pocos workers de
+Passenger y deja esperando a los usuarios reales. Por eso se cuentan los
+intentos por IP y por email, y al superar el límite se responde de
+inmediato (429) ANTES de tocar contraseñas o SMTP.
+
+Reglas (settings.THROTTLE): nombre → (máximo de intentos, ventana en s).
+Cada regla es una ventana deslizante por identificador (IP o email): se
+cuentan los intentos de la ventana fija actual y de la anterior, y la
+anterior pesa la fracción que aún se solapa con los últimos `ventana`
+segundos. Así una ráfaga justo antes y justo después de un cambio de
+ventana no pasa del doble del máximo, y el bloqueo se levanta de a poco.
+Los contadores viven en la cache con clave "<regla>:<identificador>:<nº de
+ventana>", se crean con add() y se suman con incr(), y expiran solos a las
+dos ventanas; no hay nada que limpiar.
+
+add()/incr() sólo son atómicos (y compartidos entre los procesos de
+Passenger) en memcached o redis. Con la cache por archivos de la
+configuración por defecto dos intentos simultáneos pueden contarse como
+uno, y con locmem cada proceso lleva su propia cuenta: el límite queda
+aproximado. `manage.py check --deploy` avisa (accounts.W001) si THROTTLE
+está activo sobre una cache así; ver CACHE_BACKEND en settings.
+
+Contadores para el admin (intentos / bloqueos por regla y los últimos
+bloqueos): ver contadores() y la vista accounts:limites.
+"""
+
+import hashlib
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+PREFIX = "accounts:throttle:"
+RECIENTES_KEY = PREFIX + "recientes"
+MAX_RECIENTES = 50
+
+
+def reglas() -> dict:
+    return settings.THROTTLE
+
+
+def ip_de(request) -> str:
+    return request.META.get("REMOTE_ADDR") or ""
+
+
+# ----------------------------
+# Baldes
+# ----------------------------
+def _clave(regla: str, ident: str, n: int) -> str:
+    # identificador hasheado: claves cortas y válidas para memcached
+    digest = hashlib.sha1(ident.encode()).hexdigest()[:20]
+    return f"{PREFIX}{regla}:{digest}:{n}"
+
+
+def _espera(limite: int, ventana: int, actual: int, anterior: int, ahora: float) -> int:
+    """
+    Segundos hasta que la estimación anterior·(1 - t/ventana) + actual baje
+    del límite (0 si ya está por debajo). Si la ventana actual está llena,
+    hay que esperar a que cierre y pase a ser la anterior.
+    """
+    transcurrido = ahora % ventana
+    if anterior * (1 - transcurrido / ventana) + actual < limite:
+        return 0
+    if actual < limite:
+        t = ventana * (1 - (limite - actual) / anterior)
+        return max(1, math.ceil(t - transcurrido) + 1)
+    return math.ceil(ventana - transcurrido + ventana * (1 - limite / actual)) + 1
+
+
+def espera(pares, ahora: float | None = None) -> int:
+    """
+    Segundos que faltan para poder reintentar (0 si ninguna regla está
+    excedida). `pares` son (regla, identificador); los identificadores
+    vacíos se ignoran. Una sola lectura a la cache (get_many).
+    """
+    ahora = time.time() if ahora is None else ahora
+    baldes = []
+    for regla, ident in pares:
+        if ident:
+            _, ventana = reglas()[regla]
+            n = int(ahora // ventana)
+            baldes.append((regla, ident, _clave(regla, ident, n), _clave(regla, ident, n - 1)))
+    valores = cache.get_many([clave for *_, actual, anterior in baldes for clave in (actual, anterior)])
+    segundos = 0
+    for regla, ident, actual, anterior in baldes:
+        limite, ventana = reglas()[regla]
+        s = _espera(limite, ventana, valores.get(actual, 0), valores.get(anterior, 0), ahora)
+        if s:
+            segundos = max(segundos, s)
+            _bloqueo(regla, ident)
+    return segundos
+
+
+def registrar(regla: str, ident: str, ahora: float | None = None) -> int:
+    """Suma un intento al balde de `ident`; devuelve cuántos lleva en la ventana actual."""
+    if not ident:
+        return 0
+    ahora = time.time() if ahora is None else ahora
+    _, ventana = reglas()[regla]
+    clave = _clave(regla, ident, int(ahora // ventana))
+    # vive dos ventanas: la actual y la siguiente, donde es "la anterior"
+    cache.add(clave, 0, 2 * ventana)
+    try:
+        n = cache.incr(clave)
+    except ValueError:  # expiró entre add() e incr()
+        cache.add(clave, 1, 2 * ventana)
+        n = 1
+    _sumar(f"intentos:{regla}")
+    return n
+
+
+def limpiar(regla: str, ident: str, ahora: float | None = None) -> None:
+    """Vacía los baldes de `ident` (login correcto, desbloqueo desde el admin)."""
+    if ident:
+        ahora = time.time() if ahora is None else ahora
+        _, ventana = reglas()[regla]
+        n = int(ahora // ventana)
+        cache.delete_many([_clave(regla, ident, n), _clave(regla, ident, n - 1)])
+
+
+def desbloquear(ident: str) -> None:
+    """Vacía los baldes de `ident` en todas las reglas."""
+    for regla in reglas():
+        limpiar(regla, ident)
+
+
+# ----------------------------
+# Contadores (admin)
+# ----------------------------
+def _sumar(nombre: str) -> None:
+    key = PREFIX + "total:" + nombre
+    try:
+        cache.incr(key)
+    except ValueError:  # clave inexistente (o expulsada)
+        cache.add(key, 0, None)
+        cache.incr(key)
+
+
+def _bloqueo(regla: str, ident: str) -> None:
+    _sumar(f"bloqueos:{regla}")
+    # lista informativa para el admin: no necesita ser atómica
+    recientes = cache.get(RECIENTES_KEY) or []
+    recientes.insert(0, {"regla": regla, "ident": ident, "cuando": timezone.now()})
+    cache.set(RECIENTES_KEY, recientes[:MAX_RECIENTES], None)
+
+
+def contadores() -> dict:
+    """{'reglas': [{nombre, limite, ventana, intentos, bloqueos}], 'recientes': [...]}."""
+    claves = [PREFIX + f"total:{tipo}:{regla}" for regla in reglas() for tipo in ("intentos", "bloqueos")]
+    valores = cache.get_many(claves + [RECIENTES_KEY])
+    filas = []
+    for regla, (limite, ventana) in reglas().items():
+        filas.append({
+            "nombre": regla, "limite": limite, "ventana": ventana,
+            "intentos": valores.get(PREFIX + f"total:intentos:{regla}", 0),
+            "bloqueos": valores.get(PREFIX + f"total:bloqueos:{regla}", 0),
+        })
+    return {"reglas": filas, "recientes": valores.get(RECIENTES_KEY, [])}
+
+
+def reiniciar_contadores() -> None:
+    cache.delete_many(
+        [PREFIX + f"total:{tipo}:{regla}" for regla in reglas() for tipo in ("intentos", "bloqueos")]
+        + [RECIENTES_KEY]
+    )
+
+
+# ----------------------------
+# Check de despliegue
+# ----------------------------
+ATOMICAS = ("memcached", "redis")
+
+
+def check_cache(app_configs=None, **kwargs) -> list:
+    """accounts.W001: THROTTLE activo sobre una cache sin incr() atómico y compartido."""
+    from django.core.checks import Warning
+
+    backend = settings.CACHES.get("default", {}).get("BACKEND", "")
+    if not getattr(settings, "THROTTLE", None) or any(nombre in backend.lower() for nombre in ATOMICAS):
+        return []
+    return [Warning(
+        f"THROTTLE cuenta intentos en {backend}, sin incr() atómico ni compartido entre procesos: "
+        "el límite de intentos queda aproximado.",
+        hint="Configura CACHE_BACKEND con memcached o redis (ver .env.example).",
+        id="accounts.W001",
+    )]
@@ -7,6 +7,7 @@ básica de usuarios dentro del sistema. Incluye:
 - Login: acceso mediante correo electrónico y contraseña.
 - Logout: cierre de sesión del usuario autenticado.
 - Cambio de contraseña: flujo para actualizar la contraseña desde la cuenta activa.
+- Límites: contadores del límite de intentos (solo staff).
 
 El uso del atributo 'app_name' permite referirse a estas rutas de manera
 explícita con el prefijo 'accounts:', facilitando su reutilización en
@@ -15,7 +16,7 @@ plantillas, redirecciones y vistas.
 
 from django.urls import path, reverse_lazy
 from django.contrib.auth import views as auth_views
-from .views import LoginView, logout_view, home
+from .views import LoginView, limites, logout_view, home
 
 # Definimos el namespace de la app para poder referirnos a sus URLs de forma explícita
 app_name = 'accounts'
@@ -30,6 +31,9 @@ urlpatterns = [
     # Podemos referirnos a esta URL como 'accounts:logout'
     path('logout/', logout_view, name='logout'),
 
+    # Contadores del límite de intentos de login / recuperación (solo staff)
+    path('limites/', limites, name='limites'),
+
 
     # --- NUEVO: cambio de contraseña para usuario autenticado ---
     path(
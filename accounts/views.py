@@ -3,6 +3,8 @@ Módulo de vistas para la aplicación 'accounts'.
 
 Este archivo gestiona las operaciones principales de autenticación de usuarios:
 - Inicio de sesión mediante correo electrónico y contraseña.
+- Límite de intentos de login y de recuperación de contraseña (throttle.py),
+  con una vista de contadores para el staff.
 - Cierre de sesión del usuario autenticado.
 - Redirección automática al panel correspondiente según el rol del perfil 
   (Administrador, Editor o Consultor).
@@ -12,17 +14,19 @@ garantizando seguridad y una experiencia personalizada para cada usuario.
 """
 
 
-from django.contrib import messages
-from django.contrib.auth import authenticate, login, logout, get_user_model
+from django.contrib import admin, messages
+from django.contrib.admin.views.decorators import staff_member_required
+from django.contrib.auth import authenticate, login, logout
+from django.contrib.auth import views as auth_views
 from django.http import HttpResponse
 from django.shortcuts import render, redirect
 from django.views import View
 
-from .forms import EmailLoginForm  
+from roles.models import normalizar_email
 
+from . import throttle
+from .forms import EmailLoginForm  
 
-# Obtenemos el modelo de usuario activo en el proyecto
-User = get_user_model()
 
 # --------------------------------------------------------------------------
 # Vista basada en clases para manejar el login por email
@@ -38,6 +42,14 @@ class LoginView(View):
         return render(request, self.template_name, {'form': EmailLoginForm()})
 
     def post(self, request):
+        # Límite de intentos por IP y por cuenta: se revisa antes de validar o
+        # calcular hashes, así una ráfaga de intentos no ocupa los workers
+        ip, email = throttle.ip_de(request), normalizar_email(request.POST.get('email'))
+        segundos = throttle.espera([('login_ip', ip), ('login_email', email)])
+        if segundos:
+            return _bloqueado(request, self.template_name, {'form': EmailLoginForm(request.POST)}, segundos)
+        throttle.registrar('login_ip', ip)
+
         # Recibimos los datos del formulario
         form = EmailLoginForm(request.POST)
         if not form.is_valid():
@@ -49,22 +61,61 @@ class LoginView(View):
         email = form.cleaned_data['email'].strip().lower()
         password = form.cleaned_data['password']
 
-        # Intentamos obtener el usuario por email y autenticarlo
-        try:
-            user = User.objects.get(email__iexact=email)
-            user_auth = authenticate(request, username=user.username, password=password)
-        except User.DoesNotExist:
-            user_auth = None
+        # Autenticamos por email en una sola consulta (roles.backends.ProfileModelBackend)
+        user_auth = authenticate(request, email=email, password=password)
 
         # Si la autenticación falla, mostramos mensaje de error
         if user_auth is None:
+            throttle.registrar('login_email', email)
             messages.error(request, 'Correo o contraseña inválidos.')
             return render(request, self.template_name, {'form': form})
 
         # Si la autenticación es correcta, hacemos login
+        throttle.limpiar('login_email', email)
         login(request, user_auth)        
         return redirect('/')
 
+# --------------------------------------------------------------------------
+# Recuperación de contraseña con límite de intentos (cada envío es SMTP)
+# --------------------------------------------------------------------------
+class ThrottledPasswordResetView(auth_views.PasswordResetView):
+    def post(self, request, *args, **kwargs):
+        ip, email = throttle.ip_de(request), normalizar_email(request.POST.get('email'))
+        segundos = throttle.espera([('reset_ip', ip), ('reset_email', email)])
+        if segundos:
+            return _bloqueado(request, self.template_name, self.get_context_data(), segundos)
+        throttle.registrar('reset_ip', ip)
+        throttle.registrar('reset_email', email)
+        return super().post(request, *args, **kwargs)
+
+
+def _bloqueado(request, template_name, context, segundos):
+    """Respuesta 429 (sin hash ni correo) con el tiempo de espera."""
+    minutos = -(-segundos // 60)
+    messages.error(request, f'Demasiados intentos. Vuelve a intentarlo en {minutos} minuto{"s" if minutos > 1 else ""}.')
+    response = render(request, template_name, context, status=429)
+    response['Retry-After'] = str(segundos)
+    return response
+
+
+# --------------------------------------------------------------------------
+# Contadores del límite de intentos (solo staff)
+# --------------------------------------------------------------------------
+@staff_member_required
+def limites(request):
+    if request.method == 'POST':
+        if request.POST.get('accion') == 'reiniciar':
+            throttle.reiniciar_contadores()
+            messages.success(request, 'Contadores reiniciados.')
+        elif request.POST.get('ident'):
+            ident = request.POST['ident'].strip()
+            throttle.desbloquear(normalizar_email(ident) if '@' in ident else ident)
+            messages.success(request, f'{ident} desbloqueado.')
+        return redirect('accounts:limites')
+    context = {**admin.site.each_context(request), 'title': 'Límite de intentos', **throttle.contadores()}
+    return render(request, 'accounts/limites.html', context)
+
+
 # --------------------------------------------------------------------------
 # Función para cerrar sesión
 # --------------------------------------------------------------------------
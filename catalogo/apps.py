@@ -20,3 +20,7 @@ from django.apps import AppConfig
 class CatalogoConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'catalogo'
+
+    def ready(self):
+        # Registramos las señales que mantienen el índice de búsqueda
+        import catalogo.signals
@@ -0,0 +1,72 @@
+"""
+Payload cacheado del detalle de ficha.
+
+La ficha completa (identificadores, ficha técnica, condiciones comerciales y
+media) se arma con UNA consulta (LibroFicha + editorial; tipo de tapa,
+idioma, país y moneda salen de la cache de referencias) y se guarda ya
+renderizada en la cache de Django, por ISBN-13 canónico. Las visitas
+siguientes a la misma ficha no tocan la base ni renderizan el bloque.
+
+Invalidación (catalogo/signals.py): al guardar/borrar la ficha se borra su
+entrada (también la del ISBN anterior si cambió); al renombrar la editorial,
+las de sus libros. Un cambio en los catálogos de referencia cambia su sello
+y el payload guardado con el sello anterior se descarta al leerlo.
+"""
+
+from django.core.cache import cache
+from django.template.loader import render_to_string
+
+from liberalia.routers import alias_lectura
+from . import referencias
+from .isbn import normalizar_isbn, q_por_isbn
+from .models import LibroFicha
+from .version import version_catalogo
+
+DETALLE_TIMEOUT = 60 * 60 * 24
+FRAGMENTO = "catalogo/_ficha.html"
+
+
+def _clave(isbn13: str) -> str:
+    return f"catalogo:ficha:{isbn13}"
+
+
+def invalidar(*isbn13s) -> None:
+    """Descarta los payloads de esos ISBN-13 (los None se ignoran)."""
+    claves = [_clave(i) for i in isbn13s if i]
+    if claves:
+        cache.delete_many(claves)
+
+
+def _armar(obj) -> dict:
+    return {
+        "pk": obj.pk,
+        "isbn": obj.isbn,
+        "isbn13": obj.isbn13,
+        "titulo": obj.titulo,
+        "actualizado": obj.actualizado,
+        "html": render_to_string(FRAGMENTO, {"obj": obj}),
+        "ref_version": referencias.version(),
+    }
+
+
+def payload_ficha(isbn: str) -> dict | None:
+    """
+    Payload del detalle para `isbn` (cualquier formato) o None si no existe:
+    {'pk', 'isbn', 'isbn13', 'titulo', 'actualizado', 'html', 'ref_version'}.
+    """
+    canonico = normalizar_isbn(isbn)
+    if canonico:
+        payload = cache.get(_clave(canonico))
+        if payload is not None and payload["ref_version"] == referencias.version():
+            return payload
+
+    # réplica si hay, salvo justo después de un cambio (el payload se cachea)
+    alias = alias_lectura(version_catalogo())
+    obj = LibroFicha.objects.using(alias).select_related("editorial").filter(q_por_isbn(isbn)).first()
+    if obj is None:
+        return None
+    referencias.adjuntar([obj])  # tipo_tapa / idioma / país / moneda desde memoria
+    payload = _armar(obj)
+    if obj.isbn13:
+        cache.set(_clave(obj.isbn13), payload, DETALLE_TIMEOUT)
+    return payload
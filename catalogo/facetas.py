@@ -0,0 +1,215 @@
+"""
+Facetas y totales del panel desde la tabla resumen ConteoFaceta.
+
+Contar con COUNT(*) / GROUP BY sobre el catálogo en cada vista del panel
+recorre todas las fichas del alcance. En su lugar, ConteoFaceta guarda
+cuántas fichas hay por (editorial, mes de edición, idioma, tipo de tapa) y
+se mantiene de forma incremental:
+
+- señales de LibroFicha (catalogo/signals.py): al guardar se resta la
+  combinación anterior (leída en pre_save) y se suma la nueva; al borrar
+  se resta. Un save(update_fields=...) sin campos de CAMPOS se salta,
+- importación masiva (importacion.guardar_lote): bulk_create no emite
+  señales, así que se calcula la diferencia del lote completo.
+
+Los UPDATE masivos (queryset.update()) no pasan por ninguno de los dos:
+después de uno, `manage.py reconstruir_facetas` rehace la tabla.
+
+Lectura:
+- resumen(editorial_ids) → facetas del alcance (editoriales, años / meses,
+  idiomas, tapas) con una consulta a la tabla resumen, cacheadas por sello
+  de versión del catálogo y alcance.
+- total(resumen, q, desde, hasta) → fichas que cumplen los filtros del panel
+  ADMIN / CONSULTOR (editorial por nombre y rango de fechas) sin tocar el
+  catálogo; solo los meses cortados por el rango se cuentan en LibroFicha
+  (rango acotado sobre el índice de fecha_edicion).
+"""
+
+import calendar
+import hashlib
+import json
+from collections import Counter, defaultdict
+from datetime import date
+
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import TruncMonth
+
+from liberalia.routers import alias_lectura
+from .models import ConteoFaceta, LibroFicha
+from . import search
+from .version import marcar_cambio, version_catalogo
+
+# Vida máxima del resumen cacheado (s); el sello de versión lo invalida antes
+TIMEOUT = 10 * 60
+
+
+def _mes(fecha) -> date:
+    if isinstance(fecha, str):
+        fecha = date.fromisoformat(fecha[:10])
+    return fecha.replace(day=1)
+
+
+def _fin_de_mes(mes: date) -> date:
+    return mes.replace(day=calendar.monthrange(mes.year, mes.month)[1])
+
+
+# Campos de la ficha que forman su combinación (nombre y columna)
+CAMPOS = frozenset({
+    "editorial", "editorial_id", "fecha_edicion",
+    "idioma_original", "idioma_original_id", "tipo_tapa", "tipo_tapa_id",
+})
+
+
+def clave(libro) -> tuple:
+    """Combinación (editorial_id, mes, idioma_id, tipo_tapa_id) de una ficha."""
+    return (libro.editorial_id, _mes(libro.fecha_edicion), libro.idioma_original_id, libro.tipo_tapa_id)
+
+
+# ----------------------------
+# Mantención
+# ----------------------------
+def claves_guardadas(qs) -> Counter:
+    """Combinaciones de las fichas de `qs` tal como están en la base."""
+    filas = qs.values_list("editorial_id", "fecha_edicion", "idioma_original_id", "tipo_tapa_id")
+    return Counter((e, _mes(f), i, t) for e, f, i, t in filas)
+
+
+def sumar(deltas) -> None:
+    """Aplica {combinación: ±n} a la tabla: un UPDATE por combinación (INSERT si es nueva)."""
+    for (editorial_id, mes, idioma_id, tipo_tapa_id), n in deltas.items():
+        if not n:
+            continue
+        fila = {"editorial_id": editorial_id, "mes": mes, "idioma_id": idioma_id, "tipo_tapa_id": tipo_tapa_id}
+        if ConteoFaceta.objects.filter(**fila).update(n=F("n") + n) or n < 0:
+            continue
+        try:
+            with transaction.atomic():
+                ConteoFaceta.objects.create(n=n, **fila)
+        except IntegrityError:  # otro proceso la creó entre el UPDATE y el INSERT
+            ConteoFaceta.objects.filter(**fila).update(n=F("n") + n)
+
+
+def reconstruir() -> int:
+    """Rehace la tabla completa desde LibroFicha (un GROUP BY); devuelve las filas creadas."""
+    grupos = (
+        LibroFicha.objects.annotate(mes=TruncMonth("fecha_edicion"))
+        .values("editorial_id", "mes", "idioma_original_id", "tipo_tapa_id")
+        .annotate(n=Count("pk"))
+        .order_by()  # sin Meta.ordering, que se sumaría al GROUP BY
+    )
+    with transaction.atomic():
+        ConteoFaceta.objects.all().delete()
+        creadas = ConteoFaceta.objects.bulk_create(
+            (
+                ConteoFaceta(
+                    editorial_id=g["editorial_id"], mes=_mes(g["mes"]), idioma_id=g["idioma_original_id"],
+                    tipo_tapa_id=g["tipo_tapa_id"], n=g["n"],
+                )
+                for g in grupos.iterator()
+            ),
+            batch_size=1000,
+        )
+    marcar_cambio()
+    return len(creadas)
+
+
+# ----------------------------
+# Lectura
+# ----------------------------
+def _clave_cache(editorial_ids, version: int) -> str:
+    crudo = json.dumps([sorted(editorial_ids) if editorial_ids is not None else None, version])
+    return "catalogo:facetas:" + hashlib.sha1(crudo.encode()).hexdigest()
+
+
+def resumen(editorial_ids=None) -> dict:
+    """
+    Facetas de las fichas de `editorial_ids` (todas con None):
+    {'alcance', 'total', 'editoriales': [{id, nombre, n}], 'anios': [(año, n)],
+     'meses': {año: [(inicio, fin, n)]}, 'idiomas': [(nombre, n)],
+     'tapas': [(nombre, n)], 'celdas': {(editorial_id, mes): n}}
+    Las listas van de mayor a menor (años y meses, del más reciente).
+    """
+    version = version_catalogo()
+    key = _clave_cache(editorial_ids, version)
+    datos = cache.get(key)
+    if datos is not None:
+        return datos
+
+    qs = ConteoFaceta.objects.using(alias_lectura(version)).filter(n__gt=0)
+    if editorial_ids is not None:
+        qs = qs.filter(editorial_id__in=editorial_ids)
+    filas = qs.values_list("editorial_id", "editorial__nombre", "mes", "idioma__nombre", "tipo_tapa__nombre", "n")
+
+    editoriales, nombres, meses = Counter(), {}, Counter()
+    idiomas, tapas, celdas = Counter(), Counter(), Counter()
+    for editorial_id, nombre, mes, idioma, tapa, n in filas:
+        editoriales[editorial_id] += n
+        nombres[editorial_id] = nombre
+        meses[mes] += n
+        idiomas[idioma] += n
+        tapas[tapa] += n
+        celdas[(editorial_id, mes)] += n
+
+    anios, por_anio = Counter(), defaultdict(list)
+    for mes, n in sorted(meses.items(), reverse=True):
+        anios[mes.year] += n
+        por_anio[mes.year].append((mes, _fin_de_mes(mes), n))
+
+    datos = {
+        "alcance": sorted(editorial_ids) if editorial_ids is not None else None,
+        "total": sum(editoriales.values()),
+        "editoriales": [{"id": e, "nombre": nombres[e], "n": n} for e, n in editoriales.most_common()],
+        "anios": sorted(anios.items(), reverse=True),
+        "meses": dict(por_anio),
+        "idiomas": idiomas.most_common(),
+        "tapas": tapas.most_common(),
+        "celdas": dict(celdas),
+    }
+    cache.set(key, datos, TIMEOUT)
+    return datos
+
+
+def _calza(terminos, nombre: str) -> bool:
+    """Mismo criterio que search.filtrar: cada palabra es prefijo de alguna del nombre."""
+    palabras = search.normalizar(nombre)
+    return all(any(p.startswith(t) for p in palabras) for t in terminos)
+
+
+def total(datos: dict, q: str = "", desde: date | None = None, hasta: date | None = None) -> int:
+    """
+    Fichas de `datos` (un resumen()) de las editoriales que calzan con `q`
+    y con fecha de edición entre `desde` y `hasta` (ambas inclusive).
+    """
+    if desde and hasta and desde > hasta:
+        return 0
+    terminos = search.normalizar(q)
+    ids = [e["id"] for e in datos["editoriales"] if not terminos or _calza(terminos, e["nombre"])]
+    if not terminos and desde is None and hasta is None:
+        return datos["total"]
+
+    elegidas = set(ids)
+    n, parciales = 0, set()
+    for (editorial_id, mes), cuantos in datos["celdas"].items():
+        if editorial_id not in elegidas:
+            continue
+        fin = _fin_de_mes(mes)
+        if (desde and fin < desde) or (hasta and mes > hasta):
+            continue  # fuera del rango
+        if (desde and mes < desde) or (hasta and fin > hasta):
+            parciales.add(mes)  # el rango corta el mes: se cuenta en el catálogo
+            continue
+        n += cuantos
+
+    if parciales:
+        rangos = Q()
+        for mes in parciales:
+            inicio = max(mes, desde) if desde else mes
+            fin = min(_fin_de_mes(mes), hasta) if hasta else _fin_de_mes(mes)
+            rangos |= Q(fecha_edicion__gte=inicio, fecha_edicion__lte=fin)
+        qs = LibroFicha.objects.using(alias_lectura(version_catalogo())).filter(rangos)
+        if terminos or datos["alcance"] is not None:
+            qs = qs.filter(editorial_id__in=ids)
+        n += qs.count()
+    return n
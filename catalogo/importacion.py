@@ -0,0 +1,415 @@
+"""
+Importación masiva de fichas (LibroFicha) desde CSV u ONIX 3.0.
+
+Pensada para archivos de decenas de miles de títulos:
+- El archivo se lee en streaming (csv.DictReader / iterparse), fila a fila.
+- Cada fila se valida por separado: ISBN con dígito verificador, códigos ISO
+  contra Pais / Moneda / Idioma y nombre de TipoTapa (desde la cache de
+  referencias) y editorial (mapa precargado). Una fila con errores se informa
+  y se salta, sin abortar el resto.
+- Las filas válidas se escriben por lotes, un upsert por lote con clave en
+  isbn13 (ISBN-13 canónico) dentro de una transacción, y luego se reindexa
+  el lote en el índice de búsqueda y se invalida su detalle cacheado. Las
+  fichas nuevas guardan el ISBN canónico en `isbn`; las que ya existían
+  conservan su `isbn` tal como estaba (p. ej. con guiones).
+- Una fila cuyo ISBN ya es el `isbn` de OTRA ficha (una antigua sin isbn13,
+  p. ej. un duplicado que backfill_isbn13 dejó sin clave) se informa como
+  error de esa fila. Si aun así el lote choca con una clave única, se
+  reintenta fila a fila y solo las que fallan quedan como error.
+- En modo prueba (dry_run) solo se valida y se cuenta qué se crearía o
+  actualizaría, sin escribir.
+- Con un directorio de portadas, codigo_imagen es el nombre del archivo de
+  la portada en ese directorio: se guarda por hash de contenido y al final
+  se generan las miniaturas en un pool de procesos (ver portadas.py).
+
+Columnas CSV (encabezado = nombre del campo; las FK van por código o nombre):
+    isbn, ean, editorial (id o nombre), titulo, subtitulo, autor,
+    autor_prologo, traductor, ilustrador, tipo_tapa (nombre), numero_paginas,
+    alto_cm, ancho_cm, grosor_cm, peso_gr, idioma_original (ISO 639-1),
+    numero_edicion, fecha_edicion (AAAA-MM-DD o DD/MM/AAAA),
+    pais_edicion (ISO 3166-1), numero_impresion, tematica, precio,
+    moneda (ISO 4217), descuento_distribuidor, resumen_libro,
+    codigo_imagen, rango_etario
+"""
+
+import csv
+from collections import Counter
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+from xml.etree.ElementTree import iterparse
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, connection, transaction
+
+from roles.models import Editorial
+from . import detalle, facetas, portadas, referencias, search
+from .isbn import normalizar_isbn
+from .version import marcar_cambio
+from .models import Idioma, LibroFicha, Moneda, Pais, TipoTapa
+
+LOTE = 1000
+
+# Campos que se escriben en cada upsert (todo menos id)
+CAMPOS = [
+    f.name for f in LibroFicha._meta.concrete_fields if not f.primary_key
+]
+# Campos de texto (nombre, obligatorio)
+TEXTOS = [
+    ("titulo", True), ("subtitulo", False), ("autor", True),
+    ("autor_prologo", False), ("traductor", False), ("ilustrador", False),
+    ("ean", False), ("tematica", False), ("resumen_libro", True),
+    ("codigo_imagen", False), ("rango_etario", False),
+]
+ENTEROS = [
+    ("numero_paginas", True), ("peso_gr", False),
+    ("numero_edicion", True), ("numero_impresion", False),
+]
+DECIMALES = [
+    ("alto_cm", False), ("ancho_cm", False), ("grosor_cm", False),
+    ("precio", True), ("descuento_distribuidor", True),
+]
+
+
+class ErrorFila(ValueError):
+    """Fila inválida: el mensaje se informa y la importación sigue."""
+
+
+# ----------------------------
+# Conversión / validación de valores
+# ----------------------------
+def _texto(fila, campo, obligatorio):
+    valor = (fila.get(campo) or "").strip()
+    if obligatorio and not valor:
+        raise ErrorFila(f"{campo}: obligatorio")
+    return valor or None
+
+
+def _entero(fila, campo, obligatorio):
+    valor = _texto(fila, campo, obligatorio)
+    if valor is None:
+        return None
+    try:
+        return int(valor)
+    except ValueError:
+        raise ErrorFila(f"{campo}: '{valor}' no es un entero")
+
+
+def _decimal(fila, campo, obligatorio):
+    valor = _texto(fila, campo, obligatorio)
+    if valor is None:
+        return None
+    try:
+        return Decimal(valor.replace(",", "."))
+    except InvalidOperation:
+        raise ErrorFila(f"{campo}: '{valor}' no es un número")
+
+
+def _fecha(fila, campo):
+    valor = _texto(fila, campo, True)
+    for formato in ("%Y-%m-%d", "%d/%m/%Y", "%Y%m%d"):
+        try:
+            return datetime.strptime(valor, formato).date()
+        except ValueError:
+            pass
+    raise ErrorFila(f"{campo}: fecha '{valor}' inválida (use AAAA-MM-DD)")
+
+
+def _referencia(fila, campo, modelo, por_nombre=False):
+    valor = _texto(fila, campo, True)
+    obj = referencias.por_nombre(modelo, valor) if por_nombre else referencias.por_codigo(modelo, valor)
+    if obj is None:
+        raise ErrorFila(f"{campo}: '{valor}' no existe en {modelo._meta.verbose_name}")
+    return obj.pk
+
+
+class Importador:
+    """
+    Valida y escribe fichas por lotes. Uso:
+        resumen = Importador(dry_run=False).procesar(leer_csv(ruta))
+    `procesar` recibe pares (número de fila, dict) y devuelve
+    {'creadas', 'actualizadas', 'errores': [(fila, isbn, mensaje), ...],
+     'avisos': [...], 'miniaturas'}.
+    Los avisos (portada faltante o ilegible) no descartan la fila.
+    """
+
+    def __init__(self, dry_run=False, lote=LOTE, progreso=None, portadas=None, procesos=None):
+        self.dry_run = dry_run
+        self.lote = lote
+        self.progreso = progreso  # callable(resumen) tras cada lote
+        self.dir_portadas = Path(portadas).resolve() if portadas else None
+        self.procesos = procesos  # pool de miniaturas (None = núcleos disponibles)
+        self.codigos_portada = set()
+        self.resumen = {"creadas": 0, "actualizadas": 0, "errores": [], "avisos": [], "miniaturas": 0}
+        # editoriales por id y por nombre (mayúsculas), una sola consulta
+        self.editoriales = {}
+        self.nombres_editorial = {}
+        for pk, nombre in Editorial.objects.values_list("pk", "nombre"):
+            self.editoriales[str(pk)] = pk
+            self.editoriales.setdefault(nombre.strip().upper(), pk)
+            self.nombres_editorial[pk] = nombre
+
+    def validar(self, fila: dict) -> LibroFicha:
+        """Convierte una fila en LibroFicha (sin guardar) o lanza ErrorFila."""
+        isbn = _texto(fila, "isbn", True)
+        isbn13 = normalizar_isbn(isbn)
+        if isbn13 is None:
+            raise ErrorFila(f"isbn: '{isbn}' no es un ISBN-10/13 válido")
+
+        editorial = _texto(fila, "editorial", True)
+        editorial_id = self.editoriales.get(editorial) or self.editoriales.get(editorial.upper())
+        if editorial_id is None:
+            raise ErrorFila(f"editorial: '{editorial}' no existe")
+
+        datos = {
+            "isbn": isbn13,
+            "isbn13": isbn13,
+            "editorial_id": editorial_id,
+            "fecha_edicion": _fecha(fila, "fecha_edicion"),
+            "tipo_tapa_id": _referencia(fila, "tipo_tapa", TipoTapa, por_nombre=True),
+            "idioma_original_id": _referencia(fila, "idioma_original", Idioma),
+            "pais_edicion_id": _referencia(fila, "pais_edicion", Pais),
+            "moneda_id": _referencia(fila, "moneda", Moneda),
+        }
+        datos.update({campo: _texto(fila, campo, o) for campo, o in TEXTOS})
+        datos.update({campo: _entero(fila, campo, o) for campo, o in ENTEROS})
+        datos.update({campo: _decimal(fila, campo, o) for campo, o in DECIMALES})
+
+        if self.dir_portadas and datos["codigo_imagen"] and not portadas.es_codigo(datos["codigo_imagen"]):
+            datos["codigo_imagen"] = self._portada(isbn13, datos["codigo_imagen"])
+
+        libro = LibroFicha(**datos)
+        try:
+            # validadores de modelo (largos, rangos); FK y unicidad ya se resolvieron
+            libro.clean_fields(exclude=["editorial", "tipo_tapa", "idioma_original", "pais_edicion", "moneda"])
+        except ValidationError as e:
+            raise ErrorFila("; ".join(f"{k}: {' '.join(v)}" for k, v in e.message_dict.items()))
+        return libro
+
+    def _portada(self, isbn13, nombre):
+        """Código de la portada `nombre` (archivo del directorio de portadas)."""
+        ruta = (self.dir_portadas / nombre).resolve()
+        if not ruta.is_file() or not ruta.is_relative_to(self.dir_portadas):
+            self.resumen["avisos"].append((isbn13, f"portada '{nombre}' no encontrada"))
+            return nombre
+        if self.dry_run:
+            return nombre
+        try:
+            codigo = portadas.guardar_archivo(ruta)
+        except (portadas.PortadaInvalida, OSError) as e:
+            self.resumen["avisos"].append((isbn13, f"portada '{nombre}': {e}"))
+            return nombre
+        self.codigos_portada.add(codigo)
+        return codigo
+
+    def procesar(self, filas) -> dict:
+        pendientes = {}
+        for numero, fila in filas:
+            try:
+                libro = self.validar(fila)
+            except ErrorFila as e:
+                self.resumen["errores"].append((numero, (fila.get("isbn") or "").strip(), str(e)))
+                continue
+            libro._fila = numero
+            pendientes[libro.isbn13] = libro  # un ISBN repetido en el lote: gana la última fila
+            if len(pendientes) >= self.lote:
+                self._guardar(list(pendientes.values()))
+                pendientes = {}
+        if pendientes:
+            self._guardar(list(pendientes.values()))
+        if self.codigos_portada:
+            # portadas idénticas de varias fichas se procesan una vez
+            self.resumen["miniaturas"] = portadas.generar_en_paralelo(self.codigos_portada, self.procesos)
+        return self.resumen
+
+    def _error(self, libro, mensaje):
+        self.resumen["errores"].append((libro._fila, libro.isbn13, mensaje))
+
+    def _sin_conflictos(self, libros):
+        """Saca (como error de su fila) las fichas cuyo `isbn` ya es de otra ficha sin esa clave."""
+        tomados = dict(
+            LibroFicha.objects.filter(isbn__in=[l.isbn for l in libros]).values_list("isbn", "isbn13")
+        )
+        libres = []
+        for libro in libros:
+            if libro.isbn in tomados and tomados[libro.isbn] != libro.isbn13:
+                self._error(libro, f"isbn: '{libro.isbn}' ya es de otra ficha sin clave ISBN-13 (ver backfill_isbn13)")
+            else:
+                libres.append(libro)
+        return libres
+
+    def _guardar_de_a_uno(self, libros):
+        """Reintento fila a fila de un lote que chocó con una clave única; devuelve las guardadas."""
+        guardadas = []
+        for libro in libros:
+            try:
+                guardar_lote([libro], self.nombres_editorial)
+            except IntegrityError as e:
+                self._error(libro, f"no se pudo guardar: {e}")
+            else:
+                guardadas.append(libro)
+        return guardadas
+
+    def _guardar(self, libros):
+        libros = self._sin_conflictos(libros)
+        existentes = set(
+            LibroFicha.objects.filter(isbn13__in=[l.isbn13 for l in libros]).values_list("isbn13", flat=True)
+        )
+        if libros and not self.dry_run:
+            try:
+                guardar_lote(libros, self.nombres_editorial)
+            except IntegrityError:
+                libros = self._guardar_de_a_uno(libros)
+        # se cuentan solo las escritas (o las que se escribirían, en prueba)
+        actualizadas = sum(l.isbn13 in existentes for l in libros)
+        self.resumen["actualizadas"] += actualizadas
+        self.resumen["creadas"] += len(libros) - actualizadas
+        if self.progreso:
+            self.progreso(self.resumen)
+
+
+def guardar_lote(libros, nombres_editorial) -> None:
+    """
+    Upsert de un lote de LibroFicha (con isbn13 ya calculado) en una
+    transacción, y reindexación de sus términos de búsqueda y de los
+    conteos de facetas.
+    `nombres_editorial` ({id: nombre}) evita leer las editoriales para el índice.
+    """
+    # `isbn` no se reescribe: una ficha existente conserva el ISBN tal como se cargó
+    upsert = {"update_conflicts": True, "update_fields": [c for c in CAMPOS if c not in ("isbn", "isbn13")]}
+    if connection.features.supports_update_conflicts_with_target:
+        upsert["unique_fields"] = ["isbn13"]  # SQLite/PostgreSQL; MySQL usa ON DUPLICATE KEY
+    with transaction.atomic():
+        # facetas: lo que el upsert va a reemplazar, para sumar solo la diferencia
+        deltas = Counter(facetas.clave(l) for l in libros)
+        deltas.subtract(facetas.claves_guardadas(LibroFicha.objects.filter(isbn13__in=[l.isbn13 for l in libros])))
+        LibroFicha.objects.bulk_create(libros, **upsert)
+        # el upsert no devuelve ids en todos los motores: se leen por la clave
+        ids = dict(
+            LibroFicha.objects.filter(isbn13__in=[l.isbn13 for l in libros]).values_list("isbn13", "pk")
+        )
+        search.indexar_filas(
+            (ids[l.isbn13], l.titulo, l.subtitulo, l.autor, nombres_editorial[l.editorial_id], l.tematica)
+            for l in libros
+        )
+        facetas.sumar(deltas)
+    # bulk_create no emite señales: se invalidan a mano el detalle cacheado
+    # y el sello de versión del catálogo (al confirmar, como en signals.py)
+    def invalidar():
+        detalle.invalidar(*ids)
+        marcar_cambio()
+
+    transaction.on_commit(invalidar)
+
+
+# ----------------------------
+# Lectores (streaming)
+# ----------------------------
+def leer_csv(ruta, delimitador=",", encoding="utf-8-sig"):
+    """Pares (número de línea, fila) de un CSV con encabezado."""
+    with open(ruta, newline="", encoding=encoding) as f:
+        lector = csv.DictReader(f, delimiter=delimitador)
+        for fila in lector:
+            yield lector.line_num, fila
+
+
+# ONIX 3.0 (nombres de etiqueta "reference"). Solo los códigos que usa la ficha.
+ONIX_IDIOMAS = {  # ISO 639-2/B → ISO 639-1
+    "spa": "es", "eng": "en", "fre": "fr", "fra": "fr", "por": "pt", "ita": "it",
+    "ger": "de", "deu": "de", "cat": "ca", "glg": "gl", "baq": "eu", "eus": "eu",
+}
+ONIX_TAPAS = {"BB": "Tapa dura", "BC": "Rústica"}  # ProductForm → TipoTapa.nombre
+ONIX_CONTRIBUTORS = {"A01": "autor", "A15": "autor_prologo", "B06": "traductor", "A12": "ilustrador"}
+ONIX_MEDIDAS = {"01": "alto_cm", "02": "ancho_cm", "03": "grosor_cm", "08": "peso_gr"}
+
+
+def _tag(elem) -> str:
+    return elem.tag.rsplit("}", 1)[-1]  # sin namespace
+
+
+def _hijos(elem, nombre):
+    return [e for e in elem.iter() if _tag(e) == nombre]
+
+
+def _txt(elem, nombre):
+    for e in elem.iter():
+        if _tag(e) == nombre and e.text:
+            return e.text.strip()
+    return None
+
+
+def _onix_a_fila(product) -> dict:
+    """Traduce un <Product> ONIX 3.0 a las columnas de la importación CSV."""
+    fila = {}
+    for ident in _hijos(product, "ProductIdentifier"):
+        tipo, valor = _txt(ident, "ProductIDType"), _txt(ident, "IDValue")
+        if tipo == "15":
+            fila["isbn"] = valor
+        elif tipo == "03":
+            fila["ean"] = valor
+    fila.setdefault("isbn", fila.get("ean"))
+
+    fila["titulo"] = _txt(product, "TitleText")
+    fila["subtitulo"] = _txt(product, "Subtitle")
+    for contrib in _hijos(product, "Contributor"):
+        campo = ONIX_CONTRIBUTORS.get(_txt(contrib, "ContributorRole"))
+        nombre = _txt(contrib, "PersonName") or _txt(contrib, "CorporateName")
+        if campo and nombre:
+            fila[campo] = f"{fila[campo]}; {nombre}" if fila.get(campo) else nombre
+
+    fila["tipo_tapa"] = ONIX_TAPAS.get(_txt(product, "ProductForm"), _txt(product, "ProductForm"))
+    for extent in _hijos(product, "Extent"):
+        if _txt(extent, "ExtentType") in ("00", "11"):
+            fila["numero_paginas"] = _txt(extent, "ExtentValue")
+    for medida in _hijos(product, "Measure"):
+        campo = ONIX_MEDIDAS.get(_txt(medida, "MeasureType"))
+        valor, unidad = _txt(medida, "Measurement"), _txt(medida, "MeasureUnitCode")
+        if campo and valor:
+            if unidad == "mm":
+                try:
+                    valor = str(_decimal({campo: valor}, campo, False) / 10)
+                except ErrorFila:
+                    pass  # queda tal cual: validar() lo informa como error de la fila
+            fila[campo] = valor
+
+    idiomas = {_txt(l, "LanguageRole"): _txt(l, "LanguageCode") for l in _hijos(product, "Language")}
+    codigo = idiomas.get("02") or idiomas.get("01")  # idioma original, o el del texto
+    fila["idioma_original"] = ONIX_IDIOMAS.get((codigo or "").lower(), codigo)
+    fila["numero_edicion"] = _txt(product, "EditionNumber") or "1"
+    fila["tematica"] = _txt(product, "SubjectHeadingText")
+    fila["rango_etario"] = _txt(product, "AudienceRangeValue")
+    for texto in _hijos(product, "TextContent"):
+        if _txt(texto, "TextType") == "03":
+            fila["resumen_libro"] = _txt(texto, "Text")
+
+    fila["editorial"] = _txt(product, "PublisherName")
+    fila["pais_edicion"] = _txt(product, "CountryOfPublication")
+    for fecha in _hijos(product, "PublishingDate"):
+        if _txt(fecha, "PublishingDateRole") in ("01", None):
+            fila["fecha_edicion"] = _txt(fecha, "Date")
+
+    fila["precio"] = _txt(product, "PriceAmount")
+    fila["moneda"] = _txt(product, "CurrencyCode")
+    fila["descuento_distribuidor"] = _txt(product, "DiscountPercent") or "0"
+    return fila
+
+
+def leer_onix(ruta):
+    """
+    Pares (número de producto, fila) de un archivo ONIX 3.0. Cada <Product>
+    se vacía y se saca de su padre al procesarlo, así la memoria no crece
+    con el archivo.
+    """
+    numero = 0
+    abiertos = []  # elementos abiertos (el último es el padre del que se cierra)
+    for evento, elem in iterparse(ruta, events=("start", "end")):
+        if evento == "start":
+            abiertos.append(elem)
+            continue
+        abiertos.pop()
+        if _tag(elem) == "Product":
+            numero += 1
+            yield numero, _onix_a_fila(elem)
+            elem.clear()
+            if abiertos:
+                abiertos[-1].remove(elem)
@@ -0,0 +1,59 @@
+"""
+Normalización de ISBN.
+
+Todo ISBN válido (ISBN-10 o ISBN-13, con o sin guiones/espacios) se lleva a
+una forma canónica: los 13 dígitos del ISBN-13 con su dígito verificador
+comprobado. Es la clave que guarda LibroFicha.isbn13 y por la que se hacen
+las búsquedas exactas (una sola comparación de igualdad sobre índice único).
+"""
+
+import re
+
+from django.db.models import Q
+
+_NO_ISBN = re.compile(r"[^0-9X]")
+
+
+def limpiar(raw: str | None) -> str:
+    """Deja solo dígitos y 'X' final (mayúscula): ' 978-956-12 ' → '97895612'."""
+    return _NO_ISBN.sub("", (raw or "").upper())
+
+
+def digito_isbn13(primeros12: str) -> str:
+    """Dígito verificador de un ISBN-13 a partir de sus 12 primeros dígitos."""
+    total = sum(int(c) * (3 if i % 2 else 1) for i, c in enumerate(primeros12))
+    return str((10 - total % 10) % 10)
+
+
+def _isbn10_valido(d: str) -> bool:
+    if not re.fullmatch(r"\d{9}[\dX]", d):
+        return False
+    total = sum((10 - i) * (10 if c == "X" else int(c)) for i, c in enumerate(d))
+    return total % 11 == 0
+
+
+def normalizar_isbn(raw: str | None) -> str | None:
+    """
+    Devuelve el ISBN-13 canónico (13 dígitos) o None si `raw` no es un ISBN
+    válido. Acepta ISBN-10 ('956-11-1234-X') y lo convierte a 978-.
+    """
+    d = limpiar(raw)
+    if len(d) == 10:
+        if not _isbn10_valido(d):
+            return None
+        base = "978" + d[:9]
+        return base + digito_isbn13(base)
+    if len(d) == 13 and d.isdigit() and d[:3] in ("978", "979"):
+        return d if digito_isbn13(d[:12]) == d[12] else None
+    return None
+
+
+def q_por_isbn(raw: str | None) -> Q:
+    """
+    Filtro exacto por ISBN: por la clave canónica si `raw` es válido y, si no,
+    por el valor tal cual (registros antiguos con ISBN no normalizable).
+    """
+    canonico = normalizar_isbn(raw)
+    if canonico:
+        return Q(isbn13=canonico)
+    return Q(isbn=(raw or "").strip())
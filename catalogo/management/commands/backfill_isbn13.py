@@ -0,0 +1,67 @@
+"""
+Completa LibroFicha.isbn13 (ISBN-13 canónico) para las fichas existentes.
+
+Uso:
+    python manage.py backfill_isbn13 [--lote 1000] [--todos]
+
+Por defecto solo procesa las fichas con isbn13 vacío; con --todos recalcula
+todas. Informa los ISBN inválidos y los que colisionan con otra ficha (mismo
+libro cargado dos veces con distinto formato), que quedan sin clave.
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from catalogo.isbn import normalizar_isbn
+from catalogo.models import LibroFicha
+
+
+class Command(BaseCommand):
+    help = "Completa la clave canónica isbn13 de LibroFicha."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=1000, help="Fichas por lote (default 1000).")
+        parser.add_argument("--todos", action="store_true", help="Recalcula también las que ya tienen isbn13.")
+
+    def handle(self, *args, **options):
+        lote = options["lote"]
+        qs = LibroFicha.objects.order_by("pk")
+        if not options["todos"]:
+            qs = qs.filter(isbn13__isnull=True)
+
+        ultimo, actualizados, invalidos, duplicados = 0, 0, 0, 0
+        while True:
+            batch = list(qs.filter(pk__gt=ultimo).only("pk", "isbn", "isbn13")[:lote])
+            if not batch:
+                break
+            canonicos = {libro.pk: normalizar_isbn(libro.isbn) for libro in batch}
+            # claves ya tomadas por otras fichas (una consulta por lote)
+            usados = dict(
+                LibroFicha.objects.filter(isbn13__in=[c for c in canonicos.values() if c])
+                .values_list("isbn13", "pk")
+            )
+            cambios = []
+            for libro in batch:
+                canonico = canonicos[libro.pk]
+                if canonico is None:
+                    invalidos += 1
+                    self.stderr.write(f"  ISBN inválido (id={libro.pk}): {libro.isbn!r}")
+                elif usados.get(canonico, libro.pk) != libro.pk:
+                    duplicados += 1
+                    self.stderr.write(
+                        f"  ISBN duplicado (id={libro.pk}): {libro.isbn!r} = ficha id={usados[canonico]}"
+                    )
+                    canonico = None
+                else:
+                    usados[canonico] = libro.pk
+                if libro.isbn13 != canonico:
+                    libro.isbn13 = canonico
+                    cambios.append(libro)
+            with transaction.atomic():
+                LibroFicha.objects.bulk_update(cambios, ["isbn13"])
+            actualizados += len(cambios)
+            ultimo = batch[-1].pk
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Listo: {actualizados} actualizadas, {invalidos} inválidas, {duplicados} duplicadas."
+        ))
@@ -0,0 +1,164 @@
+"""
+Genera un catálogo sintético para reproducir volúmenes de producción en local.
+
+Uso:
+    python manage.py generar_catalogo --libros 1000000 --editoriales 300
+    python manage.py generar_catalogo --libros 20000 --editores 10 --seed 7
+
+Crea (si faltan) los catálogos de referencia, N editoriales, usuarios de
+cada rol (bench_admin_1, bench_editor_1, bench_consultor_1, ... con la
+clave --password), vínculos UsuarioEditorial y las fichas, con
+distribuciones parecidas a las reales:
+- tamaño de editorial tipo Zipf (pocas grandes, muchas chicas),
+- fechas de edición cargadas a los últimos años,
+- páginas y precios log-normales, descuento en torno a 30 %,
+- idioma mayoritariamente español.
+
+Las fichas se escriben por lotes con la misma ruta que la importación
+masiva (upsert por isbn13 + índice de búsqueda).
+"""
+
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from catalogo.importacion import guardar_lote
+from catalogo.isbn import digito_isbn13
+from catalogo.models import Idioma, LibroFicha, Moneda, Pais, TipoTapa
+from catalogo import referencias
+from roles.models import Editorial, Profile, UsuarioEditorial
+
+PAISES = [("CL", "Chile"), ("AR", "Argentina"), ("ES", "España"), ("MX", "México"), ("CO", "Colombia"), ("PE", "Perú")]
+MONEDAS = [("CLP", "Peso chileno", "$"), ("USD", "Dólar", "US$"), ("EUR", "Euro", "€"), ("ARS", "Peso argentino", "$")]
+IDIOMAS = [("es", "Español"), ("en", "Inglés"), ("fr", "Francés"), ("pt", "Portugués"), ("it", "Italiano"), ("de", "Alemán")]
+TAPAS = ["Rústica", "Tapa dura", "Rústica con solapas", "Bolsillo"]
+
+PALABRAS = (
+    "amor guerra noche mar ciudad sombra tiempo memoria silencio fuego viento río casa jardín "
+    "historia secreto camino luz tierra sueño muerte vida invierno verano niño mujer hombre "
+    "montaña desierto isla libro palabra voz mundo último primer largo breve oscuro claro"
+).split()
+NOMBRES = "Ana José María Luis Carmen Pedro Isabel Juan Sofía Diego Elena Pablo Valentina Andrés".split()
+APELLIDOS = "González Muñoz Rojas Díaz Pérez Soto Contreras Silva Martínez Sepúlveda Morales Fuentes".split()
+TEMATICAS = ["Novela", "Poesía", "Ensayo", "Infantil", "Historia", "Ciencia", "Cuento", "Biografía", "Juvenil"]
+
+
+def _isbn(numero: int) -> str:
+    """ISBN-13 válido con prefijo 979-8 (rango no asignado en Chile) a partir de un correlativo."""
+    base = f"9798{numero:08d}"
+    return base + digito_isbn13(base)
+
+
+class Command(BaseCommand):
+    help = "Genera editoriales, usuarios y fichas sintéticas para pruebas de carga."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--libros", type=int, default=100_000)
+        parser.add_argument("--editoriales", type=int, default=100)
+        parser.add_argument("--admins", type=int, default=1)
+        parser.add_argument("--editores", type=int, default=5)
+        parser.add_argument("--consultores", type=int, default=5)
+        parser.add_argument("--password", default="bench")
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--lote", type=int, default=2000)
+
+    def handle(self, *args, **o):
+        rnd = random.Random(o["seed"])
+        self._referencias()
+        editoriales = self._editoriales(o["editoriales"])
+        self._usuarios(rnd, editoriales, o)
+
+        # pesos tipo Zipf para repartir libros entre editoriales
+        pesos = [1 / (i + 1) ** 1.1 for i in range(len(editoriales))]
+        nombres = {e.pk: e.nombre for e in editoriales}
+        ref = {
+            "tapa": [t.pk for t in referencias.todos(TipoTapa)],
+            "pais": [p.pk for p in referencias.todos(Pais)],
+            "moneda": {m.code: m.pk for m in referencias.todos(Moneda)},
+            "idioma": {i.code: i.pk for i in referencias.todos(Idioma)},
+        }
+        inicio = LibroFicha.objects.count()
+        hoy = date.today()
+        lote = []
+        for n in range(o["libros"]):
+            lote.append(self._libro(rnd, inicio + n, editoriales, pesos, ref, hoy))
+            if len(lote) >= o["lote"]:
+                guardar_lote(lote, nombres)
+                lote = []
+                self.stdout.write(f"  {n + 1} fichas…")
+        if lote:
+            guardar_lote(lote, nombres)
+        self.stdout.write(self.style.SUCCESS(
+            f"Listo: {len(editoriales)} editoriales, {o['libros']} fichas generadas."
+        ))
+
+    def _referencias(self):
+        for code, nombre in PAISES:
+            Pais.objects.get_or_create(code=code, defaults={"nombre": nombre})
+        for code, nombre, simbolo in MONEDAS:
+            Moneda.objects.get_or_create(code=code, defaults={"nombre": nombre, "simbolo": simbolo})
+        for code, nombre in IDIOMAS:
+            Idioma.objects.get_or_create(code=code, defaults={"nombre": nombre})
+        for nombre in TAPAS:
+            TipoTapa.objects.get_or_create(nombre=nombre)
+        referencias.invalidar()
+
+    def _editoriales(self, cantidad):
+        existentes = list(Editorial.objects.filter(nombre__startswith="Editorial Sintética").order_by("pk"))
+        faltan = [
+            Editorial(nombre=f"Editorial Sintética {i + 1}", id_fiscal=f"76.{i:03d}.000-{i % 10}")
+            for i in range(len(existentes), cantidad)
+        ]
+        Editorial.objects.bulk_create(faltan)
+        return list(Editorial.objects.filter(nombre__startswith="Editorial Sintética").order_by("pk"))[:cantidad]
+
+    def _usuarios(self, rnd, editoriales, o):
+        User = get_user_model()
+        for role, cantidad in ((Profile.ROLE_ADMIN, o["admins"]), (Profile.ROLE_EDITOR, o["editores"]),
+                               (Profile.ROLE_CONSULTOR, o["consultores"])):
+            for i in range(cantidad):
+                username = f"bench_{role.lower()}_{i + 1}"
+                user, creado = User.objects.get_or_create(
+                    username=username, defaults={"email": f"{username}@example.com"}
+                )
+                if creado:
+                    user.set_password(o["password"])
+                    user.save()
+                Profile.objects.filter(user=user).update(role=role)
+                if role == Profile.ROLE_EDITOR:
+                    # cada editor ve entre 1 y 3 editoriales
+                    for editorial in rnd.sample(editoriales, min(len(editoriales), rnd.randint(1, 3))):
+                        UsuarioEditorial.objects.get_or_create(user=user, editorial=editorial)
+
+    def _libro(self, rnd, numero, editoriales, pesos, ref, hoy):
+        isbn = _isbn(numero)
+        moneda = rnd.choices(["CLP", "USD", "EUR", "ARS"], weights=[70, 15, 10, 5])[0]
+        precio = Decimal(round(rnd.lognormvariate(9.6, 0.4))) if moneda in ("CLP", "ARS") \
+            else Decimal(round(rnd.lognormvariate(3.0, 0.4), 2))
+        codigos = list(ref["idioma"])
+        idioma = rnd.choices(codigos, weights=[80 if c == "es" else 4 for c in codigos])[0]
+        dias = int(rnd.triangular(0, 365 * 40, 0))
+        return LibroFicha(
+            isbn=isbn,
+            isbn13=isbn,
+            editorial_id=rnd.choices(editoriales, weights=pesos)[0].pk,
+            titulo=" ".join(rnd.sample(PALABRAS, rnd.randint(1, 4))).capitalize(),
+            subtitulo=" ".join(rnd.sample(PALABRAS, 3)) if rnd.random() < 0.3 else None,
+            autor=f"{rnd.choice(NOMBRES)} {rnd.choice(APELLIDOS)}",
+            tipo_tapa_id=rnd.choice(ref["tapa"]),
+            numero_paginas=max(16, int(rnd.lognormvariate(5.3, 0.45))),
+            alto_cm=Decimal(rnd.choice(["21.00", "23.00", "17.50", "15.00"])),
+            ancho_cm=Decimal(rnd.choice(["14.00", "15.50", "11.00", "13.50"])),
+            idioma_original_id=ref["idioma"][idioma],
+            numero_edicion=rnd.choices([1, 2, 3, 4], weights=[80, 12, 5, 3])[0],
+            fecha_edicion=hoy - timedelta(days=dias),
+            pais_edicion_id=rnd.choice(ref["pais"]),
+            tematica=rnd.choice(TEMATICAS),
+            precio=precio,
+            moneda_id=ref["moneda"][moneda],
+            descuento_distribuidor=Decimal(str(round(min(99.9, max(0, rnd.gauss(30, 8))), 1))),
+            resumen_libro=" ".join(rnd.choices(PALABRAS, k=40)),
+        )
@@ -0,0 +1,37 @@
+"""
+Genera las miniaturas de portada que falten (WebP/JPEG, ver catalogo/portadas.py).
+
+Uso:
+    python manage.py generar_portadas                 # solo las que falten
+    python manage.py generar_portadas --forzar        # regenera todas (p. ej. cambió TAMANOS)
+    python manage.py generar_portadas --procesos 4
+
+Recorre los codigo_imagen de las fichas que son códigos de portada y
+reparte el trabajo en un pool de procesos.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from catalogo import portadas
+from catalogo.models import LibroFicha
+
+
+class Command(BaseCommand):
+    help = "Genera en paralelo las miniaturas de portada de las fichas."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--procesos", type=int, help="Procesos del pool (default: núcleos).")
+        parser.add_argument("--forzar", action="store_true", help="Regenera aunque ya existan.")
+
+    def handle(self, *args, **options):
+        codigos = set(
+            LibroFicha.objects.exclude(codigo_imagen__isnull=True).exclude(codigo_imagen="")
+            .values_list("codigo_imagen", flat=True).distinct()
+        )
+        inicio = time.monotonic()
+        escritas = portadas.generar_en_paralelo(codigos, options["procesos"], options["forzar"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Listo: {escritas} miniaturas de {len(codigos)} portadas ({time.monotonic() - inicio:.1f} s)."
+        ))
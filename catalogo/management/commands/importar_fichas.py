@@ -0,0 +1,99 @@
+"""
+Importa fichas de libros (LibroFicha) desde un archivo CSV u ONIX 3.0.
+
+Uso:
+    python manage.py importar_fichas archivo.csv
+    python manage.py importar_fichas catalogo.xml --formato onix
+    python manage.py importar_fichas archivo.csv --dry-run --delimitador ";"
+    python manage.py importar_fichas archivo.csv --portadas /ruta/portadas --procesos 4
+    python manage.py importar_fichas archivo.csv --encolar admin   # en segundo plano (procesar_trabajos)
+
+Las filas con errores se informan (línea, ISBN, motivo) sin abortar la
+carga; las válidas se crean o actualizan por ISBN en lotes. Una ficha que
+ya existe conserva su campo isbn tal como estaba (con o sin guiones); las
+nuevas lo guardan como ISBN-13 sin guiones. Ver catalogo/importacion.py
+para las columnas aceptadas.
+"""
+
+import os
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from catalogo.importacion import LOTE, Importador, leer_csv, leer_onix
+from roles import trabajos
+from roles.models import Trabajo
+
+
+class Command(BaseCommand):
+    help = "Importa fichas de libros desde CSV u ONIX 3.0 (upsert por ISBN, por lotes)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("archivo", help="Ruta del archivo a importar.")
+        parser.add_argument("--formato", choices=["csv", "onix"], help="Por defecto se deduce de la extensión.")
+        parser.add_argument("--delimitador", default=",", help="Separador CSV (default ',').")
+        parser.add_argument("--encoding", default="utf-8-sig", help="Codificación CSV (default utf-8-sig).")
+        parser.add_argument("--lote", type=int, default=LOTE, help=f"Fichas por transacción (default {LOTE}).")
+        parser.add_argument("--dry-run", action="store_true", help="Solo valida; no escribe en la base.")
+        parser.add_argument("--portadas", metavar="DIR",
+                            help="Directorio de portadas (codigo_imagen = nombre de archivo en DIR).")
+        parser.add_argument("--procesos", type=int, help="Procesos para generar miniaturas (default: núcleos).")
+        parser.add_argument("--encolar", metavar="USUARIO",
+                            help="No importa ahora: crea un trabajo a nombre de USUARIO para procesar_trabajos.")
+
+    def handle(self, *args, **options):
+        ruta = options["archivo"]
+        formato = options["formato"] or ("onix" if ruta.lower().endswith((".xml", ".onx", ".onix")) else "csv")
+        if options["encolar"]:
+            return self._encolar(ruta, formato, options)
+        try:
+            if formato == "onix":
+                filas = leer_onix(ruta)
+            else:
+                filas = leer_csv(ruta, options["delimitador"], options["encoding"])
+
+            inicio = time.monotonic()
+            importador = Importador(
+                dry_run=options["dry_run"],
+                lote=options["lote"],
+                progreso=lambda r: self.stdout.write(
+                    f"  {r['creadas'] + r['actualizadas']} fichas válidas, {len(r['errores'])} con errores…"
+                ),
+                portadas=options["portadas"],
+                procesos=options["procesos"],
+            )
+            resumen = importador.procesar(filas)
+        except OSError as e:
+            raise CommandError(f"No se pudo leer {ruta}: {e}")
+
+        for numero, isbn, mensaje in resumen["errores"]:
+            self.stderr.write(f"  fila {numero} [{isbn or 'sin ISBN'}]: {mensaje}")
+        for isbn, mensaje in resumen["avisos"]:
+            self.stderr.write(f"  aviso [{isbn}]: {mensaje}")
+        if resumen["miniaturas"]:
+            self.stdout.write(f"  {resumen['miniaturas']} miniaturas de portada generadas.")
+
+        total = resumen["creadas"] + resumen["actualizadas"]
+        segundos = time.monotonic() - inicio
+        prefijo = "Prueba (sin escribir)" if options["dry_run"] else "Listo"
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefijo}: {resumen['creadas']} nuevas, {resumen['actualizadas']} actualizadas, "
+            f"{len(resumen['errores'])} con errores ({total / segundos if segundos else total:.0f} fichas/s)."
+        ))
+
+    def _encolar(self, ruta, formato, options):
+        usuario = get_user_model().objects.filter(username=options["encolar"]).first()
+        if usuario is None:
+            raise CommandError(f"No existe el usuario {options['encolar']}.")
+        if not os.path.isfile(ruta):
+            raise CommandError(f"No se pudo leer {ruta}.")
+        trabajo = trabajos.encolar(usuario, Trabajo.IMPORTAR_FICHAS, {
+            "archivo": os.path.abspath(ruta),
+            "formato": formato,
+            "delimitador": options["delimitador"],
+            "encoding": options["encoding"],
+            "dry_run": options["dry_run"],
+            "portadas": os.path.abspath(options["portadas"]) if options["portadas"] else None,
+        })
+        self.stdout.write(self.style.SUCCESS(f"Encolado como trabajo #{trabajo.pk}."))
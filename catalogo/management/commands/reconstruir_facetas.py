@@ -0,0 +1,40 @@
+"""
+Reconstruye la tabla resumen de facetas (ConteoFaceta) desde el catálogo.
+
+Uso:
+    python manage.py reconstruir_facetas
+
+Las señales y la importación masiva la mantienen al día; hace falta después
+de cargar datos por otra vía (UPDATE masivos, SQL directo, loaddata sin
+señales) o para comprobarla: --verificar informa las combinaciones que no
+coinciden con el catálogo sin modificar nada.
+"""
+
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+
+from catalogo import facetas
+from catalogo.models import ConteoFaceta, LibroFicha
+
+
+class Command(BaseCommand):
+    help = "Reconstruye los conteos de facetas del panel (ConteoFaceta)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--verificar", action="store_true", help="Solo compara con el catálogo.")
+
+    def handle(self, *args, **options):
+        if options["verificar"]:
+            esperado = facetas.claves_guardadas(LibroFicha.objects.order_by())
+            guardado = Counter({
+                (c.editorial_id, c.mes, c.idioma_id, c.tipo_tapa_id): c.n
+                for c in ConteoFaceta.objects.filter(n__gt=0)
+            })
+            diferencias = sorted((esperado - guardado) + (guardado - esperado))
+            for combinacion in diferencias:
+                self.stderr.write(f"  {combinacion}: catálogo {esperado[combinacion]}, resumen {guardado[combinacion]}")
+            self.stdout.write(f"{len(diferencias)} combinaciones distintas.")
+            return
+        filas = facetas.reconstruir()
+        self.stdout.write(self.style.SUCCESS(f"Listo: {filas} combinaciones."))
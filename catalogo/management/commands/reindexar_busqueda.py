@@ -0,0 +1,35 @@
+"""
+Reconstruye el índice de búsqueda (TerminoBusqueda) de todas las fichas.
+
+Uso:
+    python manage.py reindexar_busqueda [--lote 1000]
+
+Se recorre el catálogo por lotes ordenados por id, así la memoria no crece
+con el tamaño del catálogo.
+"""
+
+from django.core.management.base import BaseCommand
+
+from catalogo.models import LibroFicha
+from catalogo import search
+
+
+class Command(BaseCommand):
+    help = "Reconstruye el índice de búsqueda de LibroFicha."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=1000, help="Fichas por lote (default 1000).")
+
+    def handle(self, *args, **options):
+        lote = options["lote"]
+        qs = LibroFicha.objects.select_related("editorial").order_by("pk")
+        ultimo, libros, terminos = 0, 0, 0
+        while True:
+            batch = list(qs.filter(pk__gt=ultimo)[:lote])
+            if not batch:
+                break
+            terminos += search.indexar(batch)
+            libros += len(batch)
+            ultimo = batch[-1].pk
+            self.stdout.write(f"  {libros} fichas indexadas…")
+        self.stdout.write(self.style.SUCCESS(f"Listo: {libros} fichas, {terminos} términos."))
@@ -2,6 +2,7 @@
 from django.db import models
 from django.core.validators import RegexValidator, MinValueValidator, MaxValueValidator
 from roles.models import Editorial  # FK existente en app Roles
+from .isbn import normalizar_isbn
 
 # ============================
 # Catálogos 
@@ -87,6 +88,9 @@ class LibroFicha(models.Model):
     # Identificadores
     isbn  = models.CharField(max_length=16, unique=True, db_index=True)   # usado en panel/búsquedas (Largo 16, por si tienes guiones)
     ean   = models.CharField(max_length=16, blank=True, null=True)
+    # ISBN-13 canónico (solo dígitos, verificador validado). Se calcula en save();
+    # queda NULL si 'isbn' no es un ISBN válido. Ver catalogo/isbn.py
+    isbn13 = models.CharField(max_length=13, unique=True, blank=True, null=True, editable=False)
 
     editorial = models.ForeignKey(
         Editorial,
@@ -145,6 +149,9 @@ class LibroFicha(models.Model):
     codigo_imagen = models.CharField(max_length=120, blank=True, null=True) #lo he dejado nuleable 
     rango_etario  = models.CharField(max_length=30, blank=True, null=True)
 
+    # Última modificación (validadores HTTP: Last-Modified / ETag del detalle)
+    actualizado = models.DateTimeField(auto_now=True)
+
     class Meta:
         ordering = ["titulo"]
         indexes = [
@@ -158,3 +165,82 @@ class LibroFicha(models.Model):
 
     def __str__(self) -> str:
         return f"{self.isbn} · {self.titulo}"
+
+    def save(self, *args, **kwargs):
+        # Mantiene la clave canónica sincronizada con el ISBN ingresado
+        # (se recuerda la anterior para invalidar caches si el ISBN cambió)
+        self._isbn13_anterior = self.isbn13
+        self.isbn13 = normalizar_isbn(self.isbn)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "isbn" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "isbn13"}
+        super().save(*args, **kwargs)
+
+
+# ============================
+# ÍNDICE DE BÚSQUEDA
+# ============================
+
+class TerminoBusqueda(models.Model):
+    """
+    Índice invertido de LibroFicha (lo mantiene catalogo/search.py).
+    Una fila por palabra normalizada (minúsculas, sin tildes) de cada campo
+    indexado: título, subtítulo, autor, editorial y temática.
+    """
+    CAMPO_TITULO = "t"
+    CAMPO_SUBTITULO = "s"
+    CAMPO_AUTOR = "a"
+    CAMPO_EDITORIAL = "e"
+    CAMPO_TEMATICA = "m"
+
+    CAMPO_CHOICES = [
+        (CAMPO_TITULO, "Título"),
+        (CAMPO_SUBTITULO, "Subtítulo"),
+        (CAMPO_AUTOR, "Autor"),
+        (CAMPO_EDITORIAL, "Editorial"),
+        (CAMPO_TEMATICA, "Temática"),
+    ]
+
+    termino = models.CharField(max_length=40)
+    campo = models.CharField(max_length=1, choices=CAMPO_CHOICES)
+    peso = models.PositiveSmallIntegerField()  # relevancia del campo
+    libro = models.ForeignKey(LibroFicha, on_delete=models.CASCADE, related_name="terminos")
+
+    class Meta:
+        indexes = [
+            # búsqueda por prefijo de palabra (rango sobre termino)
+            models.Index(fields=["termino", "campo"]),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.termino} ({self.campo}) → {self.libro_id}"
+
+
+# ============================
+# RESUMEN PARA FACETAS
+# ============================
+
+class ConteoFaceta(models.Model):
+    """
+    Cuántas fichas hay por combinación (editorial, mes de edición, idioma,
+    tipo de tapa). Lo mantiene catalogo/facetas.py de forma incremental
+    (señales de LibroFicha e importación masiva); se reconstruye con
+    `manage.py reconstruir_facetas`. De aquí salen los totales y las facetas
+    del panel sin COUNT(*) sobre el catálogo.
+    """
+    editorial = models.ForeignKey(Editorial, on_delete=models.CASCADE, related_name="+")
+    mes = models.DateField()  # primer día del mes de fecha_edicion
+    idioma = models.ForeignKey(Idioma, on_delete=models.CASCADE, related_name="+")
+    tipo_tapa = models.ForeignKey(TipoTapa, on_delete=models.CASCADE, related_name="+")
+    n = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["editorial", "mes", "idioma", "tipo_tapa"],
+                name="unique_conteo_faceta",
+            )
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.editorial_id} {self.mes:%Y-%m} {self.idioma_id}/{self.tipo_tapa_id}: {self.n}"
@@ -0,0 +1,168 @@
+"""
+Portadas de libros (LibroFicha.codigo_imagen).
+
+Almacenamiento direccionado por contenido:
+- El original se guarda una sola vez bajo el SHA-256 de sus bytes
+  (PORTADAS_ROOT/originales/ab/abcd…); dos subidas idénticas comparten
+  archivo. codigo_imagen guarda ese hash (64 hex).
+- De cada original se generan miniaturas de ancho fijo (TAMANOS) en WebP y
+  JPEG: PORTADAS_ROOT/<tamaño>/ab/<hash>.<formato>.
+- Como la URL depende solo del contenido, un archivo nunca cambia: se sirve
+  con Cache-Control "immutable" por un año (ver views.portada).
+
+Las miniaturas se generan en paralelo (pool de procesos) al importar
+(importar_fichas --portadas) o con generar_portadas, y si falta alguna se
+genera en la primera petición que la pide.
+"""
+
+import hashlib
+import os
+import re
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from pathlib import Path
+
+from django.conf import settings
+from django.urls import reverse
+from PIL import Image, UnidentifiedImageError
+
+# Ancho (px) de cada miniatura: panel (fila de la tabla) y detalle de ficha
+TAMANOS = {"mini": 48, "panel": 120, "detalle": 360}
+# formato → (formato de Pillow, content-type, opciones de guardado)
+FORMATOS = {
+    "webp": ("WEBP", "image/webp", {"quality": 80, "method": 4}),
+    "jpg": ("JPEG", "image/jpeg", {"quality": 82, "optimize": True, "progressive": True}),
+}
+CODIGO = re.compile(r"^[0-9a-f]{64}$")
+
+# Límite de píxeles del original (protege de "bombas" de descompresión)
+MAX_PIXELES = 40_000_000
+
+
+class PortadaInvalida(ValueError):
+    """Los bytes recibidos no son una imagen utilizable."""
+
+
+def es_codigo(valor) -> bool:
+    return bool(valor) and bool(CODIGO.match(valor))
+
+
+# ----------------------------
+# Rutas
+# ----------------------------
+def raiz() -> Path:
+    return Path(settings.PORTADAS_ROOT)
+
+
+def ruta_original(codigo: str, base: Path | None = None) -> Path:
+    return (base or raiz()) / "originales" / codigo[:2] / codigo
+
+
+def ruta_derivado(codigo: str, tamano: str, formato: str, base: Path | None = None) -> Path:
+    return (base or raiz()) / tamano / codigo[:2] / f"{codigo}.{formato}"
+
+
+def url(codigo: str, tamano: str, formato: str) -> str:
+    return reverse("catalogo:portada", args=[codigo, tamano, formato])
+
+
+def _escribir(ruta: Path, datos: bytes) -> None:
+    """Escritura atómica (archivo temporal + rename): nunca se sirve un archivo a medias."""
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=ruta.parent, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(datos)
+        os.replace(tmp, ruta)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+# ----------------------------
+# Originales
+# ----------------------------
+def guardar_original(datos: bytes) -> str:
+    """Guarda (si no existe ya) una imagen original; devuelve su código."""
+    codigo = hashlib.sha256(datos).hexdigest()
+    ruta = ruta_original(codigo)
+    if not ruta.exists():
+        try:
+            with Image.open(BytesIO(datos)) as img:
+                if img.width * img.height > MAX_PIXELES:
+                    raise PortadaInvalida(f"imagen demasiado grande ({img.width}x{img.height})")
+                img.verify()
+        except (UnidentifiedImageError, OSError, SyntaxError) as e:
+            raise PortadaInvalida(f"no es una imagen válida: {e}")
+        _escribir(ruta, datos)
+    return codigo
+
+
+def guardar_archivo(ruta) -> str:
+    with open(ruta, "rb") as f:
+        return guardar_original(f.read())
+
+
+# ----------------------------
+# Miniaturas
+# ----------------------------
+def _sin_alfa(img):
+    """JPEG no tiene transparencia: se compone sobre fondo blanco."""
+    if img.mode != "RGBA":
+        return img
+    fondo = Image.new("RGB", img.size, "white")
+    fondo.paste(img, mask=img.getchannel("A"))
+    return fondo
+
+
+def _generar_en(base: Path, codigo: str, forzar: bool = False) -> int:
+    """
+    Genera las miniaturas que falten de `codigo` bajo `base`; devuelve cuántas
+    escribió. Función de módulo (sin Django) para poder correr en el pool.
+    """
+    pendientes = [
+        (tamano, formato) for tamano in TAMANOS for formato in FORMATOS
+        if forzar or not ruta_derivado(codigo, tamano, formato, base).exists()
+    ]
+    if not pendientes:
+        return 0
+    with Image.open(ruta_original(codigo, base)) as img:
+        img.load()
+        img = img.convert("RGBA" if img.mode in ("RGBA", "LA", "P") else "RGB")
+    # de mayor a menor: cada miniatura sale de la anterior (menos píxeles que escalar)
+    fuente = img
+    for tamano in sorted({t for t, _ in pendientes}, key=TAMANOS.get, reverse=True):
+        ancho = TAMANOS[tamano]
+        mini = fuente.copy()
+        mini.thumbnail((ancho, ancho * 4), Image.Resampling.LANCZOS)
+        for t, formato in pendientes:
+            if t != tamano:
+                continue
+            pil, _, opciones = FORMATOS[formato]
+            salida = _sin_alfa(mini) if pil == "JPEG" else mini
+            buffer = BytesIO()
+            salida.save(buffer, pil, **opciones)
+            _escribir(ruta_derivado(codigo, tamano, formato, base), buffer.getvalue())
+        fuente = mini
+    return len(pendientes)
+
+
+def generar(codigo: str, forzar: bool = False) -> int:
+    """Miniaturas de un original, en este proceso (p. ej. en la primera petición)."""
+    return _generar_en(raiz(), codigo, forzar)
+
+
+def generar_en_paralelo(codigos, procesos: int | None = None, forzar: bool = False) -> int:
+    """
+    Miniaturas de varios originales en un pool de procesos (CPU: Pillow).
+    Devuelve el total de archivos escritos.
+    """
+    codigos = sorted({c for c in codigos if es_codigo(c) and ruta_original(c).exists()})
+    if not codigos:
+        return 0
+    if procesos == 1 or len(codigos) == 1:
+        return sum(generar(c, forzar) for c in codigos)
+    base = raiz()
+    with ProcessPoolExecutor(max_workers=procesos) as pool:
+        return sum(pool.map(_generar_en, [base] * len(codigos), codigos, [forzar] * len(codigos), chunksize=8))
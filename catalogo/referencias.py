@@ -0,0 +1,119 @@
+"""
+Cache en memoria (por proceso) de los catálogos de referencia:
+TipoTapa, Pais, Moneda e Idioma.
+
+Son tablas de pocas filas que casi nunca cambian, pero cada ficha las
+referencia por FK. Se cargan completas una vez por proceso y se consultan
+desde memoria por id, por código ISO o por nombre (TipoTapa).
+
+Invalidación: las señales de catalogo/signals.py suben el sello de versión
+"catalogo:referencias" (liberalia.versiones) al guardar/borrar cualquiera de
+ellas. Cada proceso revisa el sello como máximo cada CHECK_INTERVAL segundos
+y, si cambió, recarga las cuatro tablas (4 consultas).
+
+Uso:
+    referencias.obtener(Moneda, libro.moneda_id)   → instancia o None
+    referencias.por_codigo(Pais, "cl")             → instancia o None
+    referencias.por_nombre(TipoTapa, "rústica")    → instancia o None
+    referencias.todos(Idioma)                      → lista ordenada (choices)
+    referencias.adjuntar(libros)                   → resuelve las 4 FK sin consultas
+"""
+
+import threading
+import time
+
+from liberalia.routers import alias_lectura
+from liberalia.versiones import bump_version, get_version
+from .models import Idioma, LibroFicha, Moneda, Pais, TipoTapa
+
+VERSION_NAME = "catalogo:referencias"
+CHECK_INTERVAL = 5  # segundos entre revisiones del sello en cada proceso
+
+MODELOS = (TipoTapa, Pais, Moneda, Idioma)
+
+# FK de LibroFicha que apuntan a catálogos de referencia
+FK_LIBRO = {
+    "tipo_tapa": TipoTapa,
+    "idioma_original": Idioma,
+    "pais_edicion": Pais,
+    "moneda": Moneda,
+}
+
+_lock = threading.Lock()
+_estado = {"version": None, "revisado": 0.0, "tablas": {}}
+
+
+def _clave(texto) -> str:
+    return (texto or "").strip().upper()
+
+
+def _cargar(version: int) -> dict:
+    # réplica si hay, salvo que el cambio que obliga a recargar sea muy reciente
+    alias = alias_lectura(version)
+    tablas = {}
+    for modelo in MODELOS:
+        filas = list(modelo.objects.using(alias).all())  # respeta Meta.ordering
+        tablas[modelo] = {
+            "lista": filas,
+            "id": {obj.pk: obj for obj in filas},
+            "code": {_clave(obj.code): obj for obj in filas if hasattr(obj, "code")},
+            "nombre": {_clave(obj.nombre): obj for obj in filas},
+        }
+    return tablas
+
+
+def _tablas() -> dict:
+    """Tablas vigentes; revisa el sello cada CHECK_INTERVAL s y recarga si cambió."""
+    ahora = time.monotonic()
+    if _estado["tablas"] and ahora - _estado["revisado"] < CHECK_INTERVAL:
+        return _estado["tablas"]
+    with _lock:
+        version = get_version(VERSION_NAME)
+        if version != _estado["version"] or not _estado["tablas"]:
+            _estado["tablas"] = _cargar(version)
+            _estado["version"] = version
+        _estado["revisado"] = ahora
+        return _estado["tablas"]
+
+
+def version() -> int:
+    """Sello de versión de los catálogos (para claves de cache que los incluyan)."""
+    _tablas()
+    return _estado["version"]
+
+
+def invalidar() -> None:
+    """Marca los catálogos como modificados en todos los procesos (y en este, de inmediato)."""
+    bump_version(VERSION_NAME)
+    _estado["revisado"] = 0.0
+
+
+def obtener(modelo, pk):
+    return _tablas()[modelo]["id"].get(pk)
+
+
+def por_codigo(modelo, code):
+    return _tablas()[modelo]["code"].get(_clave(code))
+
+
+def por_nombre(modelo, nombre):
+    return _tablas()[modelo]["nombre"].get(_clave(nombre))
+
+
+def todos(modelo) -> list:
+    return list(_tablas()[modelo]["lista"])
+
+
+def adjuntar(libros) -> None:
+    """
+    Deja resueltas en cada libro las FK a catálogos de referencia desde
+    memoria, así libro.moneda (etc.) no dispara una consulta perezosa.
+    """
+    tablas = _tablas()
+    for nombre, modelo in FK_LIBRO.items():
+        campo = LibroFicha._meta.get_field(nombre)
+        por_id = tablas[modelo]["id"]
+        for libro in libros:
+            obj = por_id.get(getattr(libro, campo.attname))
+            if obj is not None:
+                campo.set_cached_value(libro, obj)
@@ -0,0 +1,195 @@
+"""
+Búsqueda de texto sobre LibroFicha.
+
+Mantiene un índice invertido (modelo TerminoBusqueda) con las palabras de
+título, subtítulo, autor, nombre de editorial y temática, normalizadas para
+español: minúsculas, sin tildes ni diéresis (ñ → n) y sin palabras vacías.
+
+Cada palabra buscada se resuelve como un rango sobre el índice
+(termino, campo), por lo que el costo depende de las coincidencias y no del
+tamaño del catálogo. Se usa el ORM estándar, así que funciona igual en
+MySQL y en SQLite (tests).
+
+API:
+- normalizar(texto)          → lista de términos
+- filtrar(qs, texto, campos) → qs restringido a los libros que contienen
+                               TODAS las palabras (por prefijo)
+- buscar(texto, campos, qs)  → igual que filtrar, anotado con 'rank' y
+                               ordenado por relevancia
+- puntaje(texto, campos)     → la relevancia como subconsulta (el panel la
+                               usa para ?sort=relevancia)
+- indexar(libros) / indexar_editorial(editorial) → mantención del índice
+"""
+
+import re
+import unicodedata
+
+from django.db import connection, transaction
+from django.db.models import Case, F, IntegerField, OuterRef, Q, Subquery, Sum, When
+
+from .models import LibroFicha, TerminoBusqueda
+
+
+# Peso de cada campo en el ranking
+PESOS = {
+    TerminoBusqueda.CAMPO_TITULO: 10,
+    TerminoBusqueda.CAMPO_AUTOR: 8,
+    TerminoBusqueda.CAMPO_EDITORIAL: 6,
+    TerminoBusqueda.CAMPO_SUBTITULO: 4,
+    TerminoBusqueda.CAMPO_TEMATICA: 3,
+}
+
+# Palabras que no aportan a la búsqueda
+STOPWORDS = {
+    "a", "al", "con", "de", "del", "e", "el", "en", "la", "las", "lo", "los",
+    "o", "para", "por", "que", "se", "su", "sus", "u", "un", "una", "unos",
+    "unas", "y",
+}
+
+_NO_ALFANUM = re.compile(r"[^a-z0-9]+")
+_MAX_LARGO = TerminoBusqueda._meta.get_field("termino").max_length
+
+
+def normalizar(texto: str | None) -> list[str]:
+    """'El Niño y la Mar' → ['nino', 'mar'] (sin tildes, sin palabras vacías)."""
+    if not texto:
+        return []
+    plano = unicodedata.normalize("NFKD", texto.lower())
+    plano = "".join(c for c in plano if not unicodedata.combining(c))
+    terminos = []
+    for palabra in _NO_ALFANUM.split(plano):
+        if palabra and palabra not in STOPWORDS and palabra not in terminos:
+            terminos.append(palabra[:_MAX_LARGO])
+    return terminos
+
+
+# ----------------------------
+# Consulta
+# ----------------------------
+def _prefijo_q(termino: str) -> Q:
+    """
+    Términos que empiezan por `termino`. En SQLite LIKE no usa índices, así
+    que se expresa como rango (los términos solo tienen [a-z0-9]); MySQL sí
+    resuelve LIKE 'x%' como rango sobre el índice.
+    """
+    if connection.vendor == "sqlite":
+        return Q(termino__gte=termino, termino__lt=termino + "{")
+    return Q(termino__startswith=termino)
+
+
+def _terminos_qs(termino: str, campos):
+    qs = TerminoBusqueda.objects.filter(_prefijo_q(termino))
+    if campos:
+        qs = qs.filter(campo__in=campos)
+    return qs
+
+
+def filtrar(qs, texto: str, campos=None):
+    """Restringe `qs` a los libros que contienen todas las palabras de `texto`."""
+    for termino in normalizar(texto):
+        qs = qs.filter(pk__in=_terminos_qs(termino, campos).values("libro_id"))
+    return qs
+
+
+def puntaje(texto: str, campos=None) -> Subquery:
+    """
+    Subconsulta correlacionada (sobre OuterRef("pk")) con la relevancia de
+    cada libro para `texto`: suma de los pesos de sus términos que calzan,
+    donde una palabra completa vale el doble que un prefijo. Es NULL para
+    los libros sin coincidencias (filtrar() los deja fuera).
+    """
+    terminos = normalizar(texto)
+    coincide = Q()
+    for termino in terminos:
+        coincide |= _prefijo_q(termino)
+    suma = (
+        TerminoBusqueda.objects.filter(coincide, libro=OuterRef("pk"))
+        .filter(**({"campo__in": campos} if campos else {}))
+        .values("libro")
+        .annotate(total=Sum(Case(
+            When(termino__in=terminos, then=2 * F("peso")),
+            default=F("peso"),
+            output_field=IntegerField(),
+        )))
+        .values("total")
+    )
+    return Subquery(suma, output_field=IntegerField())
+
+
+def buscar(texto: str, campos=None, qs=None):
+    """
+    Libros que contienen todas las palabras de `texto`, anotados con 'rank'
+    (ver puntaje()) y ordenados de más a menos relevante.
+    """
+    qs = filtrar(LibroFicha.objects.all() if qs is None else qs, texto, campos)
+    if not normalizar(texto):
+        return qs.none()
+    return qs.annotate(rank=puntaje(texto, campos)).order_by("-rank", "pk")
+
+
+# ----------------------------
+# Mantención del índice
+# ----------------------------
+def _terminos_de(pk, titulo, subtitulo, autor, editorial, tematica) -> list[tuple]:
+    campos = [
+        (TerminoBusqueda.CAMPO_TITULO, titulo),
+        (TerminoBusqueda.CAMPO_SUBTITULO, subtitulo),
+        (TerminoBusqueda.CAMPO_AUTOR, autor),
+        (TerminoBusqueda.CAMPO_EDITORIAL, editorial),
+        (TerminoBusqueda.CAMPO_TEMATICA, tematica),
+    ]
+    return [
+        (termino, campo, PESOS[campo], pk)
+        for campo, texto in campos
+        for termino in normalizar(texto)
+    ]
+
+
+def _insertar(filas: list[tuple]) -> None:
+    """
+    INSERT masivo de (termino, campo, peso, libro_id) con executemany: en
+    cargas grandes construir instancias del modelo costaba más que escribir.
+    """
+    if not filas:
+        return
+    meta = TerminoBusqueda._meta
+    qn = connection.ops.quote_name
+    columnas = ", ".join(qn(meta.get_field(c).column) for c in ("termino", "campo", "peso", "libro"))
+    sql = f"INSERT INTO {qn(meta.db_table)} ({columnas}) VALUES (%s, %s, %s, %s)"
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, filas)
+
+
+def indexar_filas(filas) -> int:
+    """
+    (Re)indexa a partir de tuplas (pk, titulo, subtitulo, autor,
+    nombre_editorial, tematica), sin necesidad de instancias: lo usa la
+    importación masiva. Reemplaza los términos de esos libros en una sola
+    transacción; devuelve cuántos escribió.
+    """
+    filas = list(filas)
+    if not filas:
+        return 0
+    nuevos = [t for fila in filas for t in _terminos_de(*fila)]
+    with transaction.atomic():
+        TerminoBusqueda.objects.filter(libro_id__in=[fila[0] for fila in filas]).delete()
+        _insertar(nuevos)
+    return len(nuevos)
+
+
+def indexar(libros) -> int:
+    """(Re)indexa los libros dados (idealmente con la editorial ya cargada)."""
+    return indexar_filas(
+        (l.pk, l.titulo, l.subtitulo, l.autor, l.editorial.nombre, l.tematica)
+        for l in libros
+    )
+
+
+def indexar_editorial(editorial) -> None:
+    """Actualiza solo los términos de editorial de sus libros (p. ej. al renombrarla)."""
+    campo = TerminoBusqueda.CAMPO_EDITORIAL
+    terminos = normalizar(editorial.nombre)
+    ids = list(LibroFicha.objects.filter(editorial=editorial).values_list("pk", flat=True))
+    with transaction.atomic():
+        TerminoBusqueda.objects.filter(libro_id__in=ids, campo=campo).delete()
+        _insertar([(t, campo, PESOS[campo], pk) for pk in ids for t in terminos])
@@ -0,0 +1,100 @@
+# -------------------------------------------------------------------------------
+# Señales de la app "catalogo":
+# - Mantienen el índice de búsqueda (TerminoBusqueda) al guardar una ficha o al
+#   renombrar una editorial. Al borrar una ficha sus términos caen por CASCADE.
+# - Invalidan la cache en memoria de catálogos de referencia (referencias.py).
+# - Invalidan el payload cacheado del detalle de ficha (detalle.py).
+# - Suben el sello de versión del catálogo (version.py) con cada escritura de
+#   fichas o editoriales.
+#   Esto y lo anterior, recién al confirmarse la transacción: si no, una
+#   petición concurrente podría guardar en la cache las filas viejas bajo el
+#   sello nuevo (o el payload viejo recién invalidado).
+# - Mantienen la tabla resumen de facetas (ConteoFaceta, ver facetas.py).
+# -------------------------------------------------------------------------------
+
+from collections import Counter
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from roles.models import Editorial
+from .models import Idioma, LibroFicha, Moneda, Pais, TipoTapa
+from . import detalle, facetas, referencias, search
+from .version import marcar_cambio
+
+
+@receiver(post_save, sender=LibroFicha)
+def indexar_ficha(sender, instance, raw=False, **kwargs):
+    """Reindexa la ficha guardada (no aplica al cargar fixtures)."""
+    if not raw:
+        search.indexar([instance])
+    isbns = (instance.isbn13, getattr(instance, "_isbn13_anterior", None))
+    transaction.on_commit(lambda: detalle.invalidar(*isbns))
+
+
+@receiver(post_delete, sender=LibroFicha)
+def invalidar_detalle_ficha(sender, instance, **kwargs):
+    isbn13 = instance.isbn13
+    transaction.on_commit(lambda: detalle.invalidar(isbn13))
+
+
+@receiver(pre_save, sender=LibroFicha)
+def recordar_faceta(sender, instance, update_fields=None, **kwargs):
+    """
+    Combinación de facetas que tenía la ficha en la base (una lectura por
+    pk). Un save(update_fields=...) que no toca esos campos no la cambia:
+    ni se lee ni se cuenta (None).
+    """
+    if update_fields is not None and facetas.CAMPOS.isdisjoint(update_fields):
+        instance._facetas_anteriores = None
+        return
+    anterior = Counter()
+    if instance.pk is not None and not instance._state.adding:
+        anterior = facetas.claves_guardadas(LibroFicha.objects.filter(pk=instance.pk))
+    instance._facetas_anteriores = anterior
+
+
+@receiver(post_save, sender=LibroFicha)
+def contar_faceta(sender, instance, **kwargs):
+    anterior = getattr(instance, "_facetas_anteriores", Counter())
+    if anterior is None:
+        return
+    deltas = Counter([facetas.clave(instance)])
+    deltas.subtract(anterior)
+    facetas.sumar(deltas)
+
+
+@receiver(post_delete, sender=LibroFicha)
+def descontar_faceta(sender, instance, **kwargs):
+    facetas.sumar({facetas.clave(instance): -1})
+
+
+@receiver(post_save, sender=LibroFicha)
+@receiver(post_delete, sender=LibroFicha)
+@receiver(post_save, sender=Editorial)
+@receiver(post_delete, sender=Editorial)
+def marcar_cambio_catalogo(sender, **kwargs):
+    transaction.on_commit(marcar_cambio)
+
+
+@receiver(post_save, sender=Editorial)
+def indexar_editorial(sender, instance, created, raw=False, **kwargs):
+    """Si cambia el nombre de una editorial, sus libros deben encontrarse por el nuevo."""
+    if not created and not raw:
+        search.indexar_editorial(instance)
+        isbns = list(instance.libros.values_list("isbn13", flat=True))
+        transaction.on_commit(lambda: detalle.invalidar(*isbns))
+
+
+@receiver(post_save, sender=TipoTapa)
+@receiver(post_save, sender=Pais)
+@receiver(post_save, sender=Moneda)
+@receiver(post_save, sender=Idioma)
+@receiver(post_delete, sender=TipoTapa)
+@receiver(post_delete, sender=Pais)
+@receiver(post_delete, sender=Moneda)
+@receiver(post_delete, sender=Idioma)
+def invalidar_referencias(sender, **kwargs):
+    """Cambió un catálogo de referencia: todos los procesos deben recargarlos."""
+    referencias.invalidar()
@@ -0,0 +1,27 @@
+"""
+{% portada libro.codigo_imagen "panel" libro.titulo %}
+
+<picture> con la miniatura WebP y JPEG de respaldo (catalogo/portadas.py).
+Si codigo_imagen no es un código de portada, no escribe nada.
+"""
+
+from django import template
+from django.utils.html import format_html
+
+from catalogo import portadas
+
+register = template.Library()
+
+
+@register.simple_tag
+def portada(codigo, tamano="panel", alt=""):
+    if not portadas.es_codigo(codigo):
+        return ""
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}">'
+        '<img src="{}" width="{}" alt="{}" loading="lazy" decoding="async" class="img-fluid rounded"></picture>',
+        portadas.url(codigo, tamano, "webp"),
+        portadas.url(codigo, tamano, "jpg"),
+        portadas.TAMANOS[tamano],
+        alt,
+    )
@@ -1,3 +1,410 @@
-from django.test import TestCase
+"""
+Presupuesto de consultas SQL del detalle de ficha (ver roles/tests.py).
+"""
 
-# Create your tests here.
+import os
+import tempfile
+from collections import Counter
+from datetime import date
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+
+from catalogo import facetas, importacion, portadas, search
+from catalogo.models import ConteoFaceta, LibroFicha, TerminoBusqueda
+from roles.models import Editorial, Profile
+from roles.tests import QueryBudgetTestCase, query_shape
+
+SESION = ["django_session", "auth_user"]
+DETALLE = SESION + ["catalogo_libroficha"]
+REFERENCIAS = ["catalogo_tipotapa", "catalogo_pais", "catalogo_moneda", "catalogo_idioma"]
+
+
+class DetalleQueryBudgetTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.login(Profile.ROLE_CONSULTOR)
+
+    def test_detalle_carga_referencias_una_vez(self):
+        # la primera petición del proceso carga los catálogos de referencia;
+        # las siguientes resuelven tipo_tapa / idioma / país / moneda en memoria
+        self.get("/catalogo/libro/9789560000002/", DETALLE + REFERENCIAS)
+        self.get("/catalogo/libro/9789560000019/", DETALLE)
+
+    def test_detalle_cacheado_no_consulta_catalogo(self):
+        response = self.get("/catalogo/libro/9789560000002/", DETALLE + REFERENCIAS)
+        self.assertContains(response, "Rústica")  # FK resuelta desde la cache de referencias
+        self.get("/catalogo/libro/9789560000002/", SESION)
+
+    def test_guardar_ficha_invalida_payload(self):
+        self.get("/catalogo/libro/9789560000002/", DETALLE + REFERENCIAS)
+        libro = LibroFicha.objects.get(isbn13="9789560000002")
+        libro.titulo = "Título corregido"
+        with self.captureOnCommitCallbacks(execute=True):
+            libro.save()
+        response = self.get("/catalogo/libro/9789560000002/", DETALLE)
+        self.assertContains(response, "Título corregido")
+
+    def test_detalle_formatos_de_isbn(self):
+        self.get("/catalogo/libro/9789560000002/", DETALLE + REFERENCIAS)
+        # todos los formatos llevan a la misma clave canónica: ya está en cache
+        for isbn in ("978-956-000000-2", "978 956 000 000 2", "956-000000-4"):
+            with self.subTest(isbn=isbn):
+                response = self.get(f"/catalogo/libro/{isbn}/", SESION)
+                self.assertEqual(response.context["ficha"]["isbn"], "9789560000002")
+
+    def test_detalle_inexistente(self):
+        self.get("/catalogo/libro/9789569999999/", DETALLE, status=404)
+
+
+class DetalleCondicionalTests(QueryBudgetTestCase):
+
+    def test_ficha_sin_cambios_responde_304(self):
+        self.login(Profile.ROLE_CONSULTOR)
+        url = "/catalogo/libro/9789560000002/"
+        etag = self.client.get(url)["ETag"]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual([query_shape(q["sql"]) for q in ctx.captured_queries], SESION)
+
+        libro = LibroFicha.objects.get(isbn13="9789560000002")
+        libro.precio += 1
+        with self.captureOnCommitCallbacks(execute=True):
+            libro.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_renombrar_editorial_invalida_el_etag(self):
+        self.login(Profile.ROLE_CONSULTOR)
+        url = "/catalogo/libro/9789560000002/"
+        anterior = self.client.get(url)
+        editorial = Editorial.objects.get(nombre="Editorial Andes")
+        editorial.nombre = "Ediciones Cordillera"
+        with self.captureOnCommitCallbacks(execute=True):
+            editorial.save()  # la ficha no cambia: su `actualizado` es el mismo
+        response = self.client.get(
+            url, HTTP_IF_NONE_MATCH=anterior["ETag"], HTTP_IF_MODIFIED_SINCE=anterior["Last-Modified"],
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Ediciones Cordillera")
+
+
+def _imagen(color, size=(600, 900), formato="PNG") -> bytes:
+    buffer = BytesIO()
+    Image.new("RGB", size, color).save(buffer, formato)
+    return buffer.getvalue()
+
+
+class PortadaTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        super().setUp()
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        ajuste = override_settings(PORTADAS_ROOT=tmp.name)
+        ajuste.enable()
+        self.addCleanup(ajuste.disable)
+
+    def test_originales_deduplicados_y_miniaturas(self):
+        codigo = portadas.guardar_original(_imagen("red"))
+        self.assertEqual(portadas.guardar_original(_imagen("red")), codigo)
+        self.assertEqual(len(list(portadas.raiz().glob("originales/*/*"))), 1)
+        self.assertEqual(portadas.generar(codigo), len(portadas.TAMANOS) * len(portadas.FORMATOS))
+        self.assertEqual(portadas.generar(codigo), 0)
+        with Image.open(portadas.ruta_derivado(codigo, "panel", "webp")) as img:
+            self.assertEqual(img.size, (120, 180))
+        with self.assertRaises(portadas.PortadaInvalida):
+            portadas.guardar_original(b"no es una imagen")
+
+    def test_generacion_en_pool(self):
+        codigos = [portadas.guardar_original(_imagen(c)) for c in ("red", "blue", "green")]
+        total = portadas.generar_en_paralelo(codigos + ["x" * 64], procesos=2)
+        self.assertEqual(total, 3 * len(portadas.TAMANOS) * len(portadas.FORMATOS))
+
+    def test_portada_se_genera_en_primera_peticion_y_es_inmutable(self):
+        codigo = portadas.guardar_original(_imagen("blue", formato="JPEG"))
+        url = f"/catalogo/portada/{codigo}/detalle.webp"
+        response = self.get(url, [])  # ni sesión ni base
+        self.assertEqual(response["Content-Type"], "image/webp")
+        self.assertIn("immutable", response["Cache-Control"])
+        self.assertTrue(portadas.ruta_derivado(codigo, "mini", "jpg").exists())
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 304)
+        self.get(f"/catalogo/portada/{'0' * 64}/panel.jpg", [], status=404)
+        self.get(f"/catalogo/portada/{codigo}/gigante.jpg", [], status=404)
+
+    def test_ficha_y_panel_muestran_portada(self):
+        codigo = portadas.guardar_original(_imagen("green"))
+        LibroFicha.objects.filter(isbn13="9789560000002").update(codigo_imagen=codigo)
+        self.login(Profile.ROLE_CONSULTOR)
+        self.assertContains(self.client.get("/catalogo/libro/9789560000002/"), f"/catalogo/portada/{codigo}/detalle.webp")
+        self.assertContains(self.client.get("/panel/consultor/"), f"/catalogo/portada/{codigo}/mini.jpg")
+
+
+class FacetasTests(QueryBudgetTestCase):
+    """Tabla resumen ConteoFaceta (catalogo/facetas.py) y totales del panel."""
+
+    def assertResumenIgualAlCatalogo(self):
+        esperado = facetas.claves_guardadas(LibroFicha.objects.order_by())
+        guardado = Counter({
+            (c.editorial_id, c.mes, c.idioma_id, c.tipo_tapa_id): c.n for c in ConteoFaceta.objects.filter(n__gt=0)
+        })
+        self.assertEqual(guardado, esperado)
+
+    def test_senales_mantienen_el_resumen(self):
+        self.assertResumenIgualAlCatalogo()  # fichas creadas con create()
+        libro = LibroFicha.objects.get(isbn13="9789560000002")
+        libro.fecha_edicion = date(1999, 5, 20)
+        libro.editorial = Editorial.objects.get(nombre="Editorial Pacífico")
+        libro.save()
+        self.assertResumenIgualAlCatalogo()
+        LibroFicha.objects.get(isbn13="9789560000019").delete()
+        self.assertResumenIgualAlCatalogo()
+        self.assertEqual(facetas.resumen()["total"], 59)
+
+    def test_save_parcial_sin_campos_de_faceta_no_lee_ni_cuenta(self):
+        libro = LibroFicha.objects.get(isbn13="9789560000002")
+        libro.titulo = "Otro título"
+        with CaptureQueriesContext(connection) as ctx:
+            libro.save(update_fields=["titulo"])
+        # solo el índice de búsqueda (que lee la editorial): ni pre_save ni ConteoFaceta
+        self.assertNotIn("catalogo_conteofaceta", " ".join(q["sql"] for q in ctx.captured_queries))
+        self.assertFalse([q for q in ctx.captured_queries if q["sql"].startswith('SELECT "catalogo_libroficha"')])
+        libro.fecha_edicion = date(1999, 5, 20)
+        libro.save(update_fields=["fecha_edicion"])
+        self.assertResumenIgualAlCatalogo()
+
+    def test_importacion_suma_solo_la_diferencia(self):
+        existente = LibroFicha.objects.get(isbn13="9789560000002")
+        existente.pk, existente.fecha_edicion = None, date(1990, 1, 1)  # el upsert lo reemplaza
+        nuevo = LibroFicha.objects.get(isbn13="9789560000019")
+        nuevo.pk, nuevo.isbn, nuevo.isbn13 = None, "9789560099996", "9789560099996"
+        importacion.guardar_lote([existente, nuevo], {e.pk: e.nombre for e in Editorial.objects.all()})
+        self.assertResumenIgualAlCatalogo()
+        self.assertEqual(LibroFicha.objects.count(), 61)
+
+    def test_reconstruir_y_totales(self):
+        ConteoFaceta.objects.all().delete()
+        call_command("reconstruir_facetas", stdout=StringIO())
+        self.assertResumenIgualAlCatalogo()
+
+        datos = facetas.resumen()
+        self.assertEqual([e["n"] for e in datos["editoriales"]], [30, 30])
+        self.assertEqual(sum(n for _, n in datos["anios"]), 60)
+        self.assertEqual(datos["tapas"], [("Rústica", 60)])
+        casos = [
+            ("", None, None), ("andes", None, None), ("pacif", date(2003, 2, 1), None),
+            ("", date(2004, 3, 15), date(2011, 7, 10)), ("andes", date(2005, 1, 1), date(2005, 1, 1)),
+        ]
+        for q, desde, hasta in casos:
+            with self.subTest(q=q, desde=desde, hasta=hasta):
+                qs = search.filtrar(LibroFicha.objects.all(), q, campos=[TerminoBusqueda.CAMPO_EDITORIAL])
+                if desde:
+                    qs = qs.filter(fecha_edicion__gte=desde)
+                if hasta:
+                    qs = qs.filter(fecha_edicion__lte=hasta)
+                self.assertEqual(facetas.total(datos, q, desde, hasta), qs.count())
+
+    def test_panel_muestra_total_y_facetas(self):
+        self.login(Profile.ROLE_CONSULTOR)
+        response = self.client.get("/panel/consultor/?q=andes&date_from=2001-01-01&date_to=2001-12-31")
+        self.assertEqual(response.context["facetas"]["hits"], 2)
+        self.assertContains(response, "2 fichas")
+        self.assertContains(response, "Meses de 2001:")
+        self.login(Profile.ROLE_EDITOR)
+        response = self.client.get("/panel/editor/?q_titulo=mar")
+        self.assertIsNone(response.context["facetas"]["hits"])  # filtro sin resumen: solo el total del alcance
+        self.assertContains(response, "30 fichas en tu catálogo")
+
+
+class BusquedaTests(QueryBudgetTestCase):
+    """Índice de búsqueda (catalogo/search.py): plegado de tildes y ranking."""
+
+    def setUp(self):
+        super().setUp()
+        # cuatro fichas de Editorial Andes (alcance del EDITOR) que calzan con "sol"
+        self.libros = list(LibroFicha.objects.filter(editorial__nombre="Editorial Andes").order_by("pk")[:4])
+        for libro, (titulo, subtitulo) in zip(self.libros, [
+            ("Sol de invierno", None),   # palabra completa en el título
+            ("Solsticio", None),         # prefijo en el título
+            ("Libro del mar", "Sol"),    # palabra completa en el subtítulo
+            ("Libro del mar", "Soledades"),  # prefijo en el subtítulo
+        ]):
+            libro.titulo, libro.subtitulo = titulo, subtitulo
+            libro.save()
+
+    def test_normalizar_pliega_tildes_y_mayusculas(self):
+        self.assertEqual(search.normalizar("El NIÑO y la Pingüina Ágil"), ["nino", "pinguina", "agil"])
+        self.assertEqual(search.normalizar("  de la  "), [])
+
+    def test_filtrar_sin_tildes_ni_mayusculas(self):
+        libro = self.libros[0]
+        libro.titulo = "Canción del Niño"
+        libro.save()
+        for texto in ("cancion nino", "CANCIÓN NIÑ", "canc"):
+            with self.subTest(texto=texto):
+                qs = search.filtrar(LibroFicha.objects.all(), texto, campos=[TerminoBusqueda.CAMPO_TITULO])
+                self.assertEqual(list(qs), [libro])
+        self.assertFalse(search.filtrar(LibroFicha.objects.all(), "cancion sol").exists())  # todas las palabras
+
+    def test_buscar_ordena_por_relevancia(self):
+        campos = [TerminoBusqueda.CAMPO_TITULO, TerminoBusqueda.CAMPO_SUBTITULO]
+        resultado = list(search.buscar("SÓL", campos))
+        self.assertEqual(resultado, self.libros)
+        self.assertEqual([l.rank for l in resultado], [20, 10, 8, 4])
+        self.assertFalse(search.buscar("de la", campos).exists())
+
+    def test_panel_por_relevancia_con_cursor(self):
+        self.login(Profile.ROLE_EDITOR)
+        isbns = [l.isbn for l in self.libros]
+        response = self.client.get("/panel/editor/?q_titulo=sol")
+        self.assertEqual(response.context["relevancia_href"], "?q_titulo=sol&sort=relevancia")
+        with mock.patch("roles.views.BasePanelView.paginate_by", 3):
+            primera = self.client.get("/panel/editor/?q_titulo=sol&sort=relevancia")
+            segunda = self.client.get(f"/panel/editor/?q_titulo=sol&sort=relevancia&cursor={primera.context['next_cursor']}")
+        html = primera.context["filas_html"]
+        self.assertEqual(sorted(isbns[:3], key=html.index), isbns[:3])
+        self.assertIn(isbns[3], segunda.context["filas_html"])
+        self.assertIsNone(segunda.context["next_cursor"])
+        # también en la exportación (keyset sobre la misma columna)
+        self.login(Profile.ROLE_ADMIN)
+        csv = b"".join(self.client.get("/panel/admin/?q=andes&sort=relevancia&export=csv").streaming_content)
+        self.assertEqual(csv.decode("utf-8-sig").count("\n"), 31)
+
+
+ONIX = """<?xml version="1.0" encoding="UTF-8"?>
+<ONIXMessage release="3.0" xmlns="http://ns.editeur.org/onix/3.0/reference">
+  <Header><Sender><SenderName>Andes</SenderName></Sender></Header>
+  {productos}
+</ONIXMessage>"""
+
+ONIX_PRODUCTO = """<Product>
+    <ProductIdentifier><ProductIDType>15</ProductIDType><IDValue>{isbn}</IDValue></ProductIdentifier>
+    <DescriptiveDetail>
+      <ProductForm>BC</ProductForm>
+      <Measure><MeasureType>01</MeasureType><Measurement>{alto}</Measurement><MeasureUnitCode>mm</MeasureUnitCode></Measure>
+      <TitleDetail><TitleElement><TitleText>Viaje al sur</TitleText></TitleElement></TitleDetail>
+      <Contributor><ContributorRole>A01</ContributorRole><PersonName>Ana Pérez</PersonName></Contributor>
+      <Language><LanguageRole>01</LanguageRole><LanguageCode>spa</LanguageCode></Language>
+      <Extent><ExtentType>00</ExtentType><ExtentValue>240</ExtentValue></Extent>
+    </DescriptiveDetail>
+    <CollateralDetail><TextContent><TextType>03</TextType><Text>Un viaje.</Text></TextContent></CollateralDetail>
+    <PublishingDetail>
+      <Publisher><PublisherName>Editorial Andes</PublisherName></Publisher>
+      <CountryOfPublication>CL</CountryOfPublication>
+      <PublishingDate><PublishingDateRole>01</PublishingDateRole><Date>20240315</Date></PublishingDate>
+    </PublishingDetail>
+    <ProductSupply><SupplyDetail><Price><PriceAmount>12990</PriceAmount><CurrencyCode>CLP</CurrencyCode></Price></SupplyDetail></ProductSupply>
+  </Product>"""
+
+CSV_ENCABEZADO = (
+    "isbn,editorial,titulo,autor,tipo_tapa,numero_paginas,idioma_original,numero_edicion,"
+    "fecha_edicion,pais_edicion,precio,moneda,descuento_distribuidor,resumen_libro\n"
+)
+
+
+class ImportacionTests(QueryBudgetTestCase):
+    """importar_fichas / catalogo/importacion.py: validación por fila, prueba y ONIX."""
+
+    def archivo(self, contenido, sufijo):
+        f = tempfile.NamedTemporaryFile("w", suffix=sufijo, encoding="utf-8", delete=False)
+        with f:
+            f.write(contenido)
+        self.addCleanup(os.unlink, f.name)
+        return f.name
+
+    def csv(self):
+        return self.archivo(CSV_ENCABEZADO + (
+            "978-956-099999-3,Editorial Andes,Nuevo,Autora,Rústica,120,es,1,2024-01-31,CL,9990,CLP,30,Texto\n"
+            "9789560000002,editorial andes,Título nuevo,Autor 0,Rústica,100,es,1,01/01/2000,CL,1000,CLP,30,R\n"
+            "9789560000003,Editorial Andes,Malo,Autor,Rústica,100,es,1,2024-01-01,CL,1000,CLP,30,R\n"
+            "9789560999986,Editorial Andes,Malo,Autor,Rústica,cien,es,1,2024-01-01,CL,1000,CLP,30,R\n"
+            "9789560999986,Editorial Sur,Malo,Autor,Rústica,100,es,1,2024-13-01,CL,1000,CLP,30,R\n"
+        ), ".csv")
+
+    def test_csv_informa_errores_por_fila_y_sigue(self):
+        resumen = importacion.Importador().procesar(importacion.leer_csv(self.csv()))
+        self.assertEqual((resumen["creadas"], resumen["actualizadas"]), (1, 1))
+        self.assertEqual([(n, isbn) for n, isbn, _ in resumen["errores"]], [
+            (4, "9789560000003"), (5, "9789560999986"), (6, "9789560999986"),
+        ])
+        mensajes = [m for _, _, m in resumen["errores"]]
+        self.assertIn("no es un ISBN-10/13 válido", mensajes[0])
+        self.assertIn("numero_paginas: 'cien' no es un entero", mensajes[1])
+        self.assertIn("editorial: 'Editorial Sur' no existe", mensajes[2])
+        self.assertEqual(LibroFicha.objects.get(isbn13="9789560000002").titulo, "Título nuevo")
+        nuevo = LibroFicha.objects.get(isbn13="9789560999993")
+        self.assertEqual((nuevo.fecha_edicion, nuevo.editorial.nombre), (date(2024, 1, 31), "Editorial Andes"))
+        self.assertTrue(search.filtrar(LibroFicha.objects.all(), "nuevo").filter(pk=nuevo.pk).exists())
+
+    def test_isbn_de_otra_ficha_es_error_de_la_fila(self):
+        # ficha antigua sin clave canónica cuyo isbn es el de la fila nueva, y otra con guiones
+        LibroFicha.objects.filter(isbn13="9789560000019").update(isbn="9789560999993", isbn13=None)
+        LibroFicha.objects.filter(isbn13="9789560000002").update(isbn="978-956-000000-2")
+        resumen = importacion.Importador().procesar(importacion.leer_csv(self.csv()))
+        self.assertEqual((resumen["creadas"], resumen["actualizadas"]), (0, 1))
+        self.assertEqual([(n, isbn) for n, isbn, _ in resumen["errores"]][-1], (2, "9789560999993"))
+        self.assertIn("ya es de otra ficha", resumen["errores"][-1][2])
+        actualizada = LibroFicha.objects.get(isbn13="9789560000002")
+        self.assertEqual((actualizada.isbn, actualizada.titulo), ("978-956-000000-2", "Título nuevo"))
+
+    def test_choque_de_clave_se_reintenta_fila_a_fila(self):
+        LibroFicha.objects.filter(isbn13="9789560000019").update(isbn="9789560999993", isbn13=None)
+        with mock.patch.object(importacion.Importador, "_sin_conflictos", lambda self, libros: libros):
+            resumen = importacion.Importador().procesar(importacion.leer_csv(self.csv()))
+        self.assertEqual((resumen["creadas"], resumen["actualizadas"]), (0, 1))
+        self.assertEqual(resumen["errores"][-1][:2], (2, "9789560999993"))
+        self.assertIn("no se pudo guardar", resumen["errores"][-1][2])
+        self.assertEqual(LibroFicha.objects.get(isbn13="9789560000002").titulo, "Título nuevo")
+        self.assertEqual(LibroFicha.objects.count(), 60)
+
+    def test_prueba_no_escribe(self):
+        salida = StringIO()
+        with CaptureQueriesContext(connection) as ctx:
+            call_command("importar_fichas", self.csv(), "--dry-run", stdout=salida, stderr=StringIO())
+        self.assertIn("Prueba (sin escribir): 1 nuevas, 1 actualizadas, 3 con errores", salida.getvalue())
+        escrituras = [q["sql"] for q in ctx.captured_queries if query_shape(q["sql"]).split()[0] in ("insert", "update", "delete")]
+        self.assertEqual(escrituras, [])
+        self.assertEqual(LibroFicha.objects.count(), 60)
+        self.assertEqual(LibroFicha.objects.get(isbn13="9789560000002").titulo, "Libro 0 del mar")
+
+    def test_onix(self):
+        ruta = self.archivo(ONIX.format(productos="\n".join([
+            ONIX_PRODUCTO.format(isbn="9789560999993", alto="235"),
+            ONIX_PRODUCTO.format(isbn="9789560999986", alto="abc"),  # medida inválida: error de esa fila
+            ONIX_PRODUCTO.format(isbn="9789560000002", alto="210"),
+        ])), ".xml")
+        filas = list(importacion.leer_onix(ruta))
+        self.assertEqual([n for n, _ in filas], [1, 2, 3])
+        self.assertEqual(
+            {k: filas[0][1][k] for k in ("isbn", "titulo", "autor", "tipo_tapa", "idioma_original", "alto_cm", "fecha_edicion")},
+            {"isbn": "9789560999993", "titulo": "Viaje al sur", "autor": "Ana Pérez", "tipo_tapa": "Rústica",
+             "idioma_original": "es", "alto_cm": "23.5", "fecha_edicion": "20240315"},
+        )
+
+        resumen = importacion.Importador().procesar(iter(filas))
+        self.assertEqual((resumen["creadas"], resumen["actualizadas"]), (1, 1))
+        self.assertEqual(resumen["errores"], [(2, "9789560999986", "alto_cm: 'abc' no es un número")])
+        libro = LibroFicha.objects.get(isbn13="9789560999993")
+        self.assertEqual((libro.alto_cm, libro.numero_paginas, libro.precio), (Decimal("23.5"), 240, Decimal("12990")))
+        self.assertEqual(libro.fecha_edicion, date(2024, 3, 15))
+
+    def test_onix_no_retiene_productos_procesados(self):
+        ruta = self.archivo(ONIX.format(productos="\n".join(
+            ONIX_PRODUCTO.format(isbn=n, alto="200") for n in range(5)
+        )), ".xml")
+        productos = []
+        with mock.patch("catalogo.importacion._onix_a_fila", side_effect=lambda p: productos.append(p) or {}):
+            filas = importacion.leer_onix(ruta)
+            next(filas)
+            mensaje = filas.gi_frame.f_locals["abiertos"][0]  # <ONIXMessage>
+            list(filas)
+        self.assertEqual(len(productos), 5)
+        self.assertTrue(all(len(p) == 0 for p in productos))  # vaciados
+        self.assertEqual([importacion._tag(e) for e in mensaje], ["Header"])  # y sacados del mensaje
@@ -1,9 +1,14 @@
 # catalogo/urls.py
+from django.conf import settings
 from django.urls import path
-from .views import libro_detalle  # vista simple por ahora
+from .views import libro_detalle, libro_detalle_async, portada
+
+if settings.ASYNC_VIEWS:  # servidor ASGI (ver liberalia/asgi.py)
+    libro_detalle = libro_detalle_async
 
 app_name = "catalogo"
 
 urlpatterns = [
     path("libro/<str:isbn>/", libro_detalle, name="libro_detalle"),
+    path("portada/<str:codigo>/<str:tamano>.<str:formato>", portada, name="portada"),
 ]
\ No newline at end of file
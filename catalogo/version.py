@@ -0,0 +1,19 @@
+"""
+Sello de versión del catálogo (LibroFicha + Editorial).
+
+Se sube con cada escritura de fichas o editoriales (catalogo/signals.py y
+la importación masiva). Lo usan los validadores HTTP del panel (ETag /
+Last-Modified) y las caches de resultados que dependen del catálogo.
+"""
+
+from liberalia.versiones import bump_version, get_version
+
+NOMBRE = "catalogo"
+
+
+def version_catalogo() -> int:
+    return get_version(NOMBRE)
+
+
+def marcar_cambio() -> int:
+    return bump_version(NOMBRE)
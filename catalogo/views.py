@@ -1,18 +1,70 @@
 # catalogo/views.py
+from asgiref.sync import sync_to_async
 from django.contrib.auth.decorators import login_required
-from django.shortcuts import render, get_object_or_404
-from django.db.models import Q
-from .models import LibroFicha
+from django.contrib.auth.views import redirect_to_login
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.shortcuts import render
+from django.utils.safestring import mark_safe
+
+from liberalia.condicional import con_validadores, dt_a_timestamp, etag_de, no_modificado, ns_a_timestamp
+from . import portadas
+from .detalle import payload_ficha
+from .version import version_catalogo
 
 @login_required
 def libro_detalle(request, isbn):
-    # Normaliza ISBN (acepta con o sin guiones/espacios)
-    isbn_norm = isbn.replace("-", "").replace(" ", "").strip()
+    return _responder_detalle(request, isbn)
+
+
+async def libro_detalle_async(request, isbn):
+    # Variante ASGI (ASYNC_VIEWS): login con request.auser() y el resto en el
+    # pool de threads (cache, a lo más una consulta y el render)
+    user = await request.auser()
+    if not user.is_authenticated:
+        return redirect_to_login(request.get_full_path())
+    request.user = user
+    return await sync_to_async(_responder_detalle)(request, isbn)
+
+
+def _responder_detalle(request, isbn):
+    # Acepta ISBN-10/13 con o sin guiones/espacios. La ficha completa sale de
+    # la cache (ya renderizada) o de una sola consulta (ver catalogo/detalle.py)
+    ficha = payload_ficha(isbn)
+    if ficha is None:
+        raise Http404("Ficha no encontrada")
+
+    # GET condicional: misma ficha, misma versión y mismo usuario → 304. El
+    # sello del catálogo cubre lo que cambia la página sin tocar la ficha
+    # (p. ej. renombrar su editorial no cambia `actualizado`)
+    version = version_catalogo()
+    etag = etag_de("ficha", request.user.pk, ficha["pk"], ficha["actualizado"], ficha["ref_version"], version)
+    last_modified = max(dt_a_timestamp(ficha["actualizado"]) or 0, ns_a_timestamp(version)) or None
+    response = no_modificado(request, etag, last_modified)
+    if response is None:
+        ficha = {**ficha, "html": mark_safe(ficha["html"])}
+        response = render(request, "catalogo/libro_detalle.html", {"ficha": ficha})
+    return con_validadores(response, etag, last_modified)
+
+
+# Un año: la URL de una portada depende solo de su contenido (ver portadas.py)
+PORTADA_CACHE_CONTROL = "public, max-age=31536000, immutable"
 
-    obj = get_object_or_404(
-        LibroFicha.objects.select_related("editorial").filter(
-            Q(isbn=isbn) | Q(isbn=isbn_norm) | Q(isbn__iexact=isbn)
-        )
-    )
-    return render(request, "catalogo/libro_detalle.html", {"obj": obj})
 
+def portada(request, codigo, tamano, formato):
+    # Sin login: el código es el hash del contenido (no enumerable) y así la
+    # petición no toca sesión ni base; la miniatura que falte se genera acá
+    if not portadas.es_codigo(codigo) or tamano not in portadas.TAMANOS or formato not in portadas.FORMATOS:
+        raise Http404("Portada no encontrada")
+    etag = f'"{codigo[:32]}-{tamano}-{formato}"'
+    if request.headers.get("If-None-Match") == etag:
+        response = HttpResponseNotModified()
+    else:
+        ruta = portadas.ruta_derivado(codigo, tamano, formato)
+        if not ruta.exists():
+            if not portadas.ruta_original(codigo).exists():
+                raise Http404("Portada no encontrada")
+            portadas.generar(codigo)
+        response = FileResponse(open(ruta, "rb"), content_type=portadas.FORMATOS[formato][1])
+    response["ETag"] = etag
+    response["Cache-Control"] = PORTADA_CACHE_CONTROL
+    return response
@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'liberalia.settings')
+# Bajo ASGI se sirven las variantes async de paneles, detalle y exportación
+os.environ.setdefault('ASYNC_VIEWS', '1')
 
 application = get_asgi_application()
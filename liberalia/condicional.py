@@ -0,0 +1,63 @@
+"""
+Helpers de GET condicional (ETag / Last-Modified).
+
+Las vistas calculan un ETag a partir de sellos de versión baratos (cache) y
+del alcance del usuario ANTES de tocar la base; si el navegador ya tiene
+esa versión se responde 304 sin ejecutar la consulta principal ni
+renderizar.
+
+El ETag incluye además un token de despliegue (mtime de tmp/restart.txt,
+que el deploy reescribe), para que un cambio de templates no deje páginas
+viejas validadas en los navegadores.
+"""
+
+import hashlib
+import os
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+def _deploy_token() -> str:
+    try:
+        return str(os.stat(settings.BASE_DIR / "tmp" / "restart.txt").st_mtime_ns)
+    except OSError:
+        return "0"
+
+
+DEPLOY_TOKEN = _deploy_token()
+
+
+def etag_de(*partes) -> str:
+    """ETag fuerte (entre comillas) derivado de las partes dadas."""
+    crudo = "|".join(str(p) for p in (DEPLOY_TOKEN, *partes))
+    return '"%s"' % hashlib.sha1(crudo.encode()).hexdigest()
+
+
+def ns_a_timestamp(ns: int) -> int:
+    """Sello de versión (time_ns) → segundos (precisión de Last-Modified)."""
+    return ns // 1_000_000_000
+
+
+def dt_a_timestamp(valor: datetime | None) -> int | None:
+    if valor is None:
+        return None
+    if valor.tzinfo is None:
+        valor = valor.replace(tzinfo=timezone.utc)
+    return int(valor.timestamp())
+
+
+def no_modificado(request, etag: str, last_modified: int | None = None):
+    """Respuesta 304/412 si los validadores del request coinciden; si no, None."""
+    return get_conditional_response(request, etag=etag, last_modified=last_modified)
+
+
+def con_validadores(response, etag: str, last_modified: int | None = None):
+    """Agrega ETag / Last-Modified y obliga a revalidar (contenido por usuario)."""
+    response.headers["ETag"] = etag
+    if last_modified is not None:
+        response.headers["Last-Modified"] = http_date(last_modified)
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
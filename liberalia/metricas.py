@@ -0,0 +1,393 @@
+"""
+Métricas por petición: SQL, render de templates y tiempo total.
+
+MetricasMiddleware mide cada petición y:
+- agrega el header Server-Timing (sql / tpl / total; las DevTools del
+  navegador lo muestran en la pestaña Network → Timing) para el personal,
+- junta muestras por vista (view_name de la URL) para percentiles,
+- acumula el costo de cada sentencia SQL normalizada,
+- anota las peticiones que superan el presupuesto (settings.METRICAS_PRESUPUESTO).
+
+Cómo se mide:
+- SQL: un execute_wrapper instalado una vez en cada conexión (señal
+  connection_created) suma al objeto Medicion de la petición en curso, que
+  viaja en un ContextVar; así cuenta también las consultas que las vistas
+  async hacen en threads de sync_to_async y las de la réplica.
+- Templates: el backend DjangoTemplatesMedidos (settings.TEMPLATES) mide
+  cada render de nivel superior (render(), render_to_string, TemplateResponse).
+- Respuestas en streaming (exportaciones): el header solo puede llevar lo
+  hecho hasta armar la respuesta; la muestra se registra al terminar de
+  enviarse, con el SQL y el tiempo del recorrido completo.
+
+Las muestras se juntan en memoria del proceso y se vuelcan a la cache
+compartida cada FLUSH_CADA segundos (o FLUSH_MUESTRAS muestras), para no
+escribir la cache en cada petición; cada proceso en su propia clave, para
+que los workers no se pisen los conteos. Cada clave expira RANURA_TTL
+segundos después de su último volcado: lo de un worker muerto (reciclado
+por Passenger) desaparece solo. Lectura: resumen() (página roles:metricas),
+que junta las de todos los procesos vivos.
+
+El header Server-Timing (con el número de consultas) solo se envía al
+personal (is_staff o rol ADMIN) o con DEBUG.
+"""
+
+import os
+import re
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.template.backends.django import DjangoTemplates, Template
+from django.utils import timezone
+
+CACHE_KEY = "liberalia:metricas"
+# Muestras que se guardan por vista (ventana móvil para los percentiles)
+MUESTRAS = 500
+# Sentencias SQL y peticiones fuera de presupuesto que se conservan
+MAX_SENTENCIAS = 100
+MAX_EXCESOS = 50
+FLUSH_CADA = 10.0
+FLUSH_MUESTRAS = 50
+# Vida de la clave de un proceso desde su último volcado
+RANURA_TTL = 3600
+
+_actual: ContextVar["Medicion | None"] = ContextVar("liberalia_metricas", default=None)
+
+
+class Medicion:
+    """Contadores de una petición (los suman el wrapper SQL y el backend de templates)."""
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.sql_n = 0
+        self.sql_ms = 0.0
+        self.tpl_ms = 0.0
+        self._tpl_nivel = 0
+        self.sentencias = defaultdict(lambda: [0, 0.0, 0.0])  # sql → [n, total ms, máx ms]
+
+    def ms(self) -> float:
+        return (time.perf_counter() - self.inicio) * 1000
+
+    def server_timing(self) -> str:
+        return (
+            f'sql;dur={self.sql_ms:.1f};desc="{self.sql_n} consultas", '
+            f"tpl;dur={self.tpl_ms:.1f}, total;dur={self.ms():.1f}"
+        )
+
+
+# ----------------------------
+# SQL
+# ----------------------------
+_IN_LISTA = re.compile(r"\(\s*%s(?:\s*,\s*%s)+\s*\)")
+_ESPACIOS = re.compile(r"\s+")
+
+
+def normalizar_sql(sql: str) -> str:
+    """Sentencia sin valores: listas IN (%s, %s, …) colapsadas y espacios simples."""
+    return _ESPACIOS.sub(" ", _IN_LISTA.sub("(%s…)", sql)).strip()
+
+
+def _medir_sql(execute, sql, params, many, context):
+    medicion = _actual.get()
+    if medicion is None:
+        return execute(sql, params, many, context)
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        ms = (time.perf_counter() - inicio) * 1000
+        medicion.sql_n += 1
+        medicion.sql_ms += ms
+        acumulado = medicion.sentencias[sql]
+        acumulado[0] += 1
+        acumulado[1] += ms
+        acumulado[2] = max(acumulado[2], ms)
+
+
+@receiver(connection_created)
+def _instalar_wrapper(sender, connection, **kwargs):
+    if _medir_sql not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_medir_sql)
+
+
+# ----------------------------
+# Templates
+# ----------------------------
+class _TemplateMedido(Template):
+    def render(self, context=None, request=None):
+        medicion = _actual.get()
+        if medicion is None:
+            return super().render(context, request)
+        medicion._tpl_nivel += 1
+        inicio = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            medicion._tpl_nivel -= 1
+            if medicion._tpl_nivel == 0:  # los renders anidados ya cuentan en el de afuera
+                medicion.tpl_ms += (time.perf_counter() - inicio) * 1000
+
+
+class DjangoTemplatesMedidos(DjangoTemplates):
+    """Backend de templates de Django que informa su tiempo de render a la Medicion."""
+
+    def from_string(self, template_code):
+        return _TemplateMedido(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        return _TemplateMedido(super().get_template(template_name).template, self)
+
+
+# ----------------------------
+# Agregación (proceso → cache)
+# ----------------------------
+# Cada proceso vuelca en SU clave de la cache (CACHE_KEY:p<n>), así nunca
+# dos procesos leen y reescriben la misma: la ranura n se reparte con
+# cache.incr (atómico) la primera vez, tras un fork y si la cache se vació
+# (el contador quedó por debajo, o la clave es de otro proceso). resumen()
+# junta las claves de las ranuras DESDE_KEY..contador y corre DESDE_KEY
+# hasta la primera que sigue viva, para no releer las de procesos muertos;
+# un proceso que quedó por debajo (su clave expiró) toma una ranura nueva.
+PROCESOS_KEY = CACHE_KEY + ":procesos"
+DESDE_KEY = CACHE_KEY + ":desde"
+
+_lock = threading.Lock()
+_volcando = threading.Lock()  # un volcado a la vez por proceso (lee y reescribe su clave)
+_pendiente = {"vistas": defaultdict(list), "sentencias": {}, "excesos": [], "n": 0, "desde": time.monotonic()}
+_ranura = {"pid": None, "n": 0, "id": None}
+
+
+def presupuesto() -> dict:
+    return getattr(settings, "METRICAS_PRESUPUESTO", {"ms": 1000, "consultas": 30})
+
+
+def _incr(key: str) -> int:
+    try:
+        return cache.incr(key)
+    except ValueError:  # clave inexistente (o expulsada)
+        cache.add(key, 0, None)
+        return cache.incr(key)
+
+
+def _clave_proceso(nueva: bool = False) -> str:
+    pid = os.getpid()
+    valores = cache.get_many([PROCESOS_KEY, DESDE_KEY])
+    if (nueva or _ranura["pid"] != pid or valores.get(PROCESOS_KEY, 0) < _ranura["n"]
+            or valores.get(DESDE_KEY, 1) > _ranura["n"]):
+        _ranura.update(pid=pid, n=_incr(PROCESOS_KEY), id=uuid.uuid4().hex)
+    return f"{CACHE_KEY}:p{_ranura['n']}"
+
+
+def _claves_procesos() -> list[str]:
+    valores = cache.get_many([PROCESOS_KEY, DESDE_KEY])
+    return [f"{CACHE_KEY}:p{n}" for n in range(valores.get(DESDE_KEY, 1), valores.get(PROCESOS_KEY, 0) + 1)]
+
+
+def _ranura_de(clave: str) -> int:
+    return int(clave.rsplit(":p", 1)[1])
+
+
+def _vacio() -> dict:
+    return {"vistas": {}, "sentencias": {}, "excesos": []}
+
+
+def _mezclar(datos: dict, vistas, sentencias, excesos) -> dict:
+    """Suma muestras, sentencias y excesos a `datos` (excesos del más nuevo al más viejo)."""
+    for vista, muestras in vistas.items():
+        datos["vistas"][vista] = (datos["vistas"].get(vista, []) + muestras)[-MUESTRAS:]
+    for sql, (n, total, maximo) in sentencias.items():
+        previo = datos["sentencias"].get(sql, (0, 0.0, 0.0))
+        datos["sentencias"][sql] = (previo[0] + n, previo[1] + total, max(previo[2], maximo))
+    # solo las más costosas (por tiempo total)
+    datos["sentencias"] = dict(sorted(datos["sentencias"].items(), key=lambda kv: -kv[1][1])[:MAX_SENTENCIAS])
+    datos["excesos"] = sorted(excesos + datos["excesos"], key=lambda e: e["cuando"], reverse=True)[:MAX_EXCESOS]
+    return datos
+
+
+def registrar(vista: str, path: str, medicion: Medicion, total_ms: float) -> None:
+    """Suma la petición terminada a lo pendiente del proceso (y vuelca si toca)."""
+    limite = presupuesto()
+    with _lock:
+        _pendiente["vistas"][vista].append(
+            (round(total_ms, 2), medicion.sql_n, round(medicion.sql_ms, 2), round(medicion.tpl_ms, 2))
+        )
+        for sql, (n, total, maximo) in medicion.sentencias.items():
+            clave = normalizar_sql(sql)
+            previo = _pendiente["sentencias"].get(clave, (0, 0.0, 0.0))
+            _pendiente["sentencias"][clave] = (previo[0] + n, previo[1] + total, max(previo[2], maximo))
+        if total_ms > limite["ms"] or medicion.sql_n > limite["consultas"]:
+            _pendiente["excesos"].append({
+                "vista": vista, "path": path[:200], "ms": round(total_ms, 1),
+                "consultas": medicion.sql_n, "cuando": timezone.now(),
+            })
+        _pendiente["n"] += 1
+        toca = _pendiente["n"] >= FLUSH_MUESTRAS or time.monotonic() - _pendiente["desde"] >= FLUSH_CADA
+    if toca:
+        volcar()
+
+
+def volcar() -> None:
+    """Mezcla lo pendiente del proceso con lo ya volcado en su clave de la cache."""
+    with _lock:
+        vistas, sentencias, excesos = _pendiente["vistas"], _pendiente["sentencias"], _pendiente["excesos"]
+        _pendiente.update(vistas=defaultdict(list), sentencias={}, excesos=[], n=0, desde=time.monotonic())
+    if not (vistas or sentencias or excesos):
+        return
+    with _volcando:
+        clave = _clave_proceso()
+        datos = cache.get(clave)
+        if datos is not None and datos.get("proceso") != _ranura["id"]:
+            clave = _clave_proceso(nueva=True)  # la ranura quedó en manos de otro proceso
+            datos = None
+        datos = _mezclar(datos or _vacio(), vistas, sentencias, excesos)
+        cache.set(clave, {**datos, "proceso": _ranura["id"]}, RANURA_TTL)
+
+
+def reiniciar() -> None:
+    with _lock:
+        _pendiente.update(vistas=defaultdict(list), sentencias={}, excesos=[], n=0, desde=time.monotonic())
+    # el contador de ranuras se conserva: los procesos vivos siguen con la suya
+    cache.delete_many(_claves_procesos())
+
+
+def _percentil(ordenados, p: float) -> float:
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+
+def resumen() -> dict:
+    """
+    {'vistas': [{vista, n, p50, p95, p99, max, sql_n, sql_ms, tpl_ms}] (más lentas
+    primero por p95), 'sentencias': [{sql, n, total_ms, medio_ms, max_ms}],
+    'excesos': [...], 'presupuesto': {...}}
+    """
+    volcar()
+    claves = _claves_procesos()
+    guardados = cache.get_many(claves)
+    if claves:
+        # las ranuras de abajo que expiraron no se vuelven a leer
+        cache.set(DESDE_KEY, min(map(_ranura_de, guardados), default=_ranura_de(claves[-1]) + 1), None)
+    datos = _vacio()
+    for guardado in guardados.values():
+        _mezclar(datos, guardado["vistas"], guardado["sentencias"], guardado["excesos"])
+    vistas = []
+    for vista, muestras in datos["vistas"].items():
+        totales = sorted(m[0] for m in muestras)
+        n = len(muestras)
+        vistas.append({
+            "vista": vista, "n": n,
+            "p50": _percentil(totales, 50), "p95": _percentil(totales, 95),
+            "p99": _percentil(totales, 99), "max": totales[-1],
+            # promedios por petición
+            "sql_n": round(sum(m[1] for m in muestras) / n, 1),
+            "sql_ms": round(sum(m[2] for m in muestras) / n, 1),
+            "tpl_ms": round(sum(m[3] for m in muestras) / n, 1),
+        })
+    vistas.sort(key=lambda v: -v["p95"])
+    sentencias = [
+        {"sql": sql, "n": n, "total_ms": round(total, 1), "medio_ms": round(total / n, 2), "max_ms": round(maximo, 1)}
+        for sql, (n, total, maximo) in datos["sentencias"].items()
+    ]
+    sentencias.sort(key=lambda s: -s["total_ms"])
+    return {"vistas": vistas, "sentencias": sentencias, "excesos": datos["excesos"], "presupuesto": presupuesto()}
+
+
+# ----------------------------
+# Middleware
+# ----------------------------
+def _vista(request) -> str:
+    match = getattr(request, "resolver_match", None)
+    return match.view_name if match else "(sin vista)"
+
+
+def _ve_server_timing(request) -> bool:
+    """
+    ¿Se manda Server-Timing? Con DEBUG siempre; si no, solo al personal. Se
+    mira el usuario que la petición ya cargó (AuthenticationMiddleware lo
+    deja en _cached_user / _acached_user): si la vista no lo leyó (p. ej.
+    las portadas) no se consulta la sesión solo para esto.
+    """
+    if settings.DEBUG:
+        return True
+    user = getattr(request, "_cached_user", None) or getattr(request, "_acached_user", None)
+    if user is None or not user.is_authenticated:
+        return False
+    from roles.models import Profile  # import perezoso: liberalia no depende de roles al cargar
+
+    perfil = getattr(user, "profile", None)
+    return user.is_staff or getattr(perfil, "role", None) == Profile.ROLE_ADMIN
+
+
+class MetricasMiddleware:
+    """Mide la petición completa; va al principio de MIDDLEWARE."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        medicion = Medicion()
+        _actual.set(medicion)
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            _actual.set(None)
+            raise
+        return self._terminar(request, response, medicion)
+
+    async def __acall__(self, request):
+        medicion = Medicion()
+        _actual.set(medicion)
+        try:
+            response = await self.get_response(request)
+        except BaseException:
+            _actual.set(None)
+            raise
+        return self._terminar(request, response, medicion)
+
+    def _terminar(self, request, response, medicion):
+        if _ve_server_timing(request):
+            response["Server-Timing"] = medicion.server_timing()
+        vista, path = _vista(request), request.path
+        if not response.streaming:
+            _actual.set(None)
+            registrar(vista, path, medicion, medicion.ms())
+            return response
+
+        # streaming: la medición sigue activa (ContextVar) hasta el último trozo
+        def fin():
+            _actual.set(None)
+            registrar(vista, path, medicion, medicion.ms())
+
+        if response.is_async:
+            response.streaming_content = _acompletar(response.streaming_content, fin)
+        else:
+            response.streaming_content = _completar(response.streaming_content, fin)
+        return response
+
+
+def _completar(contenido, fin):
+    try:
+        yield from contenido
+    finally:
+        fin()
+
+
+async def _acompletar(contenido, fin):
+    try:
+        async for parte in contenido:
+            yield parte
+    finally:
+        fin()
@@ -0,0 +1,204 @@
+"""
+Perfilador bajo demanda de una sola petición (solo ADMIN).
+
+Se pide agregando ?_perfil=muestreo (o el header X-Perfil: muestreo) a
+cualquier URL; con "cprofile" en vez de "muestreo" se usa el perfilador
+determinista. La respuesta es la normal, con el header X-Perfil apuntando
+a la descarga del resultado (roles:perfil); la lista está en roles:perfiles.
+
+- muestreo: un thread toma la pila del thread de la petición cada
+  PERFIL_INTERVALO segundos y cuenta pilas iguales. Sale en formato
+  "collapsed" (una línea "mod:func;mod:func;… n" por pila), listo para
+  flamegraph.pl o speedscope.app. Costo casi nulo sobre lo medido.
+- cprofile: cProfile sobre la petición; se guarda el .prof (pstats, para
+  snakeviz o pstats) y un .txt con las funciones más costosas. Mide cada
+  llamada, así que infla los tiempos de funciones muy cortas.
+
+Las respuestas en streaming (exportaciones) se perfilan hasta el último
+trozo. Sin el parámetro el costo es una búsqueda en un dict por petición.
+En ASGI no se perfila (la petición salta entre threads): se ignora el flag.
+
+Los archivos quedan en PERFILES_ROOT (tmp/perfiles); se conservan los
+últimos MAX_ARCHIVOS.
+"""
+
+import cProfile
+import io
+import pstats
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone as dt_timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.urls import reverse
+from django.utils import timezone
+
+MODOS = ("muestreo", "cprofile")
+PARAMETRO = "_perfil"
+HEADER = "HTTP_X_PERFIL"
+MAX_ARCHIVOS = 50
+# Nombres de archivo válidos (la vista de descarga no acepta otra cosa)
+NOMBRE = re.compile(r"^[\w.-]+\.(folded|prof|txt)$")
+
+
+def raiz() -> Path:
+    return Path(settings.PERFILES_ROOT)
+
+
+def intervalo() -> float:
+    return getattr(settings, "PERFIL_INTERVALO", 0.001)
+
+
+def archivos() -> list[dict]:
+    """Perfiles guardados, del más nuevo al más viejo."""
+    if not raiz().is_dir():
+        return []
+    datos = [(r.name, r.stat()) for r in raiz().iterdir() if NOMBRE.match(r.name)]
+    datos.sort(key=lambda d: d[1].st_mtime, reverse=True)
+    return [
+        {"nombre": nombre, "bytes": st.st_size, "modificado": datetime.fromtimestamp(st.st_mtime, tz=dt_timezone.utc)}
+        for nombre, st in datos
+    ]
+
+
+def ruta_archivo(nombre: str) -> Path | None:
+    """Ruta de un perfil por nombre, o None si el nombre no es válido o no existe."""
+    if not NOMBRE.match(nombre):
+        return None
+    ruta = raiz() / nombre
+    return ruta if ruta.is_file() else None
+
+
+def _podar() -> None:
+    for viejo in archivos()[MAX_ARCHIVOS:]:
+        (raiz() / viejo["nombre"]).unlink(missing_ok=True)
+
+
+# ----------------------------
+# Perfiladores
+# ----------------------------
+def _marco(frame) -> str:
+    return f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_name}"
+
+
+class Muestreador:
+    """Cuenta las pilas del thread `objetivo`, tomadas cada `intervalo` segundos."""
+
+    def __init__(self, objetivo: int, intervalo: float):
+        self.objetivo = objetivo
+        self.intervalo = intervalo
+        self.pilas = Counter()
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._correr, name="perfilador", daemon=True)
+
+    def iniciar(self):
+        self._thread.start()
+
+    def _correr(self):
+        while not self._parar.wait(self.intervalo):
+            frame = sys._current_frames().get(self.objetivo)
+            pila = []
+            while frame is not None:
+                pila.append(_marco(frame))
+                frame = frame.f_back
+            if pila:
+                self.pilas[";".join(reversed(pila))] += 1
+
+    def detener(self, base: str) -> list[str]:
+        self._parar.set()
+        self._thread.join()
+        ruta = raiz() / f"{base}.folded"
+        ruta.write_text("".join(f"{pila} {n}\n" for pila, n in self.pilas.most_common()), encoding="utf-8")
+        return [ruta.name]
+
+
+class PerfilDeterminista:
+    """cProfile sobre el thread de la petición."""
+
+    def __init__(self):
+        self.perfil = cProfile.Profile()
+
+    def iniciar(self):
+        self.perfil.enable()
+
+    def detener(self, base: str) -> list[str]:
+        self.perfil.disable()
+        prof = raiz() / f"{base}.prof"
+        self.perfil.dump_stats(prof)
+        texto = io.StringIO()
+        pstats.Stats(self.perfil, stream=texto).sort_stats("cumulative").print_stats(60)
+        (raiz() / f"{base}.txt").write_text(texto.getvalue(), encoding="utf-8")
+        return [prof.name, f"{base}.txt"]
+
+
+# ----------------------------
+# Middleware
+# ----------------------------
+def _modo_pedido(request) -> str | None:
+    modo = request.GET.get(PARAMETRO) or request.META.get(HEADER)
+    return modo if modo in MODOS else None
+
+
+def _es_admin(request) -> bool:
+    from roles.models import Profile  # import perezoso: solo cuando se pide un perfil
+
+    return request.user.is_authenticated and request.scope.role == Profile.ROLE_ADMIN
+
+
+class PerfiladorMiddleware:
+    """Va después de RoleScopeMiddleware (usa request.scope para validar el rol)."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.get_response(request)  # coroutine: sin perfil en ASGI
+        if PARAMETRO not in request.GET and HEADER not in request.META:
+            return self.get_response(request)
+        modo = _modo_pedido(request)
+        if modo is None or not _es_admin(request):
+            return self.get_response(request)
+        return self._perfilar(request, modo)
+
+    def _perfilar(self, request, modo):
+        raiz().mkdir(parents=True, exist_ok=True)
+        perfilador = (
+            Muestreador(threading.get_ident(), intervalo()) if modo == "muestreo" else PerfilDeterminista()
+        )
+        ruta = re.sub(r"\W+", "-", request.path.strip("/")) or "raiz"
+        base = f"{timezone.now():%Y%m%d-%H%M%S}-{time.perf_counter_ns() % 10**6:06d}-{ruta[:60]}-{modo}"
+        perfilador.iniciar()
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            perfilador.detener(base)
+            raise
+
+        principal = f"{base}.folded" if modo == "muestreo" else f"{base}.prof"
+        response["X-Perfil"] = reverse("roles:perfil", args=[principal])
+        if response.streaming:
+            response.streaming_content = _hasta_el_final(response.streaming_content, perfilador, base)
+        else:
+            perfilador.detener(base)
+            _podar()
+        return response
+
+
+def _hasta_el_final(contenido, perfilador, base):
+    try:
+        yield from contenido
+    finally:
+        perfilador.detener(base)
+        _podar()
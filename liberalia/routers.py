@@ -0,0 +1,141 @@
+"""
+Réplica de lectura opcional (alias "replica" en DATABASES).
+
+Sin réplica configurada todo sigue yendo a "default" y nada de esto cambia
+el comportamiento.
+
+Con réplica:
+- Escrituras, sesión, login y todo lo demás: primaria (ReplicaRouter).
+- Las lecturas pesadas y tolerantes a unos segundos de atraso eligen su base
+  explícitamente con alias_lectura(): panel (build_queryset_for_user),
+  detalle de ficha, exportaciones y catálogos de referencia. El alias queda
+  fijado en el queryset (.using()), así una exportación en streaming que se
+  evalúa después de salir de la vista sigue leyendo donde corresponde.
+
+Atraso de la réplica:
+- Quien acaba de escribir lee de la primaria: el router anota cada escritura
+  del request y ReplicaMiddleware deja una cookie por REPLICA_FIJAR_SEGUNDOS;
+  mientras exista, todas sus lecturas van a la primaria (sin consultar la
+  sesión: la cookie basta, y falsificarla solo manda lecturas a la primaria).
+  Fuera de una petición (comandos, worker) rige lo mismo durante
+  REPLICA_FIJAR_SEGUNDOS desde la última escritura del proceso.
+- Las caches compartidas (páginas del panel, detalle, referencias) se
+  reconstruyen tras un cambio; si se armaran desde una réplica atrasada
+  quedarían viejas hasta el siguiente cambio. Por eso alias_lectura(sello)
+  usa la primaria mientras el sello de versión (time_ns del último cambio)
+  sea más reciente que REPLICA_FIJAR_SEGUNDOS.
+"""
+
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA = "replica"
+COOKIE = "fijar_primaria"
+
+
+class _Estado:
+    """Estado de la petición en curso (mutable: lo comparten los threads de sync_to_async)."""
+    __slots__ = ("fijado", "escribio")
+
+    def __init__(self, fijado=False):
+        self.fijado = fijado
+        self.escribio = False
+
+
+_estado: ContextVar[_Estado | None] = ContextVar("liberalia_replica", default=None)
+# Fuera de una petición (comandos, worker de trabajos): hora de la última escritura
+_ultima_escritura: ContextVar[float] = ContextVar("liberalia_ultima_escritura", default=0.0)
+
+
+def hay_replica() -> bool:
+    return REPLICA in connections.settings
+
+
+def fijar_segundos() -> int:
+    return getattr(settings, "REPLICA_FIJAR_SEGUNDOS", 5)
+
+
+def alias_lectura(sello: int | None = None) -> str:
+    """
+    Alias para una lectura que tolera atraso: "replica" si existe, salvo que
+    esta petición (o su sesión, por cookie) haya escrito hace poco, o que el
+    sello de versión `sello` (time_ns) de lo que se lee sea más reciente que
+    REPLICA_FIJAR_SEGUNDOS.
+    """
+    if not hay_replica():
+        return DEFAULT_DB_ALIAS
+    estado = _estado.get()
+    if estado is not None and (estado.fijado or estado.escribio):
+        return DEFAULT_DB_ALIAS
+    if estado is None and time.time() - _ultima_escritura.get() < fijar_segundos():
+        return DEFAULT_DB_ALIAS
+    if sello is not None and time.time_ns() - sello < fijar_segundos() * 1_000_000_000:
+        return DEFAULT_DB_ALIAS
+    return REPLICA
+
+
+class ReplicaRouter:
+    """Primaria para todo lo que no pida la réplica explícitamente; anota las escrituras."""
+
+    def db_for_read(self, model, **hints):
+        return None  # default (o la base de la instancia relacionada)
+
+    def db_for_write(self, model, **hints):
+        estado = _estado.get()
+        if estado is not None:
+            estado.escribio = True
+        else:
+            _ultima_escritura.set(time.time())
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # misma base lógica: la réplica es copia de la primaria
+        return {obj1._state.db, obj2._state.db} <= {DEFAULT_DB_ALIAS, REPLICA}
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS  # la réplica se llena por replicación
+
+
+class ReplicaMiddleware:
+    """
+    Abre el estado de la petición (¿viene fijada a la primaria?) y, si la
+    petición escribió, fija la sesión a la primaria por unos segundos.
+    Va al principio de MIDDLEWARE para cubrir las escrituras de sesión/login.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        estado = _Estado(fijado=COOKIE in request.COOKIES)
+        token = _estado.set(estado)
+        try:
+            response = self.get_response(request)
+        finally:
+            _estado.reset(token)
+        return self._fijar(estado, response)
+
+    async def __acall__(self, request):
+        estado = _Estado(fijado=COOKIE in request.COOKIES)
+        token = _estado.set(estado)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _estado.reset(token)
+        return self._fijar(estado, response)
+
+    def _fijar(self, estado, response):
+        if estado.escribio and hay_replica():
+            response.set_cookie(COOKIE, "1", max_age=fijar_segundos(), httponly=True, samesite="Lax")
+        return response
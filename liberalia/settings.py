@@ -25,10 +25,14 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'liberalia.metricas.MetricasMiddleware',  # Server-Timing y métricas por vista (página roles:metricas)
+    'liberalia.routers.ReplicaMiddleware',  # lecturas en réplica / sesión fijada a la primaria tras escribir
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'roles.middleware.RoleScopeMiddleware',  # request.scope: rol, banderas y editoriales del usuario
+    'liberalia.perfilador.PerfiladorMiddleware',  # ?_perfil=muestreo|cprofile (solo ADMIN)
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -37,7 +41,8 @@ ROOT_URLCONF = 'liberalia.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates que además mide el tiempo de render (liberalia/metricas.py)
+        'BACKEND': 'liberalia.metricas.DjangoTemplatesMedidos',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -68,6 +73,50 @@ DATABASES = {
     }
 }
 
+# Réplica de lectura opcional (liberalia/routers.py): se activa con
+# DB_REPLICA_HOST o DB_REPLICA_NAME; lo que no se indique se toma de la
+# primaria. Para probar en local con dos SQLite basta DB_REPLICA_NAME
+# apuntando a una copia del archivo (y DB_REPLICA_ENGINE=...sqlite3).
+if os.getenv("DB_REPLICA_HOST") or os.getenv("DB_REPLICA_NAME"):
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        "ENGINE": os.getenv("DB_REPLICA_ENGINE", DATABASES["default"]["ENGINE"]),
+        "NAME": os.getenv("DB_REPLICA_NAME", DATABASES["default"]["NAME"]),
+        "USER": os.getenv("DB_REPLICA_USER", DATABASES["default"]["USER"]),
+        "PASSWORD": os.getenv("DB_REPLICA_PASSWORD", DATABASES["default"]["PASSWORD"]),
+        "HOST": os.getenv("DB_REPLICA_HOST", DATABASES["default"]["HOST"]),
+        "PORT": os.getenv("DB_REPLICA_PORT", DATABASES["default"]["PORT"]),
+        # en tests la réplica es la misma base de prueba
+        "TEST": {"MIRROR": "default"},
+    }
+DATABASE_ROUTERS = ['liberalia.routers.ReplicaRouter']
+# Segundos que una sesión lee de la primaria después de escribir (atraso de la réplica)
+REPLICA_FIJAR_SEGUNDOS = int(os.getenv('REPLICA_FIJAR_SEGUNDOS', 5))
+
+
+# Autenticación: ModelBackend que carga el Profile junto al usuario
+AUTHENTICATION_BACKENDS = [
+    'roles.backends.ProfileModelBackend',
+]
+
+
+# Vistas async para paneles / detalle / exportación. Las activa el punto de
+# entrada ASGI (liberalia/asgi.py); con Passenger (WSGI) quedan las sync.
+ASYNC_VIEWS = os.getenv("ASYNC_VIEWS", "0") == "1"
+
+
+# Cache compartida por todos los procesos de Passenger: los sellos de versión
+# (liberalia/versiones.py) invalidan en todos los workers a la vez. Puede
+# apuntarse a Memcached/Redis vía .env sin tocar el código. Con la cache por
+# archivos incr() no es atómico y THROTTLE queda aproximado (accounts.W001 en
+# `manage.py check --deploy`): en producción conviene Memcached/Redis.
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv("CACHE_BACKEND", "django.core.cache.backends.filebased.FileBasedCache"),
+        "LOCATION": os.getenv("CACHE_LOCATION", str(BASE_DIR / "tmp" / "cache")),
+    }
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -104,6 +153,18 @@ USE_TZ = True
 STATIC_URL = '/static/'
 STATICFILES_DIRS = [BASE_DIR / 'static']
 
+# Archivos subidos / generados. Portadas: originales por hash de contenido y
+# miniaturas WebP/JPEG (catalogo/portadas.py), servidas por /catalogo/portada/
+MEDIA_URL = '/media/'
+MEDIA_ROOT = Path(os.getenv('MEDIA_ROOT', BASE_DIR / 'media'))
+PORTADAS_ROOT = MEDIA_ROOT / 'portadas'
+
+# Cola de trabajos (roles/trabajos.py). Los resultados no son públicos: van
+# bajo tmp/ y se descargan por la vista del trabajo, solo su dueño.
+TRABAJOS_ROOT = Path(os.getenv('TRABAJOS_ROOT', BASE_DIR / 'tmp' / 'trabajos'))
+# Exportaciones con más filas que esto se encolan en vez de transmitirse
+EXPORT_SINCRONO_MAX = int(os.getenv('EXPORT_SINCRONO_MAX', 20000))
+
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
@@ -111,6 +172,30 @@ STATICFILES_DIRS = [BASE_DIR / 'static']
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
+# Límite de intentos (accounts/throttle.py): regla → (máximo, ventana en s).
+# Superado el máximo se responde 429 sin calcular hashes ni enviar correos.
+# Ventana deslizante: cuentan la ventana actual y la fracción de la anterior.
+THROTTLE = {
+    "login_ip": (int(os.getenv('THROTTLE_LOGIN_IP', 30)), 300),        # intentos de login por IP
+    "login_email": (int(os.getenv('THROTTLE_LOGIN_EMAIL', 5)), 300),   # fallidos por cuenta
+    "reset_ip": (int(os.getenv('THROTTLE_RESET_IP', 10)), 3600),       # recuperaciones por IP
+    "reset_email": (int(os.getenv('THROTTLE_RESET_EMAIL', 3)), 3600),  # correos por cuenta
+}
+
+
+# Presupuesto por petición (liberalia/metricas.py): las que lo superan quedan
+# listadas en la página de métricas del panel de administración
+METRICAS_PRESUPUESTO = {
+    "ms": int(os.getenv('METRICAS_MAX_MS', 1000)),
+    "consultas": int(os.getenv('METRICAS_MAX_CONSULTAS', 30)),
+}
+
+# Perfilador bajo demanda (liberalia/perfilador.py): ?_perfil=muestreo|cprofile,
+# solo ADMIN. Los resultados se descargan desde la página de perfiles del panel.
+PERFILES_ROOT = Path(os.getenv('PERFILES_ROOT', BASE_DIR / 'tmp' / 'perfiles'))
+PERFIL_INTERVALO = float(os.getenv('PERFIL_INTERVALO', 0.001))  # segundos entre muestras
+
+
 # Redirecciones post-login y logout
 LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/accounts/login/'
@@ -5,6 +5,8 @@ from django.contrib.auth import views as auth_views
 from django.urls import reverse_lazy
 import os
 
+from accounts.views import ThrottledPasswordResetView
+
 # --------------------------------------------------------------------------
 # Definimos todas las rutas del proyecto
 # --------------------------------------------------------------------------
@@ -20,7 +22,7 @@ urlpatterns = [
 
     # Paso 1: vista para solicitar reseteo de contraseña
     path('accounts/password_reset/',
-         auth_views.PasswordResetView.as_view(
+         ThrottledPasswordResetView.as_view(  # con límite de intentos (accounts/throttle.py)
              template_name='accounts/password_reset.html',
              email_template_name='accounts/password_reset_email.txt',
              subject_template_name='accounts/password_reset_subject.txt',
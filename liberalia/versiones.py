@@ -0,0 +1,40 @@
+"""
+Sellos de versión compartidos en la cache de Django.
+
+Un sello es un entero (time.time_ns() del último cambio) guardado sin
+expiración bajo una clave con nombre, p. ej. "roles:scope:42". Las entradas
+de cache que dependen de un dato incluyen su sello; al cambiar el dato se
+"sube" el sello y todas esas entradas quedan obsoletas a la vez, en todos
+los procesos que comparten la cache (workers de Passenger).
+
+Se usa la hora en vez de un contador para que, si la cache pierde el sello
+(expulsión, reinicio), el nuevo nunca repita uno anterior.
+"""
+
+import time
+
+from django.core.cache import cache
+
+PREFIX = "ver:"
+
+
+def version_key(name: str) -> str:
+    """Clave de cache del sello (para leerlo junto a otras con get_many)."""
+    return PREFIX + name
+
+
+def get_version(name: str) -> int:
+    """Sello actual de `name` (lo crea si no existe)."""
+    key = version_key(name)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(name: str) -> int:
+    """Marca `name` como modificado: invalida toda entrada que use el sello anterior."""
+    version = time.time_ns()
+    cache.set(version_key(name), version, None)
+    return version
@@ -14,7 +14,7 @@ los perfiles de usuario y sus roles en el sistema.
 
 
 from django.contrib import admin
-from .models import Profile
+from .models import Profile, Trabajo
 
 
 # Registramos el modelo Profile en el admin de Django
@@ -26,3 +26,12 @@ class ProfileAdmin(admin.ModelAdmin):
     list_filter   = ("role",)
     # Habilitamos búsqueda por username y email del usuario relacionado
     search_fields = ("user__username", "user__email")
+
+
+# Cola de trabajos: solo lectura de estado / avance, para soporte
+@admin.register(Trabajo)
+class TrabajoAdmin(admin.ModelAdmin):
+    list_display  = ("pk", "tipo", "usuario", "estado", "progreso", "total", "creado", "terminado", "intentos")
+    list_filter   = ("estado", "tipo")
+    search_fields = ("usuario__username",)
+    readonly_fields = ("iniciado", "terminado", "worker", "latido", "intentos")
@@ -0,0 +1,66 @@
+# -------------------------------------------------------------------------------
+# Backend de autenticación de la app "roles".
+# Igual al ModelBackend de Django, pero al recuperar el usuario de la sesión en
+# cada petición trae también su Profile (JOIN), así user.profile.role no cuesta
+# otra consulta en vistas, helpers de rol ni templates.
+#
+# Además autentica por email (accounts.views.LoginView) con una sola consulta
+# por igualdad sobre Profile.email_normalizado (indexado). Se extiende este
+# backend en vez de agregar otro para no invalidar las sesiones abiertas
+# (guardan la ruta del backend).
+# -------------------------------------------------------------------------------
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+from .models import normalizar_email
+
+UserModel = get_user_model()
+
+
+class ProfileModelBackend(ModelBackend):
+    def authenticate(self, request, username=None, password=None, email=None, **kwargs):
+        """
+        authenticate(request, email=..., password=...) → usuario o None.
+
+        - Una consulta: auth_user JOIN roles_profile filtrando por el email
+          normalizado (índice), con el Profile ya cargado para el resto del request.
+        - Emails repetidos: gana siempre el usuario activo de menor id.
+        - Si el email no existe se calcula igual un hash de la contraseña, para
+          que la respuesta tarde lo mismo y no revele qué correos están registrados.
+
+        Sin `email` delega en ModelBackend (login del admin por username).
+        """
+        if email is None:
+            return super().authenticate(request, username=username, password=password, **kwargs)
+        email = normalizar_email(email)
+        if not email or password is None:
+            return None
+        user = (
+            UserModel._default_manager.select_related("profile")
+            .filter(profile__email_normalizado=email, is_active=True)
+            .order_by("pk")
+            .first()
+        )
+        if user is None:
+            UserModel().set_password(password)  # mismo costo que un check_password
+            return None
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
+
+    def get_user(self, user_id):
+        try:
+            user = UserModel._default_manager.select_related("profile").get(pk=user_id)
+        except UserModel.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
+
+    async def aget_user(self, user_id):
+        # request.auser() en vistas async (mismo JOIN que get_user)
+        try:
+            user = await UserModel._default_manager.select_related("profile").aget(pk=user_id)
+        except UserModel.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
+
@@ -0,0 +1,145 @@
+"""
+Estadísticas por editorial para el tablero del ADMIN (roles:estadisticas).
+
+Agregar LibroFicha en cada visita al tablero recorre el catálogo completo;
+en su lugar el comando `estadisticas_editoriales` (cron, p. ej. cada noche)
+saca una foto y el tablero solo lee la última (una consulta):
+
+    0 4 * * *  cd ~/liberalia && python manage.py estadisticas_editoriales
+
+Una corrida:
+- recorre el catálogo ordenado por editorial en lotes keyset
+  (keyset.iter_values, como las exportaciones), solo con las columnas
+  numéricas: la memoria no crece con el catálogo (mysqlclient no transmite
+  un resultado grande por partes: .iterator() lo traería completo),
+- agrupa por editorial y calcula todo de una vez por editorial (calcular()),
+- guarda una fila EstadisticaEditorial por editorial, todas con el mismo
+  `generado` (las editoriales sin fichas quedan con n_libros = 0).
+
+Medias, percentiles e histogramas se hacen con numpy sobre los arrays de
+cada editorial (una pasada por columna, sin bucles de Python por ficha).
+
+`datos` de cada foto:
+- precios:   [{moneda, n, promedio, mediana, min, max}] por moneda
+- descuento: {promedio, p25, p50, p75, histograma} (tramos de 5 puntos)
+- paginas:   {promedio, mediana, histograma} (tramos de 100; el último, 1000+)
+- meses:     [["AAAA-MM", n], …] títulos por mes de edición (meses con títulos)
+"""
+
+from collections import Counter
+from itertools import groupby
+from operator import itemgetter
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Subquery
+from django.utils import timezone
+
+from catalogo import referencias
+from catalogo.models import LibroFicha, Moneda
+from liberalia.routers import alias_lectura
+from .keyset import iter_values
+from .models import Editorial, EstadisticaEditorial
+
+DESCUENTO_TRAMO, DESCUENTO_TRAMOS = 5, 20   # 0–4.9, 5–9.9, …, 95–99.9
+PAGINAS_TRAMO, PAGINAS_TRAMOS = 100, 11     # 0–99, …, 900–999, 1000+
+
+# (moneda_id, precio, descuento, fecha_edicion, numero_paginas) por ficha
+COLUMNAS = ("moneda_id", "precio", "descuento_distribuidor", "fecha_edicion", "numero_paginas")
+
+
+def etiquetas_descuento() -> list[str]:
+    return [f"{i * DESCUENTO_TRAMO}–{(i + 1) * DESCUENTO_TRAMO}%" for i in range(DESCUENTO_TRAMOS)]
+
+
+def etiquetas_paginas() -> list[str]:
+    ultimo = (PAGINAS_TRAMOS - 1) * PAGINAS_TRAMO
+    return [f"{i * PAGINAS_TRAMO}–{(i + 1) * PAGINAS_TRAMO - 1}" for i in range(PAGINAS_TRAMOS - 1)] + [f"{ultimo}+"]
+
+
+# ----------------------------
+# Cálculo (una editorial)
+# ----------------------------
+def _r(valor) -> float:
+    return round(float(valor), 2)
+
+
+def _numericas(monedas, precios, descuentos, paginas) -> dict:
+    monedas = np.asarray(monedas)
+    precios = np.asarray(precios, dtype=float)
+    descuentos = np.asarray(descuentos, dtype=float)
+    paginas = np.asarray(paginas, dtype=np.int64)
+    por_moneda = []
+    for moneda in np.unique(monedas):
+        p = precios[monedas == moneda]
+        por_moneda.append({
+            "moneda": int(moneda), "n": int(p.size), "promedio": _r(p.mean()),
+            "mediana": _r(np.median(p)), "min": _r(p.min()), "max": _r(p.max()),
+        })
+    p25, p50, p75 = np.percentile(descuentos, [25, 50, 75])
+    tramos_descuento = np.minimum((descuentos // DESCUENTO_TRAMO).astype(np.int64), DESCUENTO_TRAMOS - 1)
+    tramos_paginas = np.minimum(paginas // PAGINAS_TRAMO, PAGINAS_TRAMOS - 1)
+    return {
+        "precios": por_moneda,
+        "descuento": {
+            "promedio": _r(descuentos.mean()), "p25": _r(p25), "p50": _r(p50), "p75": _r(p75),
+            "histograma": np.bincount(tramos_descuento, minlength=DESCUENTO_TRAMOS).tolist(),
+        },
+        "paginas": {
+            "promedio": _r(paginas.mean()), "mediana": _r(np.median(paginas)),
+            "histograma": np.bincount(tramos_paginas, minlength=PAGINAS_TRAMOS).tolist(),
+        },
+    }
+
+
+def calcular(filas) -> dict:
+    """Estadísticas de las fichas de UNA editorial (`filas`: tuplas COLUMNAS, al menos una)."""
+    monedas, precios, descuentos, fechas, paginas = zip(*filas)
+    datos = _numericas(monedas, precios, descuentos, paginas)
+    datos["meses"] = sorted(Counter(f"{fecha:%Y-%m}" for fecha in fechas).items())
+    return datos
+
+
+# ----------------------------
+# Corrida y lectura
+# ----------------------------
+def generar():
+    """Saca una foto de todas las editoriales; devuelve (generado, cantidad de fotos)."""
+    generado = timezone.now()
+    alias = alias_lectura()  # réplica si hay: es una lectura larga y tolera atraso
+    filas = iter_values(LibroFicha.objects.using(alias), "editorial_id", ("editorial_id", *COLUMNAS))
+    fotos = {}
+    for editorial_id, grupo in groupby(filas, key=itemgetter(0)):
+        grupo = [fila[1:] for fila in grupo]
+        datos = calcular(grupo)
+        for precio in datos["precios"]:
+            moneda = referencias.obtener(Moneda, precio["moneda"])
+            precio["moneda"] = moneda.code if moneda else str(precio["moneda"])
+        fotos[editorial_id] = EstadisticaEditorial(
+            editorial_id=editorial_id, generado=generado, n_libros=len(grupo), datos=datos,
+        )
+    for editorial_id in Editorial.objects.using(alias).values_list("pk", flat=True):  # sin fichas
+        fotos.setdefault(editorial_id, EstadisticaEditorial(editorial_id=editorial_id, generado=generado))
+    with transaction.atomic():
+        EstadisticaEditorial.objects.bulk_create(fotos.values(), batch_size=500)
+    return generado, len(fotos)
+
+
+def podar(conservar: int) -> int:
+    """Borra las corridas más viejas que las últimas `conservar`; devuelve las filas borradas."""
+    corte = list(
+        EstadisticaEditorial.objects.order_by("-generado").values_list("generado", flat=True)
+        .distinct()[conservar:conservar + 1]
+    )
+    if not corte:
+        return 0
+    return EstadisticaEditorial.objects.filter(generado__lte=corte[0]).delete()[0]
+
+
+def ultima() -> list[EstadisticaEditorial]:
+    """Fotos de la última corrida con su editorial, en una consulta (más libros primero)."""
+    corrida = EstadisticaEditorial.objects.order_by("-generado").values("generado")[:1]
+    return list(
+        EstadisticaEditorial.objects.filter(generado=Subquery(corrida))
+        .select_related("editorial").order_by("-n_libros", "editorial__nombre")
+    )
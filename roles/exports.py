@@ -0,0 +1,224 @@
+"""
+Exportación del panel en CSV, XLSX y JSON Lines con columnas a elección.
+
+- Columnas: ?columnas=comercial (un preset de PRESETS) o una lista de
+  claves de COLUMNAS separadas por coma (?columnas=isbn,titulo,precio).
+  Sin el parámetro se exportan las 5 columnas básicas de siempre.
+- Las filas llegan como tuplas de values_list por lotes (keyset.iter_values
+  / aiter_values), nunca como instancias del modelo.
+- Las FK a catálogos de referencia (moneda, país, idioma, tapa) se leen como
+  id y se traducen a su código desde catalogo.referencias, sin JOIN.
+- CSV y JSONL se transmiten línea a línea. XLSX no puede transmitirse (el
+  zip lleva su índice al final), pero openpyxl en modo write_only escribe
+  cada fila a disco apenas llega: la memoria no crece con el catálogo.
+"""
+
+import csv
+import json
+import tempfile
+from datetime import date
+from decimal import Decimal
+from typing import NamedTuple
+
+from asgiref.sync import sync_to_async
+from django.http import FileResponse, StreamingHttpResponse
+
+from catalogo import referencias
+from catalogo.models import Idioma, Moneda, Pais, TipoTapa
+
+try:
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+except ImportError:  # openpyxl es opcional: sin él no se ofrece XLSX
+    Workbook = None
+
+
+class Columna(NamedTuple):
+    clave: str        # nombre en ?columnas= y en cada objeto JSONL
+    encabezado: str   # primera fila de CSV / XLSX
+    campo: str        # campo de values_list
+    referencia: type | None = None  # catálogo de referencia: se exporta su código
+
+
+COLUMNAS = {c.clave: c for c in [
+    Columna("isbn", "ISBN", "isbn"),
+    Columna("titulo", "TÍTULO", "titulo"),
+    Columna("autor", "AUTOR", "autor"),
+    Columna("editorial", "EDITORIAL", "editorial__nombre"),
+    Columna("fecha", "FECHA_EDICIÓN", "fecha_edicion"),
+    Columna("ean", "EAN", "ean"),
+    Columna("subtitulo", "SUBTÍTULO", "subtitulo"),
+    Columna("edicion", "N_EDICIÓN", "numero_edicion"),
+    Columna("precio", "PRECIO", "precio"),
+    Columna("moneda", "MONEDA", "moneda_id", Moneda),
+    Columna("descuento", "DESCUENTO_DISTRIBUIDOR", "descuento_distribuidor"),
+    Columna("paginas", "PÁGINAS", "numero_paginas"),
+    Columna("alto", "ALTO_CM", "alto_cm"),
+    Columna("ancho", "ANCHO_CM", "ancho_cm"),
+    Columna("grosor", "GROSOR_CM", "grosor_cm"),
+    Columna("peso", "PESO_GR", "peso_gr"),
+    Columna("tapa", "TAPA", "tipo_tapa_id", TipoTapa),
+    Columna("idioma", "IDIOMA", "idioma_original_id", Idioma),
+    Columna("pais", "PAÍS", "pais_edicion_id", Pais),
+]}
+
+BASICAS = ["isbn", "titulo", "autor", "editorial", "fecha"]
+PRESETS = {
+    "basico": BASICAS,
+    # lo que piden los distribuidores: precio y ficha física
+    "comercial": [
+        "isbn", "ean", "titulo", "autor", "editorial", "fecha", "precio", "moneda",
+        "descuento", "paginas", "alto", "ancho", "grosor", "peso", "tapa",
+    ],
+    "completo": list(COLUMNAS),
+}
+
+# formato → (content-type, extensión)
+FORMATOS = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "jsonl": ("application/x-ndjson; charset=utf-8", "jsonl"),
+}
+if Workbook is not None:
+    FORMATOS["xlsx"] = ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "xlsx")
+
+
+def columnas_de(valor: str | None) -> list[Columna]:
+    """Columnas pedidas en ?columnas= (preset o lista); ValueError si alguna no existe."""
+    claves = PRESETS.get(valor or "basico") or [c.strip() for c in valor.split(",") if c.strip()]
+    desconocidas = [c for c in claves if c not in COLUMNAS]
+    if desconocidas or not claves:
+        raise ValueError(f"Columnas no válidas: {', '.join(desconocidas) or valor}")
+    return [COLUMNAS[c] for c in dict.fromkeys(claves)]  # sin repetidas, en el orden pedido
+
+
+def campos(columnas) -> list[str]:
+    return [c.campo for c in columnas]
+
+
+def nombre_archivo(formato: str) -> str:
+    return f"libros.{FORMATOS[formato][1]}"
+
+
+# ----------------------------
+# Filas
+# ----------------------------
+def preparar(columnas):
+    """
+    Devuelve la función que pasa una tupla de values_list a la fila exportada
+    (ids de referencia → código). Las tablas de referencia se copian aquí, una
+    vez por exportación: el recorrido posterior no vuelve a consultar.
+    """
+    mapas = {}
+    for c in columnas:
+        if c.referencia and c.referencia not in mapas:
+            mapas[c.referencia] = {
+                obj.pk: getattr(obj, "code", None) or obj.nombre for obj in referencias.todos(c.referencia)
+            }
+    por_columna = [mapas.get(c.referencia) for c in columnas]
+
+    def fila(row) -> list:
+        return [valor if mapa is None else mapa.get(valor) for mapa, valor in zip(por_columna, row)]
+
+    return fila
+
+
+def _a_texto(valor):
+    if valor is None:
+        return ""
+    if isinstance(valor, date):
+        return valor.isoformat()
+    return valor
+
+
+def _a_json(valor):
+    if isinstance(valor, Decimal):
+        return str(valor)  # texto exacto: un float perdería precisión
+    if isinstance(valor, date):
+        return valor.isoformat()
+    raise TypeError(f"{type(valor).__name__} no serializable")
+
+
+class _Echo:
+    """Pseudo-archivo para csv.writer: devuelve la línea en vez de guardarla."""
+    def write(self, value):
+        return value
+
+
+def _serializador(formato: str, columnas):
+    """(encabezado o None, función fila → línea de texto) para CSV / JSONL."""
+    if formato == "csv":
+        writer = csv.writer(_Echo())
+        return (
+            writer.writerow([c.encabezado for c in columnas]),
+            lambda fila: writer.writerow([_a_texto(v) for v in fila]),
+        )
+    claves = [c.clave for c in columnas]
+    return None, lambda fila: json.dumps(dict(zip(claves, fila)), ensure_ascii=False, default=_a_json) + "\n"
+
+
+def lineas(formato: str, columnas, rows):
+    """Líneas de texto (CSV / JSONL) a partir de las tuplas de values_list."""
+    encabezado, linea = _serializador(formato, columnas)
+    fila = preparar(columnas)
+    if encabezado is not None:
+        yield encabezado
+    for row in rows:
+        yield linea(fila(row))
+
+
+async def alineas(formato: str, columnas, rows):
+    """lineas() para un recorrido async (keyset.aiter_values)."""
+    encabezado, linea = _serializador(formato, columnas)
+    fila = await sync_to_async(preparar)(columnas)  # puede recargar referencias
+    if encabezado is not None:
+        yield encabezado
+    async for row in rows:
+        yield linea(fila(row))
+
+
+def escribir_xlsx(columnas, rows, destino) -> None:
+    """Libro XLSX en `destino` (ruta o archivo) con openpyxl en modo write_only."""
+    libro = Workbook(write_only=True)
+    hoja = libro.create_sheet("Libros")
+    negrita = Font(bold=True)
+    encabezado = []
+    for c in columnas:
+        celda = WriteOnlyCell(hoja, value=c.encabezado)
+        celda.font = negrita
+        encabezado.append(celda)
+    hoja.append(encabezado)
+    fila = preparar(columnas)
+    for row in rows:
+        hoja.append(fila(row))  # fechas y Decimal quedan como fecha / número en Excel
+    libro.save(destino)
+
+
+def escribir(formato: str, columnas, rows, ruta) -> None:
+    """Exportación completa a un archivo (trabajos en segundo plano)."""
+    if formato == "xlsx":
+        escribir_xlsx(columnas, rows, ruta)
+        return
+    with open(ruta, "w", newline="", encoding="utf-8") as f:
+        f.writelines(lineas(formato, columnas, rows))
+
+
+# ----------------------------
+# Respuestas HTTP
+# ----------------------------
+def respuesta(formato: str, columnas, rows):
+    """
+    CSV / JSONL: StreamingHttpResponse (rows puede ser un iterador async).
+    XLSX: el libro se arma en un archivo temporal y se sirve con FileResponse,
+    que lo cierra (y el sistema lo borra) al terminar de enviarlo.
+    """
+    content_type, _ = FORMATOS[formato]
+    if formato == "xlsx":
+        tmp = tempfile.TemporaryFile()
+        escribir_xlsx(columnas, rows, tmp)
+        tmp.seek(0)
+        return FileResponse(tmp, as_attachment=True, filename=nombre_archivo(formato), content_type=content_type)
+    stream = alineas(formato, columnas, rows) if hasattr(rows, "__aiter__") else lineas(formato, columnas, rows)
+    response = StreamingHttpResponse(stream, content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="{nombre_archivo(formato)}"'
+    return response
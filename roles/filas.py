@@ -0,0 +1,79 @@
+"""
+Filas de la tabla del panel, armadas en una sola pasada.
+
+Antes se renderizaban con un {% for %} de template sobre instancias
+completas de LibroFicha, con un {% url %} (reverse) por fila: con páginas
+grandes el render dominaba el tiempo de la petición. Ahora:
+
+- la página se pide con .values() y solo las columnas que se muestran (COLUMNAS),
+- la URL de detalle / edición se resuelve UNA vez por página (prefijo y
+  sufijo alrededor del ISBN) y cada fila solo concatena,
+- cada celda se escapa con html.escape (lo mismo que el autoescape de
+  Django) y las filas se juntan con un join.
+
+El resultado es el mismo HTML que daba el template (se cachea igual, ver
+roles/panel_cache.py): no usar acá nada propio del usuario ni los filtros
+crudos del request, solo las banderas del rol.
+"""
+
+from html import escape
+from urllib.parse import quote
+
+from django.urls import reverse
+
+from catalogo.templatetags.portadas_tags import portada
+
+# Columnas que pide build_page (además de pk y la columna de orden)
+COLUMNAS = ("isbn", "titulo", "autor", "editorial__nombre", "fecha_edicion", "codigo_imagen")
+
+_MARCA = "__isbn__"
+# Caracteres que reverse() deja sin codificar en los argumentos de la URL.
+# Sin "/": <str:isbn> no la acepta, así que un ISBN con barra queda como %2F
+# dentro de su segmento en vez de apuntar a otra ruta.
+_SEGUROS = "!$&'()*+,;=~:@"
+
+SIN_RESULTADOS = (
+    '<tr>\n  <td colspan="6" class="text-center text-muted py-4">Sin resultados</td>\n</tr>\n'
+)
+
+
+def _url_de(nombre: str):
+    """Función isbn → URL ya escapada para un atributo, con un solo reverse()."""
+    prefijo, sufijo = reverse(nombre, args=[_MARCA]).split(_MARCA)
+    prefijo, sufijo = escape(prefijo), escape(sufijo)
+    return lambda isbn: prefijo + escape(quote(isbn, safe=_SEGUROS)) + sufijo
+
+
+def _accion(flags: dict):
+    """Función isbn → HTML de la celda de acción según las banderas del rol."""
+    if flags.get("can_edit") and flags.get("edit_url_name"):
+        url = _url_de(flags["edit_url_name"])
+        return lambda isbn: f'<a class="btn btn-sm btn-outline-primary" href="{url(isbn)}" >Editar</a>'
+    if flags.get("show_detail"):
+        url = _url_de("catalogo:libro_detalle")
+        return lambda isbn: f'<a class="btn btn-sm btn-outline-burdeo" href="{url(isbn)}">Detalle</a>'
+    return lambda isbn: '<span class="text-muted">—</span>'
+
+
+def render_filas(rows, flags: dict) -> str:
+    """HTML del <tbody> del panel para `rows` (dicts con COLUMNAS)."""
+    if not rows:
+        return SIN_RESULTADOS
+    accion = _accion(flags)
+    partes = []
+    for r in rows:
+        isbn = r["isbn"]
+        titulo = escape(r["titulo"] or "")
+        imagen = r["codigo_imagen"]
+        if imagen:
+            titulo = f'<span class="me-2 align-middle">{portada(imagen, "mini", r["titulo"])}</span>{titulo}'
+        fecha = r["fecha_edicion"]
+        partes.append(
+            f'<tr>\n  <td class="fw-semibold">{escape(isbn)}</td>\n'
+            f"  <td>{titulo}</td>\n"
+            f'  <td>{escape(r["autor"] or "")}</td>\n'
+            f'  <td>{escape(r["editorial__nombre"] or "")}</td>\n'
+            f'  <td>{fecha.strftime("%d/%m/%Y") if fecha else ""}</td>\n'
+            f'  <td class="text-end">{accion(isbn)}</td>\n</tr>\n'
+        )
+    return "".join(partes)
@@ -0,0 +1,152 @@
+"""
+Recorrido por "keyset" (seek) de querysets ordenados.
+
+En lugar de OFFSET, cada lote se pide con un filtro sobre la última
+clave vista: (columna de orden, id) > (valor, pk). Así cada consulta
+usa el índice de la columna de orden y cuesta lo mismo en el primer
+lote que en el número 500, sin importar el tamaño del catálogo.
+
+Requisito: la columna de orden no debe admitir NULL (es el caso de
+todas las columnas de ALLOWED_SORTS).
+"""
+
+import base64
+import json
+from datetime import date
+from operator import attrgetter, itemgetter
+
+from django.db.models import F, Q
+
+
+# Tamaño de lote por defecto para recorridos completos (exportaciones)
+CHUNK_SIZE = 2000
+
+# Tipo del valor de las columnas de orden que no son texto (fecha; la
+# relevancia de búsqueda que anota el panel para ?sort=relevancia)
+TIPOS = {"fecha_edicion": date, "orden_relevancia": int}
+
+
+def seek_q(field: str, value, pk) -> Q:
+    """Filtro de las filas que van DESPUÉS de (value, pk) en el orden (field, pk)."""
+    return Q(**{f"{field}__gt": value}) | Q(**{field: value, "pk__gt": pk})
+
+
+def iter_values(qs, field: str, columns, chunk_size: int | None = None):
+    """
+    Recorre `qs` completo en lotes de `chunk_size` ordenados por (field, pk)
+    y va entregando tuplas con solo las `columns` pedidas.
+
+    Solo se mantiene un lote en memoria a la vez, por lo que el consumo es
+    plano aunque el queryset tenga cientos de miles de filas.
+    """
+    chunk_size = chunk_size or CHUNK_SIZE
+    qs = qs.order_by(field, "pk")
+    cols = (field, "pk", *columns)
+    last = None
+    while True:
+        page = qs.filter(seek_q(field, *last)) if last else qs
+        batch = list(page.values_list(*cols)[:chunk_size])
+        for row in batch:
+            yield row[2:]
+        if len(batch) < chunk_size:
+            return
+        last = batch[-1][:2]
+
+
+async def aiter_values(qs, field: str, columns, chunk_size: int | None = None):
+    """iter_values para vistas async: cada lote se lee con el ORM async."""
+    chunk_size = chunk_size or CHUNK_SIZE
+    qs = qs.order_by(field, "pk")
+    cols = (field, "pk", *columns)
+    last = None
+    while True:
+        page = qs.filter(seek_q(field, *last)) if last else qs
+        batch = [row async for row in page.values_list(*cols)[:chunk_size]]
+        for row in batch:
+            yield row[2:]
+        if len(batch) < chunk_size:
+            return
+        last = batch[-1][:2]
+
+
+# ----------------------------
+# Paginación por cursor
+# ----------------------------
+def seek_before_q(field: str, value, pk) -> Q:
+    """Filtro de las filas que van ANTES de (value, pk) en el orden (field, pk)."""
+    return Q(**{f"{field}__lt": value}) | Q(**{field: value, "pk__lt": pk})
+
+
+def encode_cursor(direction: str, field: str, value, pk) -> str:
+    """
+    Token opaco y estable para la URL: dirección ('n'ext / 'p'rev), columna de
+    orden y la clave (valor, id) de la fila frontera.
+    """
+    if isinstance(value, date):
+        value = {"d": value.isoformat()}
+    raw = json.dumps([direction, field, value, pk], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str | None, field: str):
+    """
+    Devuelve (direction, value, pk) o None si el token no es válido, fue
+    generado para otra columna de orden o el valor no es del tipo de la
+    columna (en esos casos se parte en la 1ª página).
+    """
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        direction, token_field, value, pk = json.loads(raw)
+        if isinstance(value, dict):
+            value = date.fromisoformat(value["d"])
+    except (ValueError, TypeError, KeyError):
+        return None
+    if direction not in ("n", "p") or token_field != field or not isinstance(pk, int):
+        return None
+    if not isinstance(value, TIPOS.get(field, str)) or isinstance(value, bool):
+        return None
+    return direction, value, pk
+
+
+def paginate(qs, field: str, token: str | None, per_page: int, columns=None) -> dict:
+    """
+    Una página de `qs` ordenada por (field, pk) a partir del cursor `token`.
+
+    Cada página es una sola consulta con LIMIT per_page + 1 (la fila extra
+    solo indica si hay más), sin OFFSET. Devuelve las filas y los tokens
+    'next_cursor' / 'prev_cursor' (None cuando no hay página en ese sentido).
+    Con `columns` las filas son dicts (.values()) con solo esas columnas
+    (más "pk" y "seek_value"); sin ellas, instancias del modelo.
+    """
+    qs = qs.annotate(seek_value=F(field))
+    if columns is not None:
+        qs = qs.values("pk", "seek_value", *columns)
+        clave = itemgetter("seek_value", "pk")
+    else:
+        clave = attrgetter("seek_value", "pk")
+    cursor = decode_cursor(token, field)
+
+    if cursor and cursor[0] == "p":
+        _, value, pk = cursor
+        rows = list(qs.filter(seek_before_q(field, value, pk))
+                      .order_by(f"-{field}", "-pk")[:per_page + 1])
+        has_prev = len(rows) > per_page
+        rows = rows[:per_page][::-1]
+        has_next = True
+    else:
+        if cursor:
+            _, value, pk = cursor
+            qs = qs.filter(seek_q(field, value, pk))
+        rows = list(qs.order_by(field, "pk")[:per_page + 1])
+        has_next = len(rows) > per_page
+        rows = rows[:per_page]
+        has_prev = cursor is not None
+
+    first, last = (rows[0], rows[-1]) if rows else (None, None)
+    return {
+        "rows": rows,
+        "next_cursor": encode_cursor("n", field, *clave(last)) if has_next and last else None,
+        "prev_cursor": encode_cursor("p", field, *clave(first)) if has_prev and first else None,
+    }
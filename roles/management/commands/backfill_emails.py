@@ -0,0 +1,62 @@
+"""
+Completa Profile.email_normalizado (índice del login por email) para los
+usuarios existentes.
+
+Uso:
+    python manage.py backfill_emails [--lote 1000]
+
+Recorre auth_user por lotes, crea el Profile que falte y corrige los que no
+coinciden con user.email (p. ej. emails cambiados con un UPDATE directo, que
+no dispara la señal). Informa los emails que comparten varios usuarios: el
+login por email toma siempre el activo de menor id.
+"""
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from roles.models import Profile, normalizar_email
+
+
+class Command(BaseCommand):
+    help = "Completa el email normalizado de los perfiles (login por email)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=1000, help="Usuarios por lote (default 1000).")
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        lote = options["lote"]
+        ultimo, actualizados, creados = 0, 0, 0
+        while True:
+            batch = list(
+                User.objects.filter(pk__gt=ultimo).order_by("pk")
+                .select_related("profile").only("pk", "email", "profile__id", "profile__email_normalizado")[:lote]
+            )
+            if not batch:
+                break
+            cambios, nuevos = [], []
+            for user in batch:
+                email = normalizar_email(user.email)
+                profile = getattr(user, "profile", None)
+                if profile is None:
+                    nuevos.append(Profile(user=user, email_normalizado=email))
+                elif profile.email_normalizado != email:
+                    profile.email_normalizado = email
+                    cambios.append(profile)
+            with transaction.atomic():
+                Profile.objects.bulk_update(cambios, ["email_normalizado"])
+                Profile.objects.bulk_create(nuevos)
+            actualizados += len(cambios)
+            creados += len(nuevos)
+            ultimo = batch[-1].pk
+
+        repetidos = (
+            Profile.objects.exclude(email_normalizado="").values("email_normalizado")
+            .annotate(n=Count("pk")).filter(n__gt=1).order_by("email_normalizado")
+        )
+        for fila in repetidos:
+            self.stderr.write(f"  email repetido: {fila['email_normalizado']} ({fila['n']} usuarios)")
+
+        self.stdout.write(self.style.SUCCESS(f"Listo: {actualizados} actualizados, {creados} perfiles creados."))
@@ -0,0 +1,287 @@
+"""
+Banco de pruebas de carga para los caminos calientes: paneles por rol,
+detalle de ficha y exportaciones (CSV, XLSX, JSONL).
+
+Uso:
+    python manage.py benchmark_panel                       # imprime resultados
+    python manage.py benchmark_panel --guardar base.json   # guarda una línea base
+    python manage.py benchmark_panel --comparar base.json  # compara contra ella
+
+Cada escenario se ejecuta con el cliente de pruebas de Django (toda la pila:
+middlewares, vistas y templates) como un usuario real de cada rol (se toma
+el primero que exista; ver generar_catalogo). Las peticiones de un
+escenario se repiten con la misma URL, así que los escenarios del panel
+corren sin la cache de páginas (PANEL_CACHE_PAGINAS = False) para medir las
+consultas; "panel_admin_cacheado" mide los aciertos de esa cache.
+
+Para comparar el camino WSGI con el ASGI:
+    python manage.py benchmark_panel --async --concurrencia 20
+        AsyncClient (handler ASGI) con N peticiones simultáneas; correr con
+        ASYNC_VIEWS=1 para medir las vistas async.
+    python manage.py benchmark_panel --servidor http://127.0.0.1:8000 --concurrencia 20
+        peticiones HTTP reales contra un servidor ya levantado, p. ej.
+        `gunicorn passenger_wsgi` frente a `uvicorn liberalia.asgi:application`
+        (sin conteo de consultas ni memoria: corren en otro proceso, que
+        usa su propia configuración de la cache de páginas).
+
+Se informa por escenario: latencia p50/p95 (ms), peticiones por segundo,
+consultas SQL por petición y memoria máxima (KB, tracemalloc en una pasada
+aparte para no distorsionar los tiempos), y al final los aciertos / fallos
+de la cache de páginas del panel.
+"""
+
+import asyncio
+import json
+import random
+import re
+import statistics
+import time
+import tracemalloc
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import AsyncClient, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from catalogo.models import LibroFicha
+from roles import panel_cache
+from roles.models import Profile
+
+
+SIGUIENTE = re.compile(r'cursor=([\w-]+)">Siguiente')
+# Escenarios que se miden CON la cache de páginas del panel
+CON_CACHE = {"panel_admin_cacheado"}
+
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    k = max(0, min(len(ordenados) - 1, round(p / 100 * (len(ordenados) - 1))))
+    return ordenados[k]
+
+
+def _consumir(response) -> int:
+    """Lee la respuesta completa (también si es streaming); devuelve bytes."""
+    if response.streaming:
+        return sum(len(chunk) for chunk in response.streaming_content)
+    return len(response.content)
+
+
+async def _aconsumir(response) -> int:
+    if response.streaming:
+        return sum([len(chunk) async for chunk in response.streaming_content])
+    return len(response.content)
+
+
+class _ClienteHTTP:
+    """Cliente mínimo contra un servidor real, con la cookie de sesión del rol."""
+
+    def __init__(self, base: str, cookies):
+        self.base = base.rstrip("/")
+        self.cookie = "; ".join(f"{k}={v.value}" for k, v in cookies.items())
+
+    def get(self, url) -> int:
+        req = urllib.request.Request(self.base + url, headers={"Cookie": self.cookie})
+        try:
+            with urllib.request.urlopen(req) as resp:
+                return len(resp.read())
+        except urllib.error.HTTPError as e:
+            return len(e.read())
+
+
+class Command(BaseCommand):
+    help = "Mide p50/p95, consultas por petición y memoria de paneles, detalle y exportación."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeticiones", type=int, default=20, help="Peticiones por escenario (default 20).")
+        parser.add_argument("--repeticiones-export", type=int, default=3, help="Peticiones de exportación (default 3).")
+        parser.add_argument("--paginas", type=int, default=20, help="Profundidad de la página 'profunda' (default 20).")
+        parser.add_argument("--guardar", metavar="JSON", help="Guarda los resultados como línea base.")
+        parser.add_argument("--comparar", metavar="JSON", help="Compara contra una línea base guardada.")
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--async", dest="asincrono", action="store_true",
+                            help="Mide por el handler ASGI (AsyncClient).")
+        parser.add_argument("--servidor", metavar="URL", help="Mide contra un servidor HTTP ya levantado.")
+        parser.add_argument("--concurrencia", type=int, default=1,
+                            help="Peticiones simultáneas (con --async o --servidor; default 1).")
+
+    def handle(self, *args, **o):
+        self.rnd = random.Random(o["seed"])
+        if o["concurrencia"] > 1 and not (o["asincrono"] or o["servidor"]):
+            raise CommandError("--concurrencia requiere --async o --servidor.")
+        clientes = self._clientes()
+        escenarios = self._escenarios(clientes, o)
+        if o["servidor"]:
+            medir = lambda c, urls, reps: self._medir_http(_ClienteHTTP(o["servidor"], c.cookies), urls, reps, o["concurrencia"])
+        elif o["asincrono"]:
+            medir = lambda c, urls, reps: self._medir_async(c.cookies, urls, reps, o["concurrencia"])
+            self.stdout.write(f"ASGI (vistas {'async' if settings.ASYNC_VIEWS else 'sync'})")
+        else:
+            medir = self._medir
+
+        resultados = {}
+        panel_cache.reiniciar_contadores()
+        hosts = [*settings.ALLOWED_HOSTS, "testserver"]
+        with override_settings(ALLOWED_HOSTS=hosts):
+            for nombre, (cliente, urls, reps) in escenarios.items():
+                with override_settings(PANEL_CACHE_PAGINAS=nombre in CON_CACHE):
+                    resultados[nombre] = medir(cliente, urls, reps)
+                self.stdout.write(f"  {nombre}: listo")
+
+        base = self._leer(o["comparar"]) if o["comparar"] else {}
+        self._imprimir(resultados, base)
+        self.stdout.write("\ncache de páginas del panel: {hits} aciertos, {misses} fallos (tasa {ratio})".format(
+            **panel_cache.contadores()))
+        if o["guardar"]:
+            with open(o["guardar"], "w", encoding="utf-8") as f:
+                json.dump(resultados, f, indent=2, ensure_ascii=False)
+            self.stdout.write(self.style.SUCCESS(f"Línea base guardada en {o['guardar']}"))
+
+    # ----------------------------
+    # Preparación
+    # ----------------------------
+    def _clientes(self) -> dict:
+        User = get_user_model()
+        clientes = {}
+        for role in (Profile.ROLE_ADMIN, Profile.ROLE_EDITOR, Profile.ROLE_CONSULTOR):
+            user = User.objects.filter(profile__role=role, is_active=True).order_by("-username").first()
+            if user is None:
+                raise CommandError(f"No hay usuarios con rol {role} (use generar_catalogo).")
+            cliente = Client()
+            cliente.force_login(user)
+            clientes[role] = cliente
+        return clientes
+
+    def _cursor_profundo(self, cliente, url, paginas):
+        """Sigue el link 'Siguiente' `paginas` veces (sin medir) y devuelve esa URL."""
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]):
+            for _ in range(paginas):
+                siguiente = SIGUIENTE.search(cliente.get(url).content.decode())
+                if not siguiente:
+                    break
+                url = f"{url.split('?')[0]}?cursor={siguiente.group(1)}"
+        return url
+
+    def _escenarios(self, c, o) -> dict:
+        admin, editor, consultor = c[Profile.ROLE_ADMIN], c[Profile.ROLE_EDITOR], c[Profile.ROLE_CONSULTOR]
+        reps, reps_export = o["repeticiones"], o["repeticiones_export"]
+        isbns = list(LibroFicha.objects.order_by("?").values_list("isbn", flat=True)[:reps]) or ["0"]
+
+        escenarios = {
+            "panel_admin": (admin, ["/panel/admin/"], reps),
+            "panel_admin_cacheado": (admin, ["/panel/admin/"], reps),
+            "panel_consultor": (consultor, ["/panel/consultor/"], reps),
+            "panel_editor": (editor, ["/panel/editor/"], reps),
+            "panel_editor_busqueda": (editor, ["/panel/editor/?q_titulo=amor"], reps),
+            "panel_admin_busqueda": (admin, ["/panel/admin/?q=sintetica"], reps),
+            "panel_admin_profunda": (admin, [self._cursor_profundo(admin, "/panel/admin/", o["paginas"])], reps),
+            "detalle": (consultor, [f"/catalogo/libro/{isbn}/" for isbn in isbns], reps),
+            "export_csv": (admin, ["/panel/admin/?export=csv"], reps_export),
+            "export_xlsx": (admin, ["/panel/admin/?export=xlsx&columnas=comercial"], reps_export),
+            "export_jsonl": (admin, ["/panel/admin/?export=jsonl&columnas=completo"], reps_export),
+        }
+        for sort in ("isbn", "autor", "editorial", "fecha"):
+            escenarios[f"panel_admin_sort_{sort}"] = (admin, [f"/panel/admin/?sort={sort}"], reps)
+        return escenarios
+
+    # ----------------------------
+    # Medición
+    # ----------------------------
+    def _medir(self, cliente, urls, reps) -> dict:
+        tiempos, consultas, bytes_ = [], [], 0
+        _consumir(cliente.get(urls[0]))  # calentamiento (caches, plantillas compiladas)
+        for i in range(reps):
+            url = urls[i % len(urls)]
+            with CaptureQueriesContext(connection) as q:
+                inicio = time.perf_counter()
+                response = cliente.get(url)
+                bytes_ = _consumir(response)
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+            consultas.append(len(q))
+
+        tracemalloc.start()
+        _consumir(cliente.get(urls[0]))
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        return self._resumen(tiempos, sum(tiempos) / 1000, max(consultas), round(pico / 1024, 1), bytes_)
+
+    def _medir_async(self, cookies, urls, reps, concurrencia) -> dict:
+        """Como _medir, por el handler ASGI, con `concurrencia` peticiones a la vez."""
+        cliente = AsyncClient()
+        cliente.cookies = cookies
+        tiempos = []
+
+        async def una(url):
+            inicio = time.perf_counter()
+            n = await _aconsumir(await cliente.get(url))
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+            return n
+
+        async def correr():
+            bytes_ = 0
+            for desde in range(0, reps, concurrencia):
+                lote = [una(urls[i % len(urls)]) for i in range(desde, min(reps, desde + concurrencia))]
+                bytes_ = (await asyncio.gather(*lote))[-1]
+            return bytes_
+
+        async_to_sync(una)(urls[0])  # calentamiento
+        tiempos.clear()
+        with CaptureQueriesContext(connection) as q:
+            inicio = time.perf_counter()
+            bytes_ = async_to_sync(correr)()
+            total = time.perf_counter() - inicio
+        return self._resumen(tiempos, total, round(len(q) / reps, 1), None, bytes_)
+
+    def _medir_http(self, cliente, urls, reps, concurrencia) -> dict:
+        """Peticiones HTTP reales con `concurrencia` threads."""
+        def una(i):
+            inicio = time.perf_counter()
+            n = cliente.get(urls[i % len(urls)])
+            return (time.perf_counter() - inicio) * 1000, n
+
+        cliente.get(urls[0])  # calentamiento
+        with ThreadPoolExecutor(concurrencia) as pool:
+            inicio = time.perf_counter()
+            medidas = list(pool.map(una, range(reps)))
+            total = time.perf_counter() - inicio
+        return self._resumen([t for t, _ in medidas], total, None, None, medidas[-1][1])
+
+    def _resumen(self, tiempos, total_s, consultas, pico_kb, bytes_) -> dict:
+        return {
+            "n": len(tiempos),
+            "p50_ms": round(statistics.median(tiempos), 2),
+            "p95_ms": round(_percentil(tiempos, 95), 2),
+            "rps": round(len(tiempos) / total_s, 1) if total_s else None,
+            "consultas": consultas,
+            "pico_kb": pico_kb,
+            "bytes": bytes_,
+        }
+
+    # ----------------------------
+    # Salida
+    # ----------------------------
+    def _leer(self, ruta) -> dict:
+        try:
+            with open(ruta, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            raise CommandError(f"No se pudo leer la línea base {ruta}: {e}")
+
+    def _imprimir(self, resultados, base):
+        cols = ("p50_ms", "p95_ms", "rps", "consultas", "pico_kb")
+        self.stdout.write(f"\n{'escenario':<28}" + "".join(f"{c:>22}" for c in cols))
+        for nombre, r in resultados.items():
+            linea = f"{nombre:<28}"
+            for c in cols:
+                celda = "-" if r.get(c) is None else f"{r[c]}"
+                anterior = base.get(nombre, {}).get(c)
+                if anterior and r.get(c) is not None:
+                    celda += f" ({(r[c] - anterior) / anterior * 100:+.0f}%)"
+                linea += f"{celda:>22}"
+            self.stdout.write(linea)
@@ -0,0 +1,32 @@
+"""
+Saca una foto de las estadísticas de cada editorial (tablero roles:estadisticas).
+
+Uso:
+    python manage.py estadisticas_editoriales [--conservar 30]
+
+Pensado para un cron periódico (ver roles/estadisticas.py). Cada corrida
+agrega una foto por editorial y borra las corridas más viejas que las
+últimas --conservar.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from roles import estadisticas
+
+
+class Command(BaseCommand):
+    help = "Calcula y guarda las estadísticas por editorial del tablero de administración."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--conservar", type=int, default=30, help="Corridas que se guardan (default 30).")
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        generado, fotos = estadisticas.generar()
+        borradas = estadisticas.podar(max(1, options["conservar"]))
+        self.stdout.write(self.style.SUCCESS(
+            f"Listo: {fotos} editoriales ({generado:%Y-%m-%d %H:%M}) en {time.perf_counter() - inicio:.1f} s;"
+            f" {borradas} fotos viejas borradas."
+        ))
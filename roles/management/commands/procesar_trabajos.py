@@ -0,0 +1,97 @@
+"""
+Worker de la cola de trabajos (exportaciones grandes, importaciones).
+
+Uso:
+    python manage.py procesar_trabajos                    # queda escuchando
+    python manage.py procesar_trabajos --procesos 4
+    python manage.py procesar_trabajos --una-vez          # vacía la cola y termina
+
+En el hosting compartido (sin procesos permanentes) basta un cron:
+    * * * * *  cd ~/liberalia && python manage.py procesar_trabajos --una-vez
+
+Varios workers (o varios cron superpuestos) pueden correr a la vez: cada
+trabajo se reclama con un UPDATE condicional (ver roles/trabajos.py).
+--procesos 0 ejecuta en este mismo proceso (depuración).
+"""
+
+import multiprocessing
+import os
+import socket
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from django.core.management.base import BaseCommand
+
+from roles import pool as entradas, trabajos
+
+# Cada cuánto (s) se purgan trabajos viejos y se descartan los abandonados
+MANTENCION_CADA = 3600
+
+
+class Command(BaseCommand):
+    help = "Procesa la cola de trabajos en segundo plano con un pool de procesos."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--procesos", type=int, default=2, help="Trabajos simultáneos (default 2; 0 = sin pool).")
+        parser.add_argument("--una-vez", action="store_true", help="Termina cuando la cola queda vacía.")
+        parser.add_argument("--espera", type=float, default=2.0, help="Segundos entre revisiones de la cola.")
+        parser.add_argument("--retencion", type=int, default=7, help="Días que se guardan los resultados (default 7).")
+
+    def handle(self, *args, **o):
+        self.worker = f"{socket.gethostname()}:{os.getpid()}"
+        self.retencion = o["retencion"]
+        self._mantencion()
+        if o["procesos"] <= 0:
+            self._sin_pool(o)
+        else:
+            self._con_pool(o)
+
+    def _mantencion(self):
+        self._ultima_mantencion = time.monotonic()
+        purgados = trabajos.purgar(self.retencion)
+        descartados = trabajos.descartar_abandonados()
+        if purgados or descartados:
+            self.stdout.write(f"  mantención: {purgados} purgados, {descartados} abandonados")
+
+    def _sin_pool(self, o):
+        while True:
+            trabajo = trabajos.reclamar(self.worker)
+            if trabajo is None:
+                if o["una_vez"]:
+                    return
+                time.sleep(o["espera"])
+                continue
+            self._informar(trabajo.pk, trabajos.ejecutar(trabajo.pk))
+
+    def _con_pool(self, o):
+        contexto = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(o["procesos"], mp_context=contexto, initializer=entradas.inicializar) as pool:
+            en_curso = {}  # future → pk
+            while True:
+                while len(en_curso) < o["procesos"]:
+                    trabajo = trabajos.reclamar(self.worker)
+                    if trabajo is None:
+                        break
+                    self.stdout.write(f"  #{trabajo.pk} {trabajo.get_tipo_display()}: iniciado")
+                    en_curso[pool.submit(entradas.ejecutar, trabajo.pk)] = trabajo.pk
+
+                if not en_curso:
+                    if o["una_vez"]:
+                        return
+                    time.sleep(o["espera"])
+                else:
+                    listos, _ = wait(en_curso, timeout=o["espera"], return_when=FIRST_COMPLETED)
+                    for future in listos:
+                        pk = en_curso.pop(future)
+                        exception = future.exception()
+                        self._informar(pk, exception is None and future.result(), exception)
+                    trabajos.latir(self.worker, list(en_curso.values()))
+
+                if time.monotonic() - self._ultima_mantencion > MANTENCION_CADA:
+                    self._mantencion()
+
+    def _informar(self, pk, ok, exception=None):
+        if ok:
+            self.stdout.write(self.style.SUCCESS(f"  #{pk}: listo"))
+        else:
+            self.stderr.write(f"  #{pk}: error{f' ({exception})' if exception else ''}")
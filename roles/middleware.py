@@ -0,0 +1,34 @@
+# -------------------------------------------------------------------------------
+# Middlewares de la app "roles".
+# RoleScopeMiddleware: deja en request.scope el rol, las banderas de panel y las
+# editoriales permitidas del usuario (roles.scope.UserScope). Se evalúa de forma
+# perezosa: solo consulta si la vista lo usa, y una sola vez por petición.
+# Debe ir después de AuthenticationMiddleware.
+# -------------------------------------------------------------------------------
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.utils.functional import SimpleLazyObject
+
+from .scope import get_scope
+
+
+class RoleScopeMiddleware:
+    # Sirve en WSGI y ASGI sin adaptadores (las vistas async resuelven el
+    # alcance con aget_scope; el objeto perezoso solo se evalúa en código sync)
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        request.scope = SimpleLazyObject(lambda: get_scope(request.user))
+        if self.async_mode:
+            return self.__acall__(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        return await self.get_response(request)
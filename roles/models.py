@@ -10,6 +10,10 @@ y su vínculo con las editoriales dentro del sistema. Incluye:
 - UsuarioEditorial: tabla intermedia que implementa la relación M:N entre 
   usuarios y editoriales, asegurando que un usuario pueda pertenecer a varias 
   editoriales y una editorial pueda tener múltiples usuarios.
+- Trabajo: cola de trabajos en segundo plano (exportaciones e importaciones
+  largas) que procesa el comando procesar_trabajos (ver roles/trabajos.py).
+- EstadisticaEditorial: foto periódica de las estadísticas de cada editorial
+  (comando estadisticas_editoriales, ver roles/estadisticas.py).
 
 De esta manera, se organiza la gestión de perfiles y permisos, facilitando 
 el control de acceso y la administración de usuarios según su rol 
@@ -43,6 +47,11 @@ class Editorial(models.Model):
         return self.nombre
 
 
+def normalizar_email(email) -> str:
+    """Forma canónica del email para login y búsquedas (sin espacios, minúsculas)."""
+    return (email or "").strip().lower()
+
+
 # Extender la información del usuario con un perfil asociado 1–1, 
 # donde se define el rol (editor, consultor o admin) y se agregan 
 # helpers para consultar de forma más legible el tipo de usuario.
@@ -74,6 +83,11 @@ class Profile(models.Model):
         default=ROLE_CONSULTOR,
     )
 
+    # Email del usuario en minúsculas y sin espacios, indexado: el login por
+    # email (roles.backends.ProfileModelBackend) busca aquí con igualdad en vez de
+    # recorrer auth_user con email__iexact. Lo mantiene la señal de User.
+    email_normalizado = models.CharField(max_length=254, blank=True, default="", db_index=True, editable=False)
+
     class Meta:
         verbose_name = "Perfil"
         verbose_name_plural = "Perfiles"
@@ -123,3 +137,89 @@ class UsuarioEditorial(models.Model):
     # Representamos la relación en formato legible
     def __str__(self) -> str:
         return f"{self.user} ↔ {self.editorial}"
+
+
+
+# Cola de trabajos en segundo plano guardada en la base (sin broker externo):
+# las exportaciones grandes y las importaciones se encolan acá y las ejecuta
+# el comando procesar_trabajos. El usuario consulta el avance y descarga el
+# resultado desde el panel.
+
+class Trabajo(models.Model):
+    PENDIENTE = "PENDIENTE"
+    EN_CURSO = "EN_CURSO"
+    LISTO = "LISTO"
+    ERROR = "ERROR"
+    ESTADO_CHOICES = [
+        (PENDIENTE, "Pendiente"),
+        (EN_CURSO, "En curso"),
+        (LISTO, "Listo"),
+        (ERROR, "Error"),
+    ]
+
+    EXPORTAR = "exportar"
+    IMPORTAR_FICHAS = "importar_fichas"
+    TIPO_CHOICES = [
+        (EXPORTAR, "Exportación"),
+        (IMPORTAR_FICHAS, "Importación de fichas"),
+    ]
+
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="trabajos")
+    tipo = models.CharField(max_length=30, choices=TIPO_CHOICES)
+    # Parámetros de la tarea (filtros del panel, ruta del archivo, etc.)
+    parametros = models.JSONField(default=dict, blank=True)
+    estado = models.CharField(max_length=10, choices=ESTADO_CHOICES, default=PENDIENTE)
+
+    # Avance: filas procesadas de un total (si se conoce)
+    progreso = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(blank=True, null=True)
+    mensaje = models.TextField(blank=True)
+    # Resultado descargable, relativo a TRABAJOS_ROOT
+    archivo = models.CharField(max_length=255, blank=True)
+
+    creado = models.DateTimeField(auto_now_add=True)
+    iniciado = models.DateTimeField(blank=True, null=True)
+    terminado = models.DateTimeField(blank=True, null=True)
+    # Quién lo tomó y cuándo dio señales de vida por última vez: un trabajo
+    # EN_CURSO sin latido reciente (worker caído) vuelve a poder reclamarse
+    worker = models.CharField(max_length=100, blank=True)
+    latido = models.DateTimeField(blank=True, null=True)
+    intentos = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        indexes = [models.Index(fields=["estado", "creado"])]
+        ordering = ["-creado"]
+        verbose_name = "Trabajo"
+        verbose_name_plural = "Trabajos"
+
+    def __str__(self) -> str:
+        return f"{self.get_tipo_display()} #{self.pk} ({self.estado})"
+
+    @property
+    def activo(self) -> bool:
+        return self.estado in (self.PENDIENTE, self.EN_CURSO)
+
+    @property
+    def porcentaje(self):
+        if not self.total:
+            return None
+        return min(100, round(self.progreso * 100 / self.total))
+
+
+# Estadísticas por editorial precalculadas: el tablero del ADMIN lee la última
+# foto (una consulta) en vez de agregar LibroFicha en cada visita.
+class EstadisticaEditorial(models.Model):
+    editorial = models.ForeignKey(Editorial, on_delete=models.CASCADE, related_name="estadisticas")
+    # Mismo valor para todas las filas de una corrida del comando
+    generado = models.DateTimeField(db_index=True)
+    n_libros = models.PositiveIntegerField(default=0)
+    # precios por moneda, descuentos, títulos por mes, páginas (roles/estadisticas.py)
+    datos = models.JSONField(default=dict, blank=True)
+
+    class Meta:
+        ordering = ["-generado", "editorial_id"]
+        verbose_name = "Estadística de editorial"
+        verbose_name_plural = "Estadísticas de editoriales"
+
+    def __str__(self) -> str:
+        return f"{self.editorial_id} @ {self.generado:%Y-%m-%d %H:%M} ({self.n_libros} libros)"
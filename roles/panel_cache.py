@@ -0,0 +1,84 @@
+"""
+Cache de páginas de resultados del panel.
+
+Muchos consultores repiten las mismas búsquedas; la página de resultados
+(filas ya renderizadas + cursores) se guarda en la cache de Django con una
+clave que depende solo de lo que determina su contenido:
+
+- rol (las banderas de la fila: editar / detalle dependen de él),
+- alcance del editor (sus editoriales),
+- filtros normalizados (texto de búsqueda en términos del índice, ISBN
+  canónico, fechas parseadas, columna de orden, cursor válido),
+- sello de versión del catálogo (catalogo/version.py).
+
+No hay invalidación explícita: toda escritura de fichas o editoriales sube
+el sello y las claves viejas dejan de pedirse (expiran por TIMEOUT). Sirve
+igual con LocMemCache (por proceso) o con una cache compartida (archivo,
+memcached, redis), ya que el sello vive en la misma cache.
+
+Con settings.PANEL_CACHE_PAGINAS = False no se lee ni se guarda nada (lo
+usa benchmark_panel para medir las consultas del panel y no aciertos).
+
+Los aciertos / fallos se cuentan en la cache (add + incr) para poder ver
+la tasa de acierto desde cualquier proceso: ver contadores().
+"""
+
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+
+from catalogo.version import version_catalogo
+
+# Vida máxima de una página cacheada (s); el sello de versión la invalida antes
+TIMEOUT = 10 * 60
+
+HITS_KEY = "roles:panel-cache:hits"
+MISSES_KEY = "roles:panel-cache:misses"
+
+
+def clave_pagina(role: str, editorial_ids, filtros: dict) -> str:
+    """Clave de cache de una página de resultados del panel."""
+    crudo = json.dumps(
+        [role, sorted(editorial_ids), filtros, version_catalogo()],
+        sort_keys=True, separators=(",", ":"), default=str,
+    )
+    return "roles:panel:" + hashlib.sha1(crudo.encode()).hexdigest()
+
+
+def obtener_pagina(clave: str, construir) -> dict:
+    """Página cacheada bajo `clave`, o la arma con `construir()` y la guarda."""
+    if not getattr(settings, "PANEL_CACHE_PAGINAS", True):
+        return construir()
+    pagina = cache.get(clave)
+    if pagina is not None:
+        _contar(HITS_KEY)
+        return pagina
+    _contar(MISSES_KEY)
+    pagina = construir()
+    cache.set(clave, pagina, TIMEOUT)
+    return pagina
+
+
+# ----------------------------
+# Contadores de acierto
+# ----------------------------
+def _contar(key: str) -> None:
+    try:
+        cache.incr(key)
+    except ValueError:  # clave inexistente (o expulsada)
+        cache.add(key, 0, None)
+        cache.incr(key)
+
+
+def contadores() -> dict:
+    """{'hits', 'misses', 'ratio'} acumulados desde el último reinicio."""
+    valores = cache.get_many([HITS_KEY, MISSES_KEY])
+    hits, misses = valores.get(HITS_KEY, 0), valores.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {"hits": hits, "misses": misses, "ratio": round(hits / total, 3) if total else None}
+
+
+def reiniciar_contadores() -> None:
+    cache.delete_many([HITS_KEY, MISSES_KEY])
@@ -0,0 +1,26 @@
+"""
+Entradas de los procesos del pool de procesar_trabajos.
+
+Los procesos se crean con "spawn" (arrancan limpios, sin heredar las
+conexiones a la base del proceso padre) y desempaquetan estas funciones
+importando este módulo ANTES de cargar Django: por eso aquí no se importan
+modelos a nivel de módulo.
+"""
+
+import django
+
+
+def inicializar():
+    django.setup()
+
+
+def ejecutar(pk: int) -> bool:
+    """roles.trabajos.ejecutar en el proceso del pool, que sigue vivo entre trabajos."""
+    from django.db import connections
+
+    from roles.trabajos import ejecutar as ejecutar_trabajo
+
+    try:
+        return ejecutar_trabajo(pk)
+    finally:
+        connections.close_all()
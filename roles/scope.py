@@ -0,0 +1,153 @@
+"""
+Alcance del usuario para la petición en curso.
+
+Reúne en un solo objeto lo que los paneles necesitan saber del usuario:
+- role: rol del Profile (ADMIN / EDITOR / CONSULTOR) o None
+- flags: banderas de UI / capacidades del template unificado
+- editorial_ids: editoriales permitidas (solo aplica a EDITOR)
+
+get_scope(user) lo resuelve una sola vez y lo guarda en la instancia del
+usuario (que vive lo que dura la petición), así _role, _panel_flags,
+build_queryset_for_user y las vistas lo reutilizan sin repetir consultas.
+RoleScopeMiddleware lo deja disponible como request.scope.
+
+Entre peticiones, las editoriales (y el rol) de cada usuario se guardan en
+la cache de Django bajo un sello de versión por usuario (liberalia.versiones)
+que roles/signals.py sube al cambiar su Profile o sus UsuarioEditorial.
+"""
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+
+from liberalia.versiones import bump_version, get_version, version_key
+from .models import Profile, UsuarioEditorial
+
+SCOPE_TIMEOUT = 60 * 60 * 24  # las membresías casi no cambian; el sello invalida antes
+
+
+def _version_name(user_id) -> str:
+    return f"roles:scope:{user_id}"
+
+
+def _data_key(user_id) -> str:
+    return f"roles:scope-data:{user_id}"
+
+
+def invalidate_scope(user_id) -> None:
+    """Deja obsoleto el alcance cacheado del usuario (lo llaman las señales)."""
+    bump_version(_version_name(user_id))
+
+
+def cached_scope_data(user_id) -> dict:
+    """
+    {'role': ..., 'editorial_ids': [...]} del usuario desde la cache; si falta
+    o su sello no coincide con el vigente, se relee de la base y se guarda.
+    Sello y datos se piden en un solo viaje a la cache.
+    """
+    ver_key = version_key(_version_name(user_id))
+    found = cache.get_many([ver_key, _data_key(user_id)])
+    version = found.get(ver_key)
+    data = found.get(_data_key(user_id))
+    if version is not None and data is not None and data.get("version") == version:
+        return data
+
+    # se toma el sello ANTES de leer: si alguien lo sube mientras tanto, lo
+    # guardado queda obsoleto y la próxima petición relee
+    version = version if version is not None else get_version(_version_name(user_id))
+    data = {
+        "version": version,
+        "role": Profile.objects.filter(user_id=user_id).values_list("role", flat=True).first(),
+        "editorial_ids": list(
+            UsuarioEditorial.objects.filter(user_id=user_id).values_list("editorial_id", flat=True)
+        ),
+    }
+    cache.set(_data_key(user_id), data, SCOPE_TIMEOUT)
+    return data
+
+
+def panel_flags_for_role(role):
+    """
+    Banderas de UI / capacidades por rol para el template unificado.
+    """
+    is_admin = role == Profile.ROLE_ADMIN
+    is_editor = role == Profile.ROLE_EDITOR
+    is_consultor = role == Profile.ROLE_CONSULTOR
+
+    if is_admin:
+        role_label = "ADMIN"
+        role_badge_class = "bg-danger"
+    elif is_editor:
+        role_label = "EDITOR"
+        role_badge_class = "bg-secondary"
+    else:
+        role_label = "CONSULTOR"
+        role_badge_class = "bg-secondary"
+
+    return {
+        "is_admin": is_admin,
+        "is_editor": is_editor,
+        "is_consultor": is_consultor,
+        "role_label": role_label,
+        "role_badge_class": role_badge_class,
+
+        # Capacidades por rol (alineadas a tus 3 plantillas originales)
+        "can_download": is_admin or is_consultor,   # Admin/Consultor tenían "Descargar"
+        "can_create": is_editor,                    # Editor tenía "Crear"
+        "can_edit": is_editor,                      # Editor tenía "Editar"
+        "show_detail": is_admin or is_consultor,    # Admin/Consultor mostraban "Detalle"
+        "detail_disabled": "disabled",
+
+        # Nombres de URL (ajusta si tus names cambian)
+        "create_url_name": "roles:ficha_new" if is_editor else None,
+        "edit_url_name": "roles:ficha_edit" if is_editor else None,
+    }
+
+
+class UserScope:
+    """Rol, banderas y editoriales permitidas de un usuario (ver módulo)."""
+
+    def __init__(self, user):
+        self.user_id = getattr(user, "pk", None)
+        # user.profile viene cargado junto al usuario (roles.backends), sin consulta extra
+        self.role = getattr(getattr(user, "profile", None), "role", None)
+        self._flags = None
+        self._editorial_ids = None
+
+    @property
+    def flags(self) -> dict:
+        if self._flags is None:
+            self._flags = panel_flags_for_role(self.role)
+        return self._flags
+
+    @property
+    def editorial_ids(self) -> list:
+        """Ids de editoriales del EDITOR (lista vacía para los demás roles)."""
+        if self._editorial_ids is None:
+            if self.role == Profile.ROLE_EDITOR and self.user_id is not None:
+                self._editorial_ids = cached_scope_data(self.user_id)["editorial_ids"]
+            else:
+                self._editorial_ids = []
+        return self._editorial_ids
+
+    async def aresolve(self) -> "UserScope":
+        """Carga editorial_ids fuera del event loop (vistas async)."""
+        if self._editorial_ids is None:
+            await sync_to_async(lambda: self.editorial_ids)()
+        return self
+
+
+def get_scope(user) -> UserScope:
+    """Alcance del usuario, resuelto una vez por instancia (= por petición)."""
+    scope = getattr(user, "_roles_scope", None)
+    if scope is None:
+        scope = UserScope(user)
+        try:
+            user._roles_scope = scope
+        except AttributeError:
+            pass  # objetos sin __dict__: se recalcula, sin cache
+    return scope
+
+
+async def aget_scope(user) -> UserScope:
+    """get_scope para vistas async (el rol se lee fuera del event loop)."""
+    return await sync_to_async(get_scope)(user)
@@ -1,32 +1,55 @@
 # -------------------------------------------------------------------------------
 # Señales para garantizar que cada usuario tenga un Profile asociado.
 # Al crear un usuario nuevo, se crea automáticamente su Profile con el rol por defecto.
-# También asegura que usuarios existentes sin Profile reciban uno.
+# También asegura que usuarios existentes sin Profile reciban uno y copia el
+# email normalizado al Profile (índice del login por email).
 # Se usa settings.AUTH_USER_MODEL para no depender del User por defecto.
+# Además invalidan el alcance cacheado (rol + editoriales) de un usuario cuando
+# cambian su Profile o sus UsuarioEditorial (ver roles/scope.py), recién al
+# confirmarse la transacción.
 # -------------------------------------------------------------------------------
 
 from django.conf import settings
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
-from .models import Profile
+from .models import Profile, UsuarioEditorial, normalizar_email
+from .scope import invalidate_scope
 
 
 @receiver(post_save, sender=settings.AUTH_USER_MODEL)
-def ensure_profile(sender, instance, created, **kwargs):
+def ensure_profile(sender, instance, created, update_fields=None, **kwargs):
     """
     - Si el usuario es nuevo: crea su Profile con el rol por defecto (definido en el modelo).
     - Si el usuario ya existía: garantiza que tenga Profile (útil para usuarios antiguos).
+    - En ambos casos mantiene Profile.email_normalizado al día con user.email.
     """
+    email = normalizar_email(instance.email)
     if created:
         # Usuario recién creado → creo el Profile
-        Profile.objects.get_or_create(user=instance)
+        Profile.objects.get_or_create(user=instance, defaults={"email_normalizado": email})
         
     else:
         # Usuario existente: si por alguna razón no tiene Profile, lo creo
         # (esto cubre usuarios viejos creados antes de tener esta señal)
         if not hasattr(instance, "profile"):
-            Profile.objects.create(user=instance)
-
-
+            Profile.objects.create(user=instance, email_normalizado=email)
+        # save(update_fields=["last_login"]) del login no toca el email: sin consultas extra
+        elif (update_fields is None or "email" in update_fields) and instance.profile.email_normalizado != email:
+            Profile.objects.filter(user=instance).update(email_normalizado=email)
+            instance.profile.email_normalizado = email
 
 
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+@receiver(post_save, sender=UsuarioEditorial)
+@receiver(post_delete, sender=UsuarioEditorial)
+def invalidar_scope(sender, instance, **kwargs):
+    """
+    Cambió el rol o una membresía editorial: el alcance cacheado queda
+    obsoleto. El sello se sube al confirmar la transacción: antes, una
+    petición concurrente leería las membresías viejas y las guardaría en la
+    cache bajo el sello nuevo (hasta SCOPE_TIMEOUT).
+    """
+    user_id = instance.user_id
+    transaction.on_commit(lambda: invalidate_scope(user_id))
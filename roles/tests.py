@@ -1,3 +1,703 @@
-from django.test import TestCase
+"""
+Presupuesto de consultas SQL de los paneles por rol.
 
-# Create your tests here.
+Cada test fija el número máximo de consultas y la "forma" de cada una
+(tabla principal del FROM, en orden) para los caminos calientes: paneles
+de ADMIN / CONSULTOR / EDITOR con cada clave de orden, búsquedas, páginas
+por cursor y exportaciones. Un cambio que agregue consultas (p. ej. un
+N+1 en el template) hace fallar el test.
+"""
+
+import json
+import re
+import tempfile
+import time
+from datetime import date
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import path
+from django.utils import timezone
+from openpyxl import load_workbook
+
+from catalogo import referencias, version
+from catalogo.isbn import digito_isbn13
+from catalogo.models import Idioma, LibroFicha, Moneda, Pais, TipoTapa
+from catalogo.views import libro_detalle_async
+from liberalia import metricas, perfilador, routers, urls as liberalia_urls
+from liberalia.versiones import version_key
+from . import estadisticas, exports, filas, keyset, trabajos
+from .models import Editorial, EstadisticaEditorial, Profile, Trabajo, UsuarioEditorial
+from . import panel_cache
+from .views import ALLOWED_SORTS, DEFAULT_SORT, AsyncPanelAdminView, AsyncPanelEditorView, build_queryset_for_user
+
+# Cache local por test: los sellos de versión no deben venir de otra corrida
+LOCMEM = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+_FROM = re.compile(r'\bFROM\s+"?(\w+)"?', re.IGNORECASE)
+_WRITE = re.compile(r'^\s*(INSERT INTO|UPDATE|DELETE FROM)\s+"?(\w+)"?', re.IGNORECASE)
+
+
+def query_shape(sql: str) -> str:
+    """Forma resumida de una consulta: la tabla principal (o la operación)."""
+    if sql.upper().startswith(("SAVEPOINT", "RELEASE SAVEPOINT", "ROLLBACK TO")):
+        return "savepoint"
+    escritura = _WRITE.match(sql)
+    if escritura:
+        return f"{escritura.group(1).split()[0].lower()} {escritura.group(2)}"
+    lectura = _FROM.search(sql)
+    return lectura.group(1) if lectura else sql.split()[0].lower()
+
+
+def crear_catalogo(libros_por_editorial=30):
+    """Referencias, dos editoriales, un usuario por rol y fichas indexadas."""
+    User = get_user_model()
+    tapa = TipoTapa.objects.create(nombre="Rústica")
+    pais = Pais.objects.create(code="CL", nombre="Chile")
+    moneda = Moneda.objects.create(code="CLP", nombre="Peso chileno", simbolo="$")
+    idioma = Idioma.objects.create(code="es", nombre="Español")
+    editoriales = [Editorial.objects.create(nombre=f"Editorial {n}") for n in ("Andes", "Pacífico")]
+
+    usuarios = {}
+    for role in (Profile.ROLE_ADMIN, Profile.ROLE_EDITOR, Profile.ROLE_CONSULTOR):
+        user = User.objects.create_user(role.lower(), f"{role.lower()}@liberalia.test", "clave-segura-123")
+        Profile.objects.filter(user=user).update(role=role)
+        usuarios[role] = user
+    UsuarioEditorial.objects.create(user=usuarios[Profile.ROLE_EDITOR], editorial=editoriales[0])
+
+    for i, editorial in enumerate(editoriales):
+        for n in range(libros_por_editorial):
+            numero = i * 1000 + n
+            base = f"978956{numero:06d}"
+            LibroFicha.objects.create(
+                isbn=base + digito_isbn13(base), editorial=editorial, titulo=f"Libro {numero} del mar",
+                autor=f"Autor {n % 7}", tipo_tapa=tapa, numero_paginas=100 + n, idioma_original=idioma,
+                numero_edicion=1, fecha_edicion=date(2000 + n % 20, 1 + n % 12, 1), pais_edicion=pais,
+                precio=1000 + n, moneda=moneda, descuento_distribuidor=30, resumen_libro="Resumen",
+            )
+    return usuarios
+
+
+@override_settings(CACHES=LOCMEM)
+class QueryBudgetTestCase(TestCase):
+    """Base: catálogo de prueba, cache limpia y helper de presupuesto."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuarios = crear_catalogo()
+
+    def setUp(self):
+        cache.clear()
+        referencias.invalidar()
+
+    def login(self, role):
+        self.client.force_login(self.usuarios[role])
+
+    def get(self, url, shapes, status=200):
+        """GET `url` y verifica cantidad y forma de las consultas (en orden)."""
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+            if response.streaming:
+                response.cuerpo = b"".join(response.streaming_content)
+        got = [query_shape(q["sql"]) for q in ctx.captured_queries]
+        self.assertEqual(response.status_code, status, url)
+        self.assertEqual(got, shapes, f"consultas de {url}:\n" + "\n".join(q["sql"] for q in ctx.captured_queries))
+        return response
+
+
+SESION = ["django_session", "auth_user"]
+PANEL_ADMIN = SESION + ["catalogo_libroficha"]
+# Primera página de un alcance tras un cambio del catálogo: + resumen de facetas
+# (después queda en cache hasta el siguiente cambio)
+PANEL_NUEVO = PANEL_ADMIN + ["catalogo_conteofaceta"]
+EXPORT = PANEL_ADMIN + ["catalogo_libroficha"]
+
+
+class PanelQueryBudgetTests(QueryBudgetTestCase):
+
+    def test_admin_y_consultor_cada_orden(self):
+        for role, url in ((Profile.ROLE_ADMIN, "/panel/admin/"), (Profile.ROLE_CONSULTOR, "/panel/consultor/")):
+            self.login(role)
+            for sort in ALLOWED_SORTS:
+                with self.subTest(role=role, sort=sort):
+                    # ADMIN y CONSULTOR ven todo el catálogo: comparten el resumen de facetas
+                    primera = role == Profile.ROLE_ADMIN and sort == next(iter(ALLOWED_SORTS))
+                    self.get(f"{url}?sort={sort}", PANEL_NUEVO if primera else PANEL_ADMIN)
+
+    def test_editor_cada_orden_con_scope_cacheado(self):
+        self.login(Profile.ROLE_EDITOR)
+        # primera visita: se leen rol y editoriales y quedan en cache
+        self.get("/panel/editor/", [
+            "django_session", "auth_user", "roles_profile", "roles_usuarioeditorial", "catalogo_libroficha",
+            "catalogo_conteofaceta",
+        ])
+        for sort in ALLOWED_SORTS.keys() - {DEFAULT_SORT}:  # la de por defecto ya quedó cacheada
+            with self.subTest(sort=sort):
+                self.get(f"/panel/editor/?sort={sort}", PANEL_ADMIN)
+
+    def test_busquedas(self):
+        self.login(Profile.ROLE_ADMIN)
+        self.get("/panel/admin/?q=andes&date_from=2001-01-01&date_to=2015-12-31", PANEL_NUEVO)
+        self.login(Profile.ROLE_EDITOR)
+        self.get("/panel/editor/", PANEL_NUEVO[:2] + ["roles_profile", "roles_usuarioeditorial"] + PANEL_NUEVO[2:])
+        self.get("/panel/editor/?q_titulo=mar&q_isbn=978956", PANEL_ADMIN)
+        self.get("/panel/editor/?q_isbn=978-956-000000-2", PANEL_ADMIN)
+
+    def test_pagina_siguiente_cuesta_lo_mismo(self):
+        self.login(Profile.ROLE_ADMIN)
+        response = self.get("/panel/admin/?sort=autor", PANEL_NUEVO)
+        cursor = response.context["next_cursor"]
+        self.assertTrue(cursor)
+        self.get(f"/panel/admin/?sort=autor&cursor={cursor}", PANEL_ADMIN)
+
+    def test_cursor_con_valor_de_otro_tipo_vuelve_a_la_primera_pagina(self):
+        self.login(Profile.ROLE_ADMIN)
+        primera = self.get("/panel/admin/?sort=fecha", PANEL_NUEVO)
+        for valor in ("zzz", 1, None):
+            with self.subTest(valor=valor):
+                token = keyset.encode_cursor("n", "fecha_edicion", valor, 1)
+                # se descarta al normalizar: es la 1ª página, ya en la cache
+                response = self.get(f"/panel/admin/?sort=fecha&cursor={token}", SESION)
+                self.assertIsNone(response.context["prev_cursor"])
+                self.assertEqual(response.context["next_cursor"], primera.context["next_cursor"])
+        token = keyset.encode_cursor("n", "autor", {"d": "2001-01-01"}, 1)
+        response = self.get(f"/panel/admin/?sort=autor&cursor={token}", PANEL_ADMIN)
+        self.assertIsNone(response.context["prev_cursor"])
+
+    def test_rol_equivocado_no_consulta_catalogo(self):
+        self.login(Profile.ROLE_EDITOR)
+        self.get("/panel/admin/", SESION, status=302)
+
+    def test_exportacion_csv(self):
+        self.login(Profile.ROLE_ADMIN)
+        # 1ª consulta: ¿supera EXPORT_SINCRONO_MAX? (si no, se transmite acá mismo)
+        response = self.get("/panel/admin/?export=csv&sort=fecha", EXPORT)
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+
+    def test_exportacion_csv_por_lotes(self):
+        # una consulta por lote de CHUNK_SIZE filas, nunca una por fila
+        self.login(Profile.ROLE_CONSULTOR)
+        with mock.patch("roles.keyset.CHUNK_SIZE", 25):
+            self.get("/panel/consultor/?export=csv", EXPORT + ["catalogo_libroficha"] * 2)
+
+
+class FilasPanelTests(QueryBudgetTestCase):
+    """Filas del panel armadas por roles/filas.py (mismo HTML que el template anterior)."""
+
+    def test_filas_escapadas_con_enlace_por_rol(self):
+        libro = LibroFicha.objects.get(titulo="Libro 0 del mar")
+        LibroFicha.objects.filter(pk=libro.pk).update(titulo='<b>"Mar" & río</b>', codigo_imagen="a" * 64)
+        self.login(Profile.ROLE_CONSULTOR)
+        html = self.client.get("/panel/consultor/?q=andes&sort=isbn").content.decode()
+        self.assertIn("&lt;b&gt;&quot;Mar&quot; &amp; río&lt;/b&gt;</td>", html)
+        self.assertIn('alt="&lt;b&gt;&quot;Mar&quot; &amp; río&lt;/b&gt;"', html)
+        self.assertIn(f'href="/catalogo/libro/{libro.isbn}/">Detalle</a>', html)
+        self.assertIn('<a href="?q=andes&amp;date_from=&amp;date_to=&amp;sort=autor">AUTOR</a>', html)
+
+        self.login(Profile.ROLE_EDITOR)
+        html = self.client.get("/panel/editor/?q_titulo=mar &sort=fecha").content.decode()
+        self.assertIn(f'href="/panel/editor/fichas/{libro.isbn}/" >Editar</a>', html)
+        self.assertNotIn(">Detalle</a>", html)
+        self.assertIn("?q_titulo=mar+&amp;q_isbn=&amp;date_from=&amp;date_to=&amp;sort=isbn", html)
+        self.assertIn(f"<td>{libro.fecha_edicion:%d/%m/%Y}</td>", html)
+
+    def test_isbn_con_barra_no_sale_de_su_segmento(self):
+        url = filas._url_de("catalogo:libro_detalle")
+        self.assertEqual(url("../../panel/admin"), "/catalogo/libro/..%2F..%2Fpanel%2Fadmin/")
+        self.assertEqual(url("978-956 x&y"), "/catalogo/libro/978-956%20x&amp;y/")
+
+    def test_sin_resultados(self):
+        self.login(Profile.ROLE_CONSULTOR)
+        self.assertContains(self.client.get("/panel/consultor/?q=inexistente"), "Sin resultados")
+
+
+class ExportacionTests(QueryBudgetTestCase):
+    REFERENCIAS = ["catalogo_tipotapa", "catalogo_pais", "catalogo_moneda", "catalogo_idioma"]
+
+    def test_xlsx_comercial_con_tipos(self):
+        self.login(Profile.ROLE_CONSULTOR)
+        # sondeo de la cola, tablas de referencia (una vez) y un lote de fichas
+        response = self.get("/panel/consultor/?export=xlsx&columnas=comercial&q=andes&sort=isbn",
+                            SESION + ["catalogo_libroficha"] + self.REFERENCIAS + ["catalogo_libroficha"])
+        self.assertEqual(response["Content-Disposition"], 'attachment; filename="libros.xlsx"')
+        hoja = load_workbook(BytesIO(response.cuerpo)).active
+        filas = list(hoja.iter_rows(values_only=True))
+        self.assertEqual(len(filas), 31)
+        encabezado = dict(zip(filas[0], filas[1]))
+        self.assertEqual(filas[0][:3], ("ISBN", "EAN", "TÍTULO"))
+        self.assertEqual((encabezado["PRECIO"], encabezado["MONEDA"], encabezado["TAPA"]), (1000, "CLP", "Rústica"))
+        self.assertEqual(encabezado["FECHA_EDICIÓN"].date(), date(2000, 1, 1))
+
+    def test_jsonl_columnas_elegidas(self):
+        self.login(Profile.ROLE_ADMIN)
+        response = self.client.get("/panel/admin/?export=jsonl&columnas=isbn,precio,pais,fecha&sort=isbn")
+        lineas = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lineas), 60)
+        self.assertEqual(json.loads(lineas[0]), {
+            "isbn": "9789560000002", "precio": "1000.00", "pais": "CL", "fecha": "2000-01-01",
+        })
+
+    def test_formato_o_columnas_invalidos(self):
+        self.login(Profile.ROLE_ADMIN)
+        self.get("/panel/admin/?export=pdf", SESION, status=400)
+        response = self.get("/panel/admin/?export=csv&columnas=isbn,clave", SESION, status=400)
+        self.assertIn(b"clave", response.content)
+        self.login(Profile.ROLE_EDITOR)
+        self.get("/panel/editor/?export=xlsx", SESION, status=403)
+
+
+class ScopeTests(QueryBudgetTestCase):
+
+    def test_cambio_de_membresia_invalida_scope(self):
+        editor = self.usuarios[Profile.ROLE_EDITOR]
+        self.login(Profile.ROLE_EDITOR)
+        self.assertEqual(self.client.get("/panel/editor/").context["n_filas"], 30)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            UsuarioEditorial.objects.create(user=editor, editorial=Editorial.objects.get(nombre="Editorial Pacífico"))
+            # sin confirmar: el alcance cacheado sigue vigente
+            self.assertEqual(self.client.get("/panel/editor/").context["n_filas"], 30)
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(self.client.get("/panel/editor/").context["n_filas"], 50)
+
+
+class ConditionalGetTests(QueryBudgetTestCase):
+
+    def test_panel_sin_cambios_responde_304_sin_consultar_catalogo(self):
+        self.login(Profile.ROLE_ADMIN)
+        response = self.get("/panel/admin/?sort=autor", PANEL_NUEVO)
+        etag = response["ETag"]
+        self.assertTrue(response["Last-Modified"])
+        with CaptureQueriesContext(connection) as ctx:
+            again = self.client.get("/panel/admin/?sort=autor", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual([query_shape(q["sql"]) for q in ctx.captured_queries], SESION)
+
+    def test_etag_cambia_con_filtros_usuario_y_catalogo(self):
+        self.login(Profile.ROLE_ADMIN)
+        etag = self.client.get("/panel/admin/")["ETag"]
+        self.assertNotEqual(self.client.get("/panel/admin/?sort=autor")["ETag"], etag)
+        self.login(Profile.ROLE_CONSULTOR)
+        self.assertNotEqual(self.client.get("/panel/consultor/")["ETag"], etag)
+
+        self.login(Profile.ROLE_ADMIN)
+        libro = LibroFicha.objects.first()
+        libro.titulo = "Otro título"
+        with self.captureOnCommitCallbacks(execute=True):
+            libro.save()
+        self.assertEqual(self.client.get("/panel/admin/", HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class PanelCacheTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.login(Profile.ROLE_CONSULTOR)
+
+    def test_busqueda_repetida_sale_de_cache(self):
+        self.get("/panel/consultor/?q=andes", PANEL_NUEVO)
+        # mismos filtros una vez normalizados: mayúsculas, tildes, orden por defecto, fecha inválida
+        response = self.get("/panel/consultor/?q=ANDÉS&sort=titulo&date_to=no-es-fecha", SESION)
+        self.assertEqual(response.context["n_filas"], 30)
+        self.assertContains(response, "Libro 0 del mar")
+        self.assertEqual(panel_cache.contadores(), {"hits": 1, "misses": 1, "ratio": 0.5})
+
+    def test_pagina_compartida_entre_usuarios_del_mismo_rol(self):
+        self.get("/panel/consultor/?sort=autor", PANEL_NUEVO)
+        otro = get_user_model().objects.create_user("consultor2", "c2@liberalia.test", "clave-segura-123")
+        Profile.objects.filter(user=otro).update(role=Profile.ROLE_CONSULTOR)
+        self.client.force_login(otro)
+        self.get("/panel/consultor/?sort=autor", SESION)
+        # otro rol: otras banderas de fila, otra entrada
+        self.login(Profile.ROLE_ADMIN)
+        self.get("/panel/admin/?sort=autor", PANEL_ADMIN)
+
+    def test_sin_cache_de_paginas_siempre_consulta(self):
+        # así mide benchmark_panel las consultas del panel
+        self.get("/panel/consultor/", PANEL_NUEVO)
+        with override_settings(PANEL_CACHE_PAGINAS=False):
+            self.get("/panel/consultor/", PANEL_ADMIN)
+            self.get("/panel/consultor/", PANEL_ADMIN)
+        self.get("/panel/consultor/", SESION)
+
+    def test_escritura_del_catalogo_invalida(self):
+        self.get("/panel/consultor/", PANEL_NUEVO)
+        libro = LibroFicha.objects.get(isbn13="9789560000002")
+        libro.titulo = "Aaa primero"
+        with self.captureOnCommitCallbacks(execute=True):
+            libro.save()
+            # sin confirmar: sigue la página cacheada (nada se guarda bajo el sello nuevo)
+            self.get("/panel/consultor/", SESION)
+        response = self.get("/panel/consultor/", PANEL_NUEVO)
+        self.assertContains(response, "Aaa primero")
+
+
+# URLs de prueba con las variantes async (ASYNC_VIEWS) delante de las normales
+urlpatterns = [
+    path("panel/admin/", AsyncPanelAdminView.as_view()),
+    path("panel/editor/", AsyncPanelEditorView.as_view()),
+    path("catalogo/libro/<str:isbn>/", libro_detalle_async),
+    *liberalia_urls.urlpatterns,
+]
+
+
+@override_settings(ROOT_URLCONF="roles.tests")
+class AsyncViewTests(QueryBudgetTestCase):
+
+    def aget(self, url, shapes, status=200):
+        """Como get(), pero por el handler ASGI (AsyncClient)."""
+        async def pedir():
+            response = await self.async_client.get(url)
+            if response.streaming:
+                return response, b"".join([chunk async for chunk in response.streaming_content])
+            return response, response.content
+
+        with CaptureQueriesContext(connection) as ctx:
+            response, body = async_to_sync(pedir)()
+        self.assertEqual(response.status_code, status, url)
+        self.assertEqual([query_shape(q["sql"]) for q in ctx.captured_queries], shapes)
+        return response, body.decode()
+
+    def test_panel_mismo_presupuesto_que_wsgi(self):
+        self.async_client.force_login(self.usuarios[Profile.ROLE_EDITOR])
+        _, body = self.aget("/panel/editor/?sort=autor", [
+            "django_session", "auth_user", "roles_profile", "roles_usuarioeditorial", "catalogo_libroficha",
+            "catalogo_conteofaceta",
+        ])
+        self.assertIn("Libro 0 del mar", body)
+        self.assertNotIn("Libro 1000 del mar", body)  # editorial ajena
+        self.aget("/panel/editor/?sort=autor", SESION)
+
+    def test_login_y_rol(self):
+        response, _ = self.aget("/panel/admin/", [], status=302)  # sin cookie de sesión
+        self.assertTrue(response["Location"].startswith("/accounts/login/"))
+        self.async_client.force_login(self.usuarios[Profile.ROLE_EDITOR])
+        self.aget("/panel/admin/", SESION, status=302)
+
+    def test_exportacion_csv_async_por_lotes(self):
+        self.async_client.force_login(self.usuarios[Profile.ROLE_ADMIN])
+        with mock.patch("roles.keyset.CHUNK_SIZE", 25):
+            _, body = self.aget("/panel/admin/?export=csv", EXPORT + ["catalogo_libroficha"] * 2)
+        self.assertEqual(len(body.splitlines()), 61)  # encabezado + 60 fichas
+
+    def test_exportacion_jsonl_async(self):
+        self.async_client.force_login(self.usuarios[Profile.ROLE_ADMIN])
+        _, body = self.aget("/panel/admin/?export=jsonl&columnas=isbn,moneda", EXPORT[:-1] + [
+            "catalogo_tipotapa", "catalogo_pais", "catalogo_moneda", "catalogo_idioma", "catalogo_libroficha",
+        ])
+        self.assertEqual(json.loads(body.splitlines()[0]), {"isbn": "9789560000002", "moneda": "CLP"})
+
+    def test_detalle_async(self):
+        self.async_client.force_login(self.usuarios[Profile.ROLE_CONSULTOR])
+        _, body = self.aget("/catalogo/libro/9789560000002/", PANEL_ADMIN + [
+            "catalogo_tipotapa", "catalogo_pais", "catalogo_moneda", "catalogo_idioma",
+        ])
+        self.assertIn("Rústica", body)
+        self.aget("/catalogo/libro/9789569999999/", PANEL_ADMIN, status=404)
+
+
+
+class MetricasTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        super().setUp()
+        metricas.reiniciar()
+
+    def test_server_timing_cuenta_sql_y_templates(self):
+        self.login(Profile.ROLE_ADMIN)
+        response = self.get("/panel/admin/", PANEL_NUEVO)
+        timing = dict(re.findall(r"(\w+);dur=([\d.]+)", response["Server-Timing"]))
+        self.assertIn('desc="4 consultas"', response["Server-Timing"])
+        self.assertGreater(float(timing["tpl"]), 0)
+        self.assertGreaterEqual(float(timing["total"]), float(timing["sql"]) + float(timing["tpl"]))
+
+    def test_server_timing_solo_para_el_personal(self):
+        self.login(Profile.ROLE_CONSULTOR)
+        self.assertNotIn("Server-Timing", self.client.get("/panel/consultor/"))
+        with override_settings(DEBUG=True):
+            self.assertIn("Server-Timing", self.client.get("/panel/consultor/"))
+        consultor = self.usuarios[Profile.ROLE_CONSULTOR]
+        consultor.is_staff = True
+        consultor.save()
+        self.assertIn("Server-Timing", self.client.get("/panel/consultor/"))
+        # sin usuario cargado por la vista no se lee la sesión solo para decidir
+        response = self.get("/catalogo/portada/" + "0" * 64 + "/mini.jpg", [], status=404)
+        self.assertNotIn("Server-Timing", response)
+
+    def test_cada_proceso_vuelca_en_su_clave(self):
+        medicion = metricas.Medicion()
+        for pid in (101, 102, 101):  # el tercero es como un fork: ranura nueva
+            with mock.patch("liberalia.metricas.os.getpid", return_value=pid):
+                metricas.registrar("vista", "/x", medicion, 5.0)
+                metricas.volcar()
+        self.assertEqual(len(cache.get_many(metricas._claves_procesos())), 3)
+        self.assertEqual({v["vista"]: v["n"] for v in metricas.resumen()["vistas"]}, {"vista": 3})
+        metricas.reiniciar()
+        self.assertEqual(metricas.resumen()["vistas"], [])
+
+    def test_ranuras_de_procesos_muertos_expiran(self):
+        medicion = metricas.Medicion()
+        with mock.patch("liberalia.metricas.os.getpid", return_value=201), \
+                mock.patch.object(metricas.cache, "set", wraps=metricas.cache.set) as cache_set:
+            metricas.registrar("vista", "/x", medicion, 5.0)
+            metricas.volcar()
+        clave = cache_set.call_args.args[0]
+        self.assertEqual(cache_set.call_args.args[2], metricas.RANURA_TTL)
+        # expira la ranura y otro proceso toma la siguiente: resumen() deja de leer la vieja
+        cache.delete(clave)
+        otra = f"{metricas.CACHE_KEY}:p{cache.incr(metricas.PROCESOS_KEY)}"
+        cache.set(otra, {**metricas._vacio(), "vistas": {"otra": [(1.0, 0, 0.0, 0.0)]}}, None)
+        self.assertEqual([v["vista"] for v in metricas.resumen()["vistas"]], ["otra"])
+        self.assertEqual(metricas._claves_procesos(), [otra])
+        # el proceso vivo que quedó por debajo vuelve con una ranura nueva
+        with mock.patch("liberalia.metricas.os.getpid", return_value=201):
+            metricas.registrar("vista", "/x", medicion, 5.0)
+            metricas.volcar()
+        self.assertEqual({v["vista"] for v in metricas.resumen()["vistas"]}, {"otra", "vista"})
+
+    @override_settings(METRICAS_PRESUPUESTO={"ms": 60_000, "consultas": 4})
+    def test_pagina_de_metricas(self):
+        self.login(Profile.ROLE_CONSULTOR)
+        self.client.get("/panel/consultor/?sort=autor")
+        with mock.patch("roles.keyset.CHUNK_SIZE", 25):
+            b"".join(self.client.get("/panel/consultor/?export=csv").streaming_content)
+        self.assertEqual(self.client.get("/panel/admin/metricas/").status_code, 302)  # solo ADMIN
+
+        self.login(Profile.ROLE_ADMIN)
+        ctx = self.client.get("/panel/admin/metricas/").context
+        vistas = {v["vista"]: v for v in ctx["vistas"]}
+        self.assertEqual(vistas["roles:panel_consultor"]["n"], 2)
+        consultor = vistas["roles:panel_consultor"]
+        self.assertTrue(consultor["p50"] <= consultor["p95"] <= consultor["max"])
+        # la exportación (3 lotes + sondeo + sesión) superó las 4 consultas
+        self.assertEqual([(e["vista"], e["consultas"]) for e in ctx["excesos"]], [("roles:panel_consultor", 6)])
+        self.assertTrue(any("catalogo_libroficha" in s["sql"] for s in ctx["sentencias"]))
+
+    def test_normalizar_sql(self):
+        self.assertEqual(
+            metricas.normalizar_sql('SELECT  "a" FROM t WHERE id IN (%s, %s,%s)\n AND x = %s'),
+            'SELECT "a" FROM t WHERE id IN (%s…) AND x = %s',
+        )
+
+
+class EstadisticasTests(QueryBudgetTestCase):
+    """Fotos de estadísticas por editorial (roles/estadisticas.py) y su tablero."""
+
+    def test_calculo_a_mano(self):
+        filas = [
+            (1, Decimal("100.00"), Decimal("10.0"), date(2020, 1, 5), 90),
+            (1, Decimal("300.00"), Decimal("30.0"), date(2020, 1, 20), 250),
+            (2, Decimal("15.50"), Decimal("12.5"), date(2021, 3, 1), 1200),
+            (1, Decimal("200.00"), Decimal("99.9"), date(2020, 2, 1), 100),
+        ]
+        datos = estadisticas.calcular(filas)
+        self.assertEqual(datos["precios"], [
+            {"moneda": 1, "n": 3, "promedio": 200.0, "mediana": 200.0, "min": 100.0, "max": 300.0},
+            {"moneda": 2, "n": 1, "promedio": 15.5, "mediana": 15.5, "min": 15.5, "max": 15.5},
+        ])
+        self.assertEqual(datos["descuento"]["p50"], 21.25)
+        self.assertEqual(datos["descuento"]["histograma"][2], 2)   # 10 y 12.5
+        self.assertEqual(datos["descuento"]["histograma"][-1], 1)  # 99.9
+        self.assertEqual(datos["paginas"]["histograma"][:3], [1, 1, 1])
+        self.assertEqual(datos["paginas"]["histograma"][-1], 1)    # 1200: tramo 1000+
+        self.assertEqual(datos["meses"], [("2020-01", 2), ("2020-02", 1), ("2021-03", 1)])
+
+    def test_comando_y_tablero(self):
+        vacia = Editorial.objects.create(nombre="Editorial Sin Fichas")
+        call_command("estadisticas_editoriales", stdout=StringIO())
+        call_command("estadisticas_editoriales", "--conservar", "1", stdout=StringIO())
+        fotos = estadisticas.ultima()
+        self.assertEqual(EstadisticaEditorial.objects.count(), 3)  # solo la última corrida
+        self.assertEqual([f.n_libros for f in fotos], [30, 30, 0])
+        andes = next(f for f in fotos if f.editorial.nombre == "Editorial Andes")
+        self.assertEqual(andes.datos["precios"][0]["moneda"], "CLP")
+        self.assertEqual(andes.datos["precios"][0]["promedio"], 1014.5)  # precios 1000…1029
+        self.assertEqual(sum(andes.datos["paginas"]["histograma"]), 30)
+
+        self.login(Profile.ROLE_CONSULTOR)
+        self.get("/panel/admin/estadisticas/", SESION, status=302)
+        self.login(Profile.ROLE_ADMIN)
+        response = self.get(f"/panel/admin/estadisticas/?editorial={andes.editorial_id}", SESION + [
+            "roles_estadisticaeditorial",
+        ])
+        self.assertEqual(response.context["elegida"], andes)
+        self.assertContains(response, "Editorial Sin Fichas")
+        self.assertEqual(len(response.context["paginas"]), estadisticas.PAGINAS_TRAMOS)
+        response = self.client.get(f"/panel/admin/estadisticas/?editorial={vacia.pk}")
+        self.assertContains(response, "Editorial Sin Fichas (0 títulos)")
+
+    def test_lectura_por_lotes(self):
+        # lotes keyset de CHUNK_SIZE filas: una editorial puede quedar entre dos lotes
+        estadisticas.generar()
+        completa = {f.editorial_id: f.datos for f in estadisticas.ultima()}
+        EstadisticaEditorial.objects.all().delete()
+        with mock.patch("roles.keyset.CHUNK_SIZE", 7), CaptureQueriesContext(connection) as ctx:
+            estadisticas.generar()
+        lecturas = [query_shape(q["sql"]) for q in ctx.captured_queries]
+        self.assertEqual(lecturas.count("catalogo_libroficha"), 9)  # 60 fichas / 7 por lote
+        self.assertEqual({f.editorial_id: f.datos for f in estadisticas.ultima()}, completa)
+
+
+class PerfiladorTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        super().setUp()
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        parche = override_settings(PERFILES_ROOT=directorio.name, PERFIL_INTERVALO=0.0005)
+        parche.enable()
+        self.addCleanup(parche.disable)
+
+    def test_muestreo_del_panel_en_formato_collapsed(self):
+        self.login(Profile.ROLE_ADMIN)
+        armar = filas.render_filas
+
+        def lento(*args):  # que la petición dure lo suficiente para tomar muestras
+            time.sleep(0.05)
+            return armar(*args)
+
+        with mock.patch("roles.filas.render_filas", lento):
+            response = self.client.get("/panel/admin/?_perfil=muestreo")
+        self.assertEqual(response.status_code, 200)
+        descarga = self.client.get(response["X-Perfil"])
+        self.assertEqual(descarga.status_code, 200)
+        lineas = b"".join(descarga.streaming_content).decode().splitlines()
+        self.assertTrue(lineas)
+        _, n = lineas[0].rsplit(" ", 1)
+        self.assertGreater(int(n), 0)
+        self.assertTrue(any("roles.views:" in linea for linea in lineas))
+        self.assertEqual([p["nombre"] for p in self.client.get("/panel/admin/perfiles/").context["perfiles"]],
+                         [response["X-Perfil"].rsplit("/", 1)[1]])
+
+    def test_cprofile_de_una_exportacion_en_streaming(self):
+        self.login(Profile.ROLE_ADMIN)
+        response = self.client.get("/panel/admin/?export=csv", HTTP_X_PERFIL="cprofile")
+        self.assertEqual(perfilador.archivos(), [])  # se guarda al terminar de enviarse
+        b"".join(response.streaming_content)
+        self.assertEqual(sorted(p["nombre"].rsplit(".", 1)[1] for p in perfilador.archivos()), ["prof", "txt"])
+        self.assertEqual(self.client.get(response["X-Perfil"]).status_code, 200)
+
+    def test_solo_admin_y_sin_flag_no_perfila(self):
+        self.login(Profile.ROLE_EDITOR)
+        response = self.client.get("/panel/editor/?_perfil=muestreo")
+        self.assertNotIn("X-Perfil", response)
+        self.assertEqual(self.client.get("/panel/admin/perfiles/").status_code, 302)
+        self.login(Profile.ROLE_ADMIN)
+        self.assertNotIn("X-Perfil", self.client.get("/panel/admin/"))
+        self.assertNotIn("X-Perfil", self.client.get("/panel/admin/?_perfil=otro"))
+        self.assertEqual(perfilador.archivos(), [])
+        self.assertEqual(self.client.get("/panel/admin/perfiles/..%2Fsettings.py").status_code, 404)
+
+
+class ReplicaTests(QueryBudgetTestCase):
+    """Ruteo a la réplica (liberalia/routers.py); en los tests no hay base "replica" real."""
+
+    def setUp(self):
+        super().setUp()
+        parche = mock.patch("liberalia.routers.hay_replica", return_value=True)
+        parche.start()
+        self.addCleanup(parche.stop)
+        # sin escrituras recientes en este hilo (las de otros tests fijarían la primaria)
+        self.addCleanup(routers._ultima_escritura.reset, routers._ultima_escritura.set(0.0))
+
+    def test_lecturas_a_la_replica_salvo_cambio_reciente(self):
+        admin = self.usuarios[Profile.ROLE_ADMIN]
+        cache.set(version_key(version.NOMBRE), time.time_ns() - 60 * 10**9, None)  # último cambio: hace 1 min
+        self.assertEqual(build_queryset_for_user(admin, {}).db, "replica")
+        self.assertEqual(routers.ReplicaRouter().db_for_write(LibroFicha), "default")
+        version.marcar_cambio()  # recién cambiado: la réplica puede venir atrasada
+        self.assertEqual(build_queryset_for_user(admin, {}).db, "default")
+
+    def test_proceso_que_escribe_lee_de_la_primaria(self):
+        # comandos / worker: sin petición, cuenta la última escritura del hilo
+        cache.set(version_key(version.NOMBRE), time.time_ns() - 60 * 10**9, None)
+        self.assertEqual(routers.alias_lectura(), "replica")
+        Editorial.objects.create(nombre="Editorial Nueva")
+        self.assertEqual(routers.alias_lectura(), "default")
+
+    def test_sesion_fijada_a_la_primaria_despues_de_escribir(self):
+        response = self.client.post("/accounts/login/", {"email": "admin@liberalia.test", "password": "clave-segura-123"})
+        self.assertEqual(response.cookies[routers.COOKIE]["max-age"], 5)
+        # con la cookie, el panel lee de la primaria (si fuera a "replica" fallaría: no existe aquí)
+        cache.set(version_key(version.NOMBRE), time.time_ns() - 60 * 10**9, None)
+        response = self.client.get("/panel/admin/")
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(routers.COOKIE, response.cookies)  # leer no renueva la fijación
+
+
+@override_settings(EXPORT_SINCRONO_MAX=40)
+class TrabajoTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        super().setUp()
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        ajuste = override_settings(TRABAJOS_ROOT=tmp.name)
+        ajuste.enable()
+        self.addCleanup(ajuste.disable)
+
+    def test_exportacion_grande_se_encola_y_se_descarga(self):
+        self.login(Profile.ROLE_ADMIN)
+        response = self.client.get("/panel/admin/?export=csv&sort=autor&q=")
+        trabajo = Trabajo.objects.get()
+        self.assertRedirects(response, f"/panel/trabajos/{trabajo.pk}/")
+        self.assertEqual((trabajo.estado, trabajo.parametros), (Trabajo.PENDIENTE, {"export": "csv", "sort": "autor", "q": ""}))
+        self.assertEqual(self.client.get(f"/panel/trabajos/{trabajo.pk}/?formato=json").json()["activo"], True)
+
+        call_command("procesar_trabajos", procesos=0, una_vez=True, stdout=StringIO())
+        trabajo.refresh_from_db()
+        self.assertEqual((trabajo.estado, trabajo.progreso, trabajo.total), (Trabajo.LISTO, 60, 60))
+        estado = self.client.get("/panel/trabajos/").json()["trabajos"][0]
+        self.assertEqual(estado["descarga"], f"/panel/trabajos/{trabajo.pk}/descargar/")
+        lineas = b"".join(self.client.get(estado["descarga"]).streaming_content).decode().splitlines()
+        self.assertEqual((len(lineas), lineas[0]), (61, "ISBN,TÍTULO,AUTOR,EDITORIAL,FECHA_EDICIÓN"))
+
+        # solo el dueño ve el trabajo
+        self.login(Profile.ROLE_CONSULTOR)
+        self.assertEqual(self.client.get(f"/panel/trabajos/{trabajo.pk}/descargar/").status_code, 404)
+
+    def test_exportacion_xlsx_en_segundo_plano(self):
+        self.login(Profile.ROLE_ADMIN)
+        self.client.get("/panel/admin/?export=xlsx&columnas=completo")
+        call_command("procesar_trabajos", procesos=0, una_vez=True, stdout=StringIO())
+        trabajo = Trabajo.objects.get()
+        self.assertEqual((trabajo.estado, trabajo.archivo), (Trabajo.LISTO, f"{trabajo.pk}/libros.xlsx"))
+        response = self.client.get(f"/panel/trabajos/{trabajo.pk}/descargar/")
+        hoja = load_workbook(BytesIO(b"".join(response.streaming_content))).active
+        self.assertEqual((hoja.max_row, hoja.max_column), (61, len(exports.COLUMNAS)))
+
+    def test_exportacion_chica_no_se_encola(self):
+        self.login(Profile.ROLE_CONSULTOR)
+        response = self.client.get("/panel/consultor/?export=csv&q=andes")  # 30 fichas < 40
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        self.assertFalse(Trabajo.objects.exists())
+
+    def test_reclamo_condicional_y_rescate_de_abandonados(self):
+        admin = self.usuarios[Profile.ROLE_ADMIN]
+        trabajo = trabajos.encolar(admin, Trabajo.EXPORTAR, {})
+        self.assertEqual(trabajos.reclamar("w1").pk, trabajo.pk)
+        self.assertIsNone(trabajos.reclamar("w2"))  # ya tomado
+        # el worker w1 murió: sin latido, vuelve a la cola
+        Trabajo.objects.filter(pk=trabajo.pk).update(latido=timezone.now() - trabajos.LATIDO_MAX * 2)
+        tomado = trabajos.reclamar("w2")
+        self.assertEqual((tomado.worker, tomado.intentos), ("w2", 2))
+        # agotados los intentos, queda en error
+        Trabajo.objects.filter(pk=trabajo.pk).update(
+            latido=timezone.now() - trabajos.LATIDO_MAX * 2, intentos=trabajos.MAX_INTENTOS)
+        self.assertIsNone(trabajos.reclamar("w3"))
+        self.assertEqual(trabajos.descartar_abandonados(), 1)
+
+    def test_error_de_tarea_queda_registrado(self):
+        trabajo = trabajos.encolar(self.usuarios[Profile.ROLE_ADMIN], Trabajo.IMPORTAR_FICHAS, {"archivo": "/no/existe.csv"})
+        trabajos.reclamar("w1")
+        self.assertFalse(trabajos.ejecutar(trabajo.pk))
+        trabajo.refresh_from_db()
+        self.assertEqual(trabajo.estado, Trabajo.ERROR)
+        self.assertIn("FileNotFoundError", trabajo.mensaje)
@@ -0,0 +1,203 @@
+"""
+Cola de trabajos en segundo plano (modelo Trabajo), sin broker externo.
+
+- encolar(): la vista crea el Trabajo PENDIENTE y responde de inmediato.
+- reclamar(): un worker toma el más antiguo con un UPDATE condicional
+  (WHERE estado = PENDIENTE …); si otro worker se adelantó, el UPDATE
+  afecta 0 filas y prueba con el siguiente. No hace falta SELECT FOR
+  UPDATE, así funciona igual en MySQL y SQLite.
+- ejecutar(): corre la tarea según `tipo` (TAREAS) y deja el resultado en
+  TRABAJOS_ROOT/<id>/, con el avance guardado cada pocos segundos.
+
+El comando procesar_trabajos reparte los trabajos en un pool de procesos
+y renueva el "latido" de los que tiene en curso; un trabajo EN_CURSO sin
+latido reciente (worker caído) vuelve a la cola hasta MAX_INTENTOS veces.
+"""
+
+import csv
+import os
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import exports
+from .keyset import iter_values
+from .models import Trabajo
+
+# Un trabajo EN_CURSO sin latido por este lapso se considera abandonado
+LATIDO_MAX = timedelta(minutes=5)
+MAX_INTENTOS = 3
+# Segundos mínimos entre escrituras del avance
+AVANCE_CADA = 2.0
+
+
+def raiz() -> Path:
+    return Path(settings.TRABAJOS_ROOT)
+
+
+def ruta_resultado(trabajo: Trabajo) -> Path:
+    return raiz() / trabajo.archivo
+
+
+def encolar(usuario, tipo: str, parametros: dict) -> Trabajo:
+    return Trabajo.objects.create(usuario=usuario, tipo=tipo, parametros=parametros)
+
+
+# ----------------------------
+# Reparto entre workers
+# ----------------------------
+def _reclamables() -> Q:
+    abandonado = Q(estado=Trabajo.EN_CURSO, latido__lt=timezone.now() - LATIDO_MAX)
+    return (Q(estado=Trabajo.PENDIENTE) | abandonado) & Q(intentos__lt=MAX_INTENTOS)
+
+
+def reclamar(worker: str) -> Trabajo | None:
+    """Toma el trabajo reclamable más antiguo para `worker` (o None si no hay)."""
+    candidatos = Trabajo.objects.filter(_reclamables()).order_by("creado", "pk").values_list("pk", flat=True)
+    for pk in candidatos[:10]:
+        ahora = timezone.now()
+        tomado = Trabajo.objects.filter(_reclamables(), pk=pk).update(
+            estado=Trabajo.EN_CURSO, worker=worker, iniciado=ahora, latido=ahora,
+            intentos=F("intentos") + 1, progreso=0, mensaje="",
+        )
+        if tomado:
+            return Trabajo.objects.get(pk=pk)
+    return None
+
+
+def latir(worker: str, pks) -> None:
+    """Renueva el latido de los trabajos que `worker` tiene en curso."""
+    if pks:
+        Trabajo.objects.filter(pk__in=pks, worker=worker, estado=Trabajo.EN_CURSO).update(latido=timezone.now())
+
+
+def descartar_abandonados() -> int:
+    """Marca ERROR los abandonados que ya agotaron sus intentos."""
+    return Trabajo.objects.filter(
+        estado=Trabajo.EN_CURSO, latido__lt=timezone.now() - LATIDO_MAX, intentos__gte=MAX_INTENTOS,
+    ).update(estado=Trabajo.ERROR, mensaje="Interrumpido: el worker dejó de responder.", terminado=timezone.now())
+
+
+def purgar(dias: int) -> int:
+    """Borra los trabajos terminados hace más de `dias` días y sus archivos."""
+    viejos = Trabajo.objects.filter(terminado__lt=timezone.now() - timedelta(days=dias))
+    for trabajo in viejos.exclude(archivo=""):
+        ruta = ruta_resultado(trabajo)
+        ruta.unlink(missing_ok=True)
+        try:
+            ruta.parent.rmdir()
+        except OSError:
+            pass
+    return viejos.delete()[0]
+
+
+# ----------------------------
+# Ejecución
+# ----------------------------
+class Avance:
+    """Guarda progreso / total del trabajo, a lo más cada AVANCE_CADA segundos."""
+
+    def __init__(self, trabajo: Trabajo):
+        self.trabajo = trabajo
+        self._ultimo = 0.0
+
+    def __call__(self, progreso: int, total: int | None = None, forzar: bool = False):
+        self.trabajo.progreso = progreso
+        if total is not None:
+            self.trabajo.total = total
+        ahora = time.monotonic()
+        if forzar or ahora - self._ultimo >= AVANCE_CADA:
+            self._ultimo = ahora
+            Trabajo.objects.filter(pk=self.trabajo.pk).update(
+                progreso=progreso, total=self.trabajo.total, latido=timezone.now(),
+            )
+
+
+def _archivo(trabajo: Trabajo, nombre: str) -> tuple[str, Path]:
+    relativo = f"{trabajo.pk}/{nombre}"
+    ruta = raiz() / relativo
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    return relativo, ruta
+
+
+def exportar(trabajo: Trabajo, avance: Avance) -> None:
+    """Exportación del panel con los filtros, formato y columnas guardados en `parametros`."""
+    from .views import _sort_field, build_queryset_for_user  # evita import circular
+
+    params = trabajo.parametros
+    formato = params.get("export", "csv")
+    columnas = exports.columnas_de(params.get("columnas"))
+    qs = build_queryset_for_user(trabajo.usuario, params)
+    avance(0, qs.count(), forzar=True)
+    relativo, ruta = _archivo(trabajo, exports.nombre_archivo(formato))
+    tmp = ruta.with_suffix(".tmp")
+    contadas = [0]
+
+    def contando(rows):
+        for contadas[0], row in enumerate(rows, 1):
+            if contadas[0] % 1000 == 0:
+                avance(contadas[0])
+            yield row
+
+    rows = iter_values(qs, _sort_field(params), exports.campos(columnas))
+    exports.escribir(formato, columnas, contando(rows), tmp)
+    os.replace(tmp, ruta)
+    avance(contadas[0], forzar=True)
+    trabajo.archivo = relativo
+    trabajo.mensaje = f"{contadas[0]} fichas exportadas."
+
+
+def importar_fichas(trabajo: Trabajo, avance: Avance) -> None:
+    """importar_fichas en segundo plano; las filas con errores quedan en un CSV descargable."""
+    from catalogo.importacion import Importador, leer_csv, leer_onix
+
+    p = trabajo.parametros
+    if p.get("formato") == "onix":
+        filas = leer_onix(p["archivo"])
+    else:
+        filas = leer_csv(p["archivo"], p.get("delimitador", ","), p.get("encoding", "utf-8-sig"))
+    resumen = Importador(
+        dry_run=p.get("dry_run", False),
+        progreso=lambda r: avance(r["creadas"] + r["actualizadas"] + len(r["errores"])),
+        portadas=p.get("portadas"),
+    ).procesar(filas)
+
+    if resumen["errores"]:
+        relativo, ruta = _archivo(trabajo, "errores.csv")
+        with open(ruta, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["fila", "isbn", "error"])
+            writer.writerows(resumen["errores"])
+        trabajo.archivo = relativo
+    trabajo.mensaje = (
+        f"{resumen['creadas']} nuevas, {resumen['actualizadas']} actualizadas, "
+        f"{len(resumen['errores'])} con errores."
+    )
+
+
+TAREAS = {
+    Trabajo.EXPORTAR: exportar,
+    Trabajo.IMPORTAR_FICHAS: importar_fichas,
+}
+
+
+def ejecutar(pk: int) -> bool:
+    """Corre el trabajo `pk` (ya reclamado) y deja su estado final."""
+    trabajo = Trabajo.objects.select_related("usuario__profile").get(pk=pk)
+    try:
+        TAREAS[trabajo.tipo](trabajo, Avance(trabajo))
+    except Exception as e:
+        Trabajo.objects.filter(pk=pk).update(
+            estado=Trabajo.ERROR, mensaje=f"{type(e).__name__}: {e}", terminado=timezone.now(),
+        )
+        return False
+    Trabajo.objects.filter(pk=pk).update(
+        estado=Trabajo.LISTO, progreso=trabajo.progreso, total=trabajo.total,
+        archivo=trabajo.archivo, mensaje=trabajo.mensaje, terminado=timezone.now(),
+    )
+    return True
+
@@ -5,12 +5,22 @@
 # -------------------------------------------------------------------------------
 
 
+from django.conf import settings
 from django.urls import path
 from .views import (
     PanelAdminView, PanelConsultorView, PanelEditorView,
-    LibroCreateView, LibroEditView
+    LibroCreateView, LibroEditView,
+    trabajo_descargar, trabajo_estado, trabajos_recientes,
+    estadisticas_view, metricas_view, perfil_descargar, perfiles_view,
 )
 
+if settings.ASYNC_VIEWS:  # servidor ASGI: paneles como vistas async (ver liberalia/asgi.py)
+    from .views import (
+        AsyncPanelAdminView as PanelAdminView,
+        AsyncPanelConsultorView as PanelConsultorView,
+        AsyncPanelEditorView as PanelEditorView,
+    )
+
 app_name = "roles"
 
 urlpatterns = [
@@ -21,4 +31,18 @@ urlpatterns = [
     # Editor: crear/editar (stubs)
     path("editor/fichas/nueva/",        LibroCreateView.as_view(), name="ficha_new"),
     path("editor/fichas/<str:isbn>/",   LibroEditView.as_view(),   name="ficha_edit"),
+
+    # Trabajos en segundo plano (exportaciones grandes, importaciones)
+    path("trabajos/",                        trabajos_recientes, name="trabajos"),
+    path("trabajos/<int:pk>/",               trabajo_estado,     name="trabajo"),
+    path("trabajos/<int:pk>/descargar/",     trabajo_descargar,  name="trabajo_descargar"),
+
+    # Estadísticas por editorial (solo ADMIN; foto del comando estadisticas_editoriales)
+    path("admin/estadisticas/",              estadisticas_view,  name="estadisticas"),
+
+    # Métricas de rendimiento por vista / SQL (solo ADMIN; liberalia/metricas.py)
+    path("admin/metricas/",                  metricas_view,      name="metricas"),
+    # Perfiles por petición (?_perfil=muestreo|cprofile; liberalia/perfilador.py)
+    path("admin/perfiles/",                  perfiles_view,      name="perfiles"),
+    path("admin/perfiles/<str:nombre>",      perfil_descargar,   name="perfil"),
 ]
@@ -1,14 +1,30 @@
 from __future__ import annotations
+from asgiref.sync import sync_to_async
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.http import HttpResponse, HttpRequest
-from django.shortcuts import render, redirect
+from django.contrib.auth.views import redirect_to_login
+from django.conf import settings
+from django.db.models import IntegerField, Value
+from django.http import FileResponse, Http404, HttpResponse, HttpRequest, JsonResponse
+from django.shortcuts import get_object_or_404, render, redirect
+from django.urls import reverse
+from django.utils.http import urlencode
+from django.utils.safestring import mark_safe
 from django.views import View
 
-from .models import Profile, UsuarioEditorial
-from catalogo.models import LibroFicha
+from liberalia import metricas, perfilador
+from liberalia.condicional import con_validadores, etag_de, no_modificado, ns_a_timestamp
+from liberalia.routers import alias_lectura
+from .keyset import aiter_values, decode_cursor, iter_values, paginate
+from . import estadisticas, exports, filas, trabajos
+from .models import Profile, Trabajo
+from .panel_cache import clave_pagina, obtener_pagina
+from .scope import aget_scope, get_scope
+from catalogo.models import LibroFicha, TerminoBusqueda
+from catalogo import facetas, search
+from catalogo.isbn import limpiar, normalizar_isbn
+from catalogo.version import version_catalogo
 
-import csv
 from datetime import datetime
 
 
@@ -17,7 +33,7 @@ from datetime import datetime
 # ----------------------------
 def _role(user):
     """Devuelve el rol del usuario o None si no tiene profile."""
-    return getattr(getattr(user, "profile", None), "role", None)
+    return get_scope(user).role
 
 
 def role_required(expected_role):
@@ -36,39 +52,7 @@ def _panel_flags(user):
     """
     Banderas de UI / capacidades por rol para el template unificado.
     """
-    role = _role(user)
-    is_admin = role == Profile.ROLE_ADMIN
-    is_editor = role == Profile.ROLE_EDITOR
-    is_consultor = role == Profile.ROLE_CONSULTOR
-
-    if is_admin:
-        role_label = "ADMIN"
-        role_badge_class = "bg-danger"
-    elif is_editor:
-        role_label = "EDITOR"
-        role_badge_class = "bg-secondary"
-    else:
-        role_label = "CONSULTOR"
-        role_badge_class = "bg-secondary"
-
-    return {
-        "is_admin": is_admin,
-        "is_editor": is_editor,
-        "is_consultor": is_consultor,
-        "role_label": role_label,
-        "role_badge_class": role_badge_class,
-
-        # Capacidades por rol (alineadas a tus 3 plantillas originales)
-        "can_download": is_admin or is_consultor,   # Admin/Consultor tenían "Descargar"
-        "can_create": is_editor,                    # Editor tenía "Crear"
-        "can_edit": is_editor,                      # Editor tenía "Editar"
-        "show_detail": is_admin or is_consultor,    # Admin/Consultor mostraban "Detalle"
-        "detail_disabled": "disabled",
-
-        # Nombres de URL (ajusta si tus names cambian)
-        "create_url_name": "roles:ficha_new" if is_editor else None,
-        "edit_url_name": "roles:ficha_edit" if is_editor else None,
-    }
+    return get_scope(user).flags
 
 
 # ----------------------------
@@ -81,6 +65,29 @@ ALLOWED_SORTS = {
     "editorial": "editorial__nombre",
     "fecha": "fecha_edicion",
 }
+DEFAULT_SORT = "titulo"  # mismo orden que LibroFicha.Meta.ordering
+# ?sort=relevancia: la columna es menos la relevancia de la búsqueda de texto
+# (el keyset recorre en orden ascendente), anotada por build_queryset_for_user
+SORT_RELEVANCIA = "relevancia"
+RELEVANCIA_FIELD = "orden_relevancia"
+
+# Encabezados ordenables de la tabla del panel: (clave de ?sort=, texto)
+ENCABEZADOS = [
+    ("isbn", "ISBN"), ("titulo", "TÍTULO"), ("autor", "AUTOR"),
+    ("editorial", "EDITORIAL"), ("fecha", "F. EDICIÓN"),
+]
+
+# Campos del índice de búsqueda que usa cada filtro de texto
+TITULO_CAMPOS = [TerminoBusqueda.CAMPO_TITULO, TerminoBusqueda.CAMPO_SUBTITULO]
+EDITORIAL_CAMPOS = [TerminoBusqueda.CAMPO_EDITORIAL]
+
+
+def _sort_field(params) -> str:
+    """Columna de orden pedida en ?sort= (o la de por defecto)."""
+    if params.get("sort") == SORT_RELEVANCIA:
+        return RELEVANCIA_FIELD
+    return ALLOWED_SORTS.get(params.get("sort") or "", ALLOWED_SORTS[DEFAULT_SORT])
+
 
 def _parse_date(s: str | None):
     if not s:
@@ -92,6 +99,37 @@ def _parse_date(s: str | None):
         return None
 
 
+def _anio_elegido(params) -> int | None:
+    """Año cuando el rango de fechas es exactamente un año calendario (faceta de año)."""
+    desde, hasta = _parse_date(params.get("date_from")), _parse_date(params.get("date_to"))
+    if desde and hasta and desde.year == hasta.year and (desde.month, desde.day, hasta.month, hasta.day) == (1, 1, 12, 31):
+        return desde.year
+    return None
+
+
+def normalized_filters(role, params) -> dict:
+    """
+    Filtros del request reducidos a lo que realmente cambia el resultado de
+    build_queryset_for_user (clave de la cache de páginas): textos como
+    términos del índice, ISBN canónico, fechas válidas, columna de orden y
+    cursor (solo si es válido para esa columna).
+    """
+    field = _sort_field(params)
+    filtros = {"sort": field}
+    if role == Profile.ROLE_EDITOR:
+        q_isbn = (params.get("q_isbn") or "").strip()
+        filtros["q_titulo"] = search.normalizar(params.get("q_titulo"))
+        filtros["q_isbn"] = (normalizar_isbn(q_isbn) or "prefijo:" + limpiar(q_isbn)) if q_isbn else ""
+    else:
+        filtros["q"] = search.normalizar(params.get("q"))
+    for nombre in ("date_from", "date_to"):
+        fecha = _parse_date(params.get(nombre))
+        filtros[nombre] = fecha.isoformat() if fecha else ""
+    cursor = params.get("cursor")
+    filtros["cursor"] = cursor if decode_cursor(cursor, field) else ""
+    return filtros
+
+
 def build_queryset_for_user(user, params):
     """
     Construye un queryset de LibroFicha respetando:
@@ -100,23 +138,32 @@ def build_queryset_for_user(user, params):
     - Rango de fechas (date_from, date_to)
     - Límite por rol (editor ve solo sus editoriales)
     - Ordenamiento (?sort=)
+    Se lee de la réplica si hay una (liberalia/routers.py).
     """
-    qs = LibroFicha.objects.select_related("editorial")
+    qs = LibroFicha.objects.using(alias_lectura(version_catalogo())).select_related("editorial")
 
-    role = getattr(getattr(user, "profile", None), "role", None)
+    scope = get_scope(user)
+    role = scope.role
 
     # --- filtros por texto según rol ---
     if role == Profile.ROLE_EDITOR:
         q_titulo = (params.get("q_titulo") or "").strip()
         q_isbn   = (params.get("q_isbn") or "").strip()
+        texto, campos = q_titulo, TITULO_CAMPOS
         if q_titulo:
-            qs = qs.filter(titulo__icontains=q_titulo) # busca títulos que contengan el texto (sin distinguir mayúsc/minúsc)
+            # palabras del título/subtítulo (por prefijo, sin tildes) vía índice de búsqueda
+            qs = search.filtrar(qs, q_titulo, campos=TITULO_CAMPOS)
         if q_isbn:
-            qs = qs.filter(isbn__icontains=q_isbn)   # busca ISBN que contengan la cadena de caracteres
+            canonico = normalizar_isbn(q_isbn)
+            if canonico:
+                qs = qs.filter(isbn13=canonico)  # ISBN completo (10 o 13): igualdad sobre la clave canónica
+            else:
+                qs = qs.filter(isbn13__startswith=limpiar(q_isbn))  # ISBN parcial: prefijo de la clave
     else:
         q = (params.get("q") or "").strip()
+        texto, campos = q, EDITORIAL_CAMPOS
         if q:
-            qs = qs.filter(editorial__nombre__icontains=q)
+            qs = search.filtrar(qs, q, campos=EDITORIAL_CAMPOS)  # palabras del nombre de editorial
 
     # --- fechas ---
     date_from = _parse_date(params.get("date_from"))  # obtiene y convierte la fecha inicial desde los parámetros
@@ -128,13 +175,18 @@ def build_queryset_for_user(user, params):
 
     # --- restricción por rol (EDITOR: solo sus editoriales) ---
     if role == Profile.ROLE_EDITOR:
-        ed_ids = UsuarioEditorial.objects.filter(user=user).values_list("editorial_id", flat=True)
-        qs = qs.filter(editorial_id__in=list(ed_ids))
-
-    # --- orden ---
-    sort_key = params.get("sort") or ""
-    if sort_key in ALLOWED_SORTS:
-        qs = qs.order_by(ALLOWED_SORTS[sort_key])
+        qs = qs.filter(editorial_id__in=scope.editorial_ids)
+
+    # --- orden (el id desempata para que el orden sea estable) ---
+    field = _sort_field(params)
+    if field == RELEVANCIA_FIELD:
+        # más relevantes primero (catalogo/search.puntaje); sin texto buscado
+        # la relevancia queda en 0 y el orden es por id
+        relevancia = (
+            -search.puntaje(texto, campos) if search.normalizar(texto) else Value(0, output_field=IntegerField())
+        )
+        qs = qs.annotate(**{RELEVANCIA_FIELD: relevancia})
+    qs = qs.order_by(field, "pk")
 
     return qs
 
@@ -145,21 +197,86 @@ def build_queryset_for_user(user, params):
 class BasePanelView(LoginRequiredMixin, View):
     template_name = "roles/panel.html"   # TEMPLATE ÚNICO
     role_required = None                 
+    paginate_by = 50                     # filas por página (paginación por cursor)
 
     def get(self, request: HttpRequest):
-        # Exportación CSV (solo si el rol lo permite)
-        if request.GET.get("export") == "csv":
-            role = getattr(getattr(request.user, "profile", None), "role", None)
-            if self.role_required and role != self.role_required:
-                return redirect("home-root")  # o HttpResponse("Prohibido", status=403)
-            flags = _panel_flags(request.user)
-            if not flags.get("can_download"):
-                return HttpResponse("No autorizado", status=403)
-            return self.export_csv(request)
+        scope = request.scope  # rol / banderas / editoriales, resueltos una vez (RoleScopeMiddleware)
+
+        # valida rol si corresponde (antes de tocar el catálogo)
+        if self.role_required and scope.role != self.role_required:
+            return redirect("home-root")  # o HttpResponse("Prohibido", status=403)
+
+        # Exportación (solo si el rol lo permite); las grandes van a la cola
+        if request.GET.get("export"):
+            error = self.export_error(request, scope)
+            if error is not None:
+                return error
+            return self.enqueue_large_export(request) or self.export(request)
+
+        return self.panel_response(request, scope)
+
+    def export_error(self, request: HttpRequest, scope) -> HttpResponse | None:
+        """403 / 400 si la exportación pedida no se puede hacer; None si es válida."""
+        if not scope.flags.get("can_download"):
+            return HttpResponse("No autorizado", status=403)
+        if request.GET["export"] not in exports.FORMATOS:
+            return HttpResponse("Formato de exportación no válido", status=400)
+        try:
+            exports.columnas_de(request.GET.get("columnas"))
+        except ValueError as e:
+            return HttpResponse(str(e), status=400)
+        return None
 
+    def enqueue_large_export(self, request: HttpRequest):
+        """
+        Si la exportación supera EXPORT_SINCRONO_MAX filas, la encola como
+        Trabajo (roles/trabajos.py) y redirige a su página de avance; si no,
+        devuelve None y se transmite en la misma petición.
+        """
+        limite = settings.EXPORT_SINCRONO_MAX
         qs = build_queryset_for_user(request.user, request.GET)
+        if not qs[limite:limite + 1].exists():  # OFFSET acotado, sin COUNT(*) del catálogo
+            return None
+        parametros = {k: v for k, v in request.GET.items() if k != "cursor"}  # filtros, formato y columnas
+        trabajo = trabajos.encolar(request.user, Trabajo.EXPORTAR, parametros)
+        return redirect("roles:trabajo", pk=trabajo.pk)
+
+    def panel_response(self, request: HttpRequest, scope) -> HttpResponse:
+        """Página del panel (o 304) para un usuario ya validado."""
+        # GET condicional: si el catálogo no cambió (sello de versión) y el
+        # usuario, su alcance y los filtros son los mismos → 304 sin consultar
+        version = version_catalogo()
+        etag = etag_de(
+            "panel", request.user.pk, scope.role, scope.editorial_ids, version,
+            sorted(request.GET.lists()),
+        )
+        last_modified = ns_a_timestamp(version)
+        response = no_modificado(request, etag, last_modified)
+        if response is not None:
+            return con_validadores(response, etag, last_modified)
+
+        # página de resultados (filas renderizadas + cursores), compartida
+        # entre usuarios del mismo rol/alcance que piden los mismos filtros
+        clave = clave_pagina(scope.role, scope.editorial_ids, normalized_filters(scope.role, request.GET))
+        page = obtener_pagina(clave, lambda: self.build_page(request, scope))
+        anio = _anio_elegido(request.GET)
         ctx = {
-            "rows": qs[:1000],  # limitada a 1000 registros
+            "filas_html": mark_safe(page["filas_html"]),
+            "n_filas": page["n_filas"],
+            "facetas": page["facetas"],
+            "anio_elegido": anio,
+            "meses_elegidos": page["facetas"]["meses"].get(anio, []),
+            # filtros actuales sin fechas (links de las facetas de año / mes)
+            "facetas_query": urlencode([
+                (k, v) for k, v in request.GET.items()
+                if k not in ("cursor", "export", "columnas", "date_from", "date_to")
+            ]),
+            "next_cursor": page["next_cursor"],
+            "prev_cursor": page["prev_cursor"],
+            # filtros actuales (sin cursor) para armar los links de página
+            "page_query": urlencode([
+                (k, v) for k, v in request.GET.items() if k not in ("cursor", "export", "columnas")
+            ]),
             "q": request.GET.get("q", ""),
             "q_titulo": request.GET.get("q_titulo", ""),
             "q_isbn": request.GET.get("q_isbn", ""),
@@ -167,34 +284,71 @@ class BasePanelView(LoginRequiredMixin, View):
             "date_to": request.GET.get("date_to", ""),
             "sort": request.GET.get("sort", ""),
             "ALLOWED_SORTS": ALLOWED_SORTS,
+            "encabezados": self.sort_links(request, scope),
+            "relevancia_href": self.relevancia_link(request, scope),
+            "por_relevancia": request.GET.get("sort") == SORT_RELEVANCIA,
         }
 
-        # valida rol si corresponde
-        role = getattr(getattr(request.user, "profile", None), "role", None)
-        if self.role_required and role != self.role_required:
-            return redirect("home-root")  # o HttpResponse("Prohibido", status=403)
-
         # inyecta banderas por rol
-        ctx.update(_panel_flags(request.user))
-        return render(request, self.template_name, ctx)
-
-    def export_csv(self, request: HttpRequest) -> HttpResponse:
+        ctx.update(scope.flags)
+        return con_validadores(render(request, self.template_name, ctx), etag, last_modified)
+
+    def sort_links(self, request: HttpRequest, scope) -> list[tuple[str, str]]:
+        """(texto, href) de cada encabezado: filtros de texto del rol + fechas + su orden."""
+        textos = ("q_titulo", "q_isbn") if scope.flags.get("is_editor") else ("q",)
+        base = [(k, request.GET.get(k, "")) for k in (*textos, "date_from", "date_to")]
+        return [(texto, "?" + urlencode(base + [("sort", clave)])) for clave, texto in ENCABEZADOS]
+
+    def relevancia_link(self, request: HttpRequest, scope) -> str | None:
+        """href para ordenar la búsqueda de texto actual por relevancia (None sin texto)."""
+        campo = "q_titulo" if scope.flags.get("is_editor") else "q"
+        if not search.normalizar(request.GET.get(campo)):
+            return None
+        base = [(k, v) for k, v in request.GET.items() if k not in ("cursor", "export", "columnas", "sort")]
+        return "?" + urlencode(base + [("sort", SORT_RELEVANCIA)])
+
+    def build_page(self, request: HttpRequest, scope) -> dict:
+        """Consulta una página y renderiza sus filas (valor cacheable)."""
         qs = build_queryset_for_user(request.user, request.GET)
+        page = paginate(qs, _sort_field(request.GET), request.GET.get("cursor"), self.paginate_by, filas.COLUMNAS)
+        filas_html = filas.render_filas(page["rows"], scope.flags)
+        return {
+            "filas_html": filas_html,
+            "n_filas": len(page["rows"]),
+            "facetas": self.facetas(request, scope),
+            "next_cursor": page["next_cursor"],
+            "prev_cursor": page["prev_cursor"],
+        }
 
-        response = HttpResponse(content_type="text/csv; charset=utf-8")
-        response["Content-Disposition"] = 'attachment; filename="libros.csv"'
-        writer = csv.writer(response)
-        writer.writerow(["ISBN", "TÍTULO", "AUTOR", "EDITORIAL", "FECHA_EDICIÓN"])
-
-        for r in qs:
-            writer.writerow([
-                r.isbn,
-                r.titulo,
-                r.autor,
-                r.editorial.nombre,
-                r.fecha_edicion.isoformat() if r.fecha_edicion else "",
-            ])
-        return response
+    def facetas(self, request: HttpRequest, scope) -> dict:
+        """
+        Conteos del alcance del usuario (catalogo/facetas.py) y total de la
+        búsqueda actual. El total sale de la tabla resumen salvo con los
+        filtros de título / ISBN del editor, que no tiene: ahí queda en None.
+        """
+        es_editor = scope.role == Profile.ROLE_EDITOR
+        datos = facetas.resumen(scope.editorial_ids if es_editor else None)
+        params = request.GET
+        if es_editor and ((params.get("q_titulo") or "").strip() or (params.get("q_isbn") or "").strip()):
+            total = None
+        else:
+            total = facetas.total(
+                datos, "" if es_editor else params.get("q", ""),
+                _parse_date(params.get("date_from")), _parse_date(params.get("date_to")),
+            )
+        return {**datos, "hits": total}
+
+    def export(self, request: HttpRequest):
+        """
+        Exportación en la misma petición (ver roles/exports.py): las filas se
+        leen por lotes (keyset) con solo las columnas pedidas; CSV y JSONL se
+        envían a medida que se generan, así la descarga parte de inmediato y
+        la memoria no crece con el catálogo.
+        """
+        columnas = exports.columnas_de(request.GET.get("columnas"))
+        qs = build_queryset_for_user(request.user, request.GET)
+        rows = iter_values(qs, _sort_field(request.GET), exports.campos(columnas))
+        return exports.respuesta(request.GET["export"], columnas, rows)
 
 
 class PanelAdminView(BasePanelView):
@@ -209,6 +363,161 @@ class PanelEditorView(BasePanelView):
     role_required = Profile.ROLE_EDITOR
 
 
+# -----------------------------------------------
+# Variante async (ASGI)
+# -----------------------------------------------
+class AsyncBasePanelView(BasePanelView):
+    """
+    Mismo panel servido como vista async (se activa con ASYNC_VIEWS, ver
+    liberalia/asgi.py). El usuario y su alcance se resuelven con una sola
+    pasada por el pool de threads; la página se arma igual que en WSGI
+    (cache de páginas + una consulta) y la exportación se transmite con el
+    ORM async, sin ocupar un thread mientras el cliente descarga.
+    """
+    # LoginRequiredMixin.dispatch es solo sync: el login se valida en get()
+    dispatch = View.dispatch
+
+    async def get(self, request: HttpRequest):
+        user = await request.auser()
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        scope = await aget_scope(user)
+        if self.role_required and scope.role != self.role_required:
+            return redirect("home-root")
+
+        # el resto de la petición reutiliza lo ya resuelto (sin consultas sync)
+        request.user, request.scope = user, await scope.aresolve()
+
+        if request.GET.get("export"):
+            error = self.export_error(request, scope)
+            if error is not None:
+                return error
+            return await sync_to_async(self.enqueue_large_export)(request) or await self.export_async(request)
+
+        return await sync_to_async(self.panel_response)(request, scope)
+
+    async def export_async(self, request: HttpRequest):
+        """
+        export() con lotes leídos por el ORM async (keyset.aiter_values). El
+        XLSX se arma completo antes de enviarse, así que va al pool de threads.
+        """
+        if request.GET["export"] == "xlsx":
+            return await sync_to_async(self.export)(request)
+        columnas = exports.columnas_de(request.GET.get("columnas"))
+        qs = build_queryset_for_user(request.user, request.GET)
+        rows = aiter_values(qs, _sort_field(request.GET), exports.campos(columnas))
+        return exports.respuesta(request.GET["export"], columnas, rows)
+
+
+class AsyncPanelAdminView(AsyncBasePanelView):
+    role_required = Profile.ROLE_ADMIN
+
+
+class AsyncPanelConsultorView(AsyncBasePanelView):
+    role_required = Profile.ROLE_CONSULTOR
+
+
+class AsyncPanelEditorView(AsyncBasePanelView):
+    role_required = Profile.ROLE_EDITOR
+
+
+# -----------------------------------------------
+# Trabajos en segundo plano (avance y descarga)
+# -----------------------------------------------
+def _trabajo_json(trabajo: Trabajo) -> dict:
+    return {
+        "id": trabajo.pk,
+        "tipo": trabajo.get_tipo_display(),
+        "estado": trabajo.estado,
+        "estado_label": trabajo.get_estado_display(),
+        "progreso": trabajo.progreso,
+        "total": trabajo.total,
+        "porcentaje": trabajo.porcentaje,
+        "mensaje": trabajo.mensaje,
+        "activo": trabajo.activo,
+        "url": reverse("roles:trabajo", args=[trabajo.pk]),
+        "descarga": reverse("roles:trabajo_descargar", args=[trabajo.pk]) if trabajo.archivo else None,
+    }
+
+
+@login_required
+def trabajo_estado(request, pk):
+    """Página de avance de un trabajo propio; con ?formato=json, su estado (polling)."""
+    trabajo = get_object_or_404(Trabajo, pk=pk, usuario=request.user)
+    if request.GET.get("formato") == "json":
+        return JsonResponse(_trabajo_json(trabajo))
+    return render(request, "roles/trabajo.html", {"trabajo": trabajo, "estado": _trabajo_json(trabajo)})
+
+
+@login_required
+def trabajos_recientes(request):
+    """Últimos trabajos del usuario (JSON) para el aviso del panel."""
+    recientes = Trabajo.objects.filter(usuario=request.user)[:5]
+    return JsonResponse({"trabajos": [_trabajo_json(t) for t in recientes]})
+
+
+@login_required
+def trabajo_descargar(request, pk):
+    trabajo = get_object_or_404(Trabajo, pk=pk, usuario=request.user)
+    ruta = trabajos.ruta_resultado(trabajo) if trabajo.archivo else None
+    if ruta is None or not ruta.is_file():
+        raise Http404("Resultado no disponible")
+    return FileResponse(open(ruta, "rb"), as_attachment=True, filename=ruta.name)
+
+
+# -----------------------------------------------
+# Métricas de rendimiento (solo ADMIN)
+# -----------------------------------------------
+@role_required(Profile.ROLE_ADMIN)
+def metricas_view(request):
+    """Vistas más lentas (percentiles), sentencias SQL más costosas y peticiones fuera de presupuesto."""
+    if request.method == "POST":
+        metricas.reiniciar()
+        return redirect("roles:metricas")
+    return render(request, "roles/metricas.html", metricas.resumen())
+
+
+@role_required(Profile.ROLE_ADMIN)
+def perfiles_view(request):
+    """Perfiles guardados por el perfilador bajo demanda (?_perfil=muestreo|cprofile)."""
+    return render(request, "roles/perfiles.html", {"perfiles": perfilador.archivos(), "modos": perfilador.MODOS})
+
+
+@role_required(Profile.ROLE_ADMIN)
+def perfil_descargar(request, nombre):
+    ruta = perfilador.ruta_archivo(nombre)
+    if ruta is None:
+        raise Http404("Perfil no disponible")
+    return FileResponse(open(ruta, "rb"), as_attachment=True, filename=ruta.name)
+
+
+# -----------------------------------------------
+# Estadísticas por editorial (solo ADMIN)
+# -----------------------------------------------
+def _barras(etiquetas, valores) -> list[dict]:
+    """Filas de un gráfico de barras horizontal: ancho relativo al máximo."""
+    maximo = max(valores, default=0) or 1
+    return [{"etiqueta": e, "n": n, "pct": round(n * 100 / maximo)} for e, n in zip(etiquetas, valores)]
+
+
+@role_required(Profile.ROLE_ADMIN)
+def estadisticas_view(request):
+    """Última foto de estadísticas por editorial (comando estadisticas_editoriales): una consulta."""
+    fotos = estadisticas.ultima()
+    elegida = next((f for f in fotos if str(f.editorial_id) == request.GET.get("editorial")), None)
+    elegida = elegida or (fotos[0] if fotos else None)
+    ctx = {"fotos": fotos, "elegida": elegida, "generado": fotos[0].generado if fotos else None}
+    if elegida and elegida.n_libros:
+        datos = elegida.datos
+        meses = datos["meses"][-24:]  # últimos 24 meses con títulos
+        ctx.update(
+            descuentos=_barras(estadisticas.etiquetas_descuento(), datos["descuento"]["histograma"]),
+            paginas=_barras(estadisticas.etiquetas_paginas(), datos["paginas"]["histograma"]),
+            meses=_barras([m for m, _ in meses], [n for _, n in meses]),
+        )
+    return render(request, "roles/estadisticas.html", ctx)
+
+
 # -----------------------------------------------------------
 # Vistas SOLO PROVISIONALES para crear/editar fichas (placeholders)
 # -----------------------------------------------------------